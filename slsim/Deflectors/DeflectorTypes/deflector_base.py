@@ -128,6 +128,15 @@ class DeflectorBase(ABC):
         """
         return self._deflector_dict["angular_size"]
 
+    @property
+    def sis_normalized(self):
+        """Whether the Einstein radius is that of the SIS of the velocity
+        dispersion of the deflector.
+
+        :return: bool
+        """
+        return False
+
     @property
     @abstractmethod
     def halo_properties(self):
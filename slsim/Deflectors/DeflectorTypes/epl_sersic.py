@@ -73,6 +73,16 @@ class EPLSersic(DeflectorBase):
             )
         return theta_E
 
+    @property
+    def sis_normalized(self):
+        """Whether the Einstein radius is that of the SIS of the velocity
+        dispersion of the deflector, i.e. it is not given in the deflector
+        dictionary and the SIS convention is used.
+
+        :return: bool
+        """
+        return self._sis_convention and "theta_E" not in self._deflector_dict.keys()
+
     @property
     def light_ellipticity(self):
         """Light ellipticity.
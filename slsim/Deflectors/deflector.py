@@ -134,6 +134,15 @@ class Deflector(object):
         """
         return self._deflector.angular_size_light
 
+    @property
+    def sis_normalized(self):
+        """Whether the Einstein radius is that of the SIS of the velocity
+        dispersion of the deflector.
+
+        :return: bool
+        """
+        return self._deflector.sis_normalized
+
     @property
     def halo_properties(self):
         """Properties of the NFW halo.
@@ -8,6 +8,7 @@ from scipy import stats
 import warnings
 from multiprocessing import get_context
 from slsim.Halos.halos_util import convergence_mean_0
+from slsim.Util.checkpoint import checkpointed_starmap
 
 
 def read_glass_data(file_name="kgdata.npy"):
@@ -475,6 +476,37 @@ def worker_run_halos_without_kde(
     return nkappa_values_halos, ngamma_values_halos
 
 
+def run_workers(worker, args, seed=None, checkpoint=None, resume_from=None):
+    """Runs a worker function for a list of arguments in a pool of spawned
+    processes. If a seed or a checkpoint is requested, the iterations are
+    seeded and checkpointed with ~slsim.Util.checkpoint.checkpointed_starmap().
+
+    :param worker: module-level worker function
+    :param args: list of tuples of arguments of the worker, one per
+        iteration
+    :param seed: seed of the iterations. If provided (or if checkpoint or
+        resume_from is provided), each iteration is run with an independent
+        child of ~numpy.random.SeedSequence(seed), such that the results are
+        reproducible.
+    :type seed: int, optional
+    :param checkpoint: name of a file in which the results of the finished
+        iterations are saved after each iteration, see
+        ~slsim.Util.checkpoint.ResultsCheckpoint.
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file of an interrupted run with
+        the same arguments. Only the remaining iterations are run and the
+        results are the same as for an uninterrupted run.
+    :type resume_from: str, optional
+    :return: list of return values of the worker, in the order of args
+    """
+    if seed is None and checkpoint is None and resume_from is None:
+        with get_context("spawn").Pool() as pool:
+            return pool.starmap(worker, args)
+    return checkpointed_starmap(
+        worker, args, seed=seed, checkpoint=checkpoint, resume_from=resume_from
+    )
+
+
 def run_halos_without_kde_by_multiprocessing(
     n_iterations=1,
     sky_area=0.0001,
@@ -487,6 +519,9 @@ def run_halos_without_kde_by_multiprocessing(
     listmean=False,
     sigma_8=0.81,
     omega_m=None,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Under the specified `sky_area`, generate `n_iterations` sets of halo
     lists. For each set, simulate `samples_number` times to obtain the
@@ -517,6 +552,12 @@ def run_halos_without_kde_by_multiprocessing(
     :type sigma_8: float, optional
     :param omega_m: The value of omega_m for the cosmology. If None, the default value is used.
     :type omega_m: float, optional
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :returns: A tuple containing two lists; the first list contains the combined convergence (`kappa`) values from all iterations, and the second list contains the combined shear (`gamma`) values from all iterations.
     :rtype: (list, list)
 
@@ -558,8 +599,13 @@ def run_halos_without_kde_by_multiprocessing(
     ]
 
     # Use multiprocessing
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_run_halos_without_kde, args)
+    results = run_workers(
+        worker_run_halos_without_kde,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
 
     for nkappa, ngamma in results:
         kappa_values_total.extend(nkappa)
@@ -583,6 +629,9 @@ def run_kappaext_gammaext_kde_by_multiprocessing(
     mass_sheet_correction=True,
     listmean=False,
     output_format="dict",
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Run the kappa-gamma external convergence distribution for a given number
     of iterations using multiprocessing.
@@ -609,6 +658,12 @@ def run_kappaext_gammaext_kde_by_multiprocessing(
     :type mass_sheet_correction: bool, optional
     :param output_format: The format in which the results should be returned, either as `dict` or `vector`. Defaults to `dict`.
     :type output_format: str, optional
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :return: A list of kappa and gamma values across all iterations.
     :rtype: list
 
@@ -645,8 +700,13 @@ def run_kappaext_gammaext_kde_by_multiprocessing(
     ]
 
     # Use multiprocessing
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_kappaext_gammaext_kde, args)
+    results = run_workers(
+        worker_kappaext_gammaext_kde,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
 
     for generate_distributions_0to5 in results:
         kappaext_gammaext_values_total.extend(generate_distributions_0to5)
@@ -750,6 +810,9 @@ def run_certain_redshift_lensext_kde_by_multiprocessing(
     listmean=False,
     sigma_8=0.81,
     omega_m=None,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Generates distributions of kappa_ext and gamma_ext for a given redshift
     and cosmology.
@@ -780,6 +843,12 @@ def run_certain_redshift_lensext_kde_by_multiprocessing(
     :type sigma_8: float
     :param omega_m: Omega matter parameter for the cosmology.
     :type omega_m: float
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :return: Distributions of kappa_ext and gamma_ext.
     :rtype: np.ndarray
     """
@@ -816,8 +885,13 @@ def run_certain_redshift_lensext_kde_by_multiprocessing(
     ]
 
     # Use multiprocessing
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_certain_redshift_lensext_kde, args)
+    results = run_workers(
+        worker_certain_redshift_lensext_kde,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
 
     for distributions in results:
         kappaext_gammaext_values.extend(distributions)
@@ -923,6 +997,9 @@ def run_certain_redshift_many_by_multiprocessing(
     mass_sheet_correction=True,
     zs=None,
     zd=None,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Runs the simulation for a certain redshift range multiple times using
     multiprocessing.
@@ -952,6 +1029,12 @@ def run_certain_redshift_many_by_multiprocessing(
     :type zs: float, optional
     :param zd: Lens redshift, defaults to None. If None, uses 1.0.
     :type zd: float, optional
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :return: A tuple containing two lists: kappaext_gammaext_values and
         lensinstance_values.
     :rtype: tuple(list, list)
@@ -988,8 +1071,13 @@ def run_certain_redshift_many_by_multiprocessing(
     ]
 
     # Use multiprocessing
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_certain_redshift_many, args)
+    results = run_workers(
+        worker_certain_redshift_many,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
 
     for distributions, lensinstance in results:
         kappaext_gammaext_values.extend(distributions)
@@ -1074,6 +1162,9 @@ def run_total_mass_by_multiprocessing(
     m_min=None,
     m_max=None,
     z_max=None,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Calculate the total mass of halos over multiple iterations using
     multiprocessing.
@@ -1092,6 +1183,12 @@ def run_total_mass_by_multiprocessing(
     :type m_max: float, optional
     :param z_max: The maximum redshift to consider, defaults to None. If None, uses 5.0
     :type z_max: float, optional
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :return: A list of total mass values for each iteration.
     :rtype: list
     """
@@ -1122,9 +1219,14 @@ def run_total_mass_by_multiprocessing(
     ]
 
     # Use multiprocessing
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_run_total_mass_by_multiprocessing, args)
-        total_mass.extend(results)
+    results = run_workers(
+        worker_run_total_mass_by_multiprocessing,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
+    total_mass.extend(results)
 
     end_time = time.time()  # Note the end time
     print(
@@ -1188,6 +1290,9 @@ def run_total_kappa_by_multiprocessing(
     m_min=None,
     m_max=None,
     z_max=None,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Runs the total kappa computation in parallel using multiprocessing for a
     given number of iterations.
@@ -1214,6 +1319,12 @@ def run_total_kappa_by_multiprocessing(
     :param z_max: The maximum redshift to consider. If None, a default
         value of 5.0 is used.
     :type z_max: float, optional
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :return: A list of average kappa values for each iteration.
     :rtype: list
     """
@@ -1243,9 +1354,14 @@ def run_total_kappa_by_multiprocessing(
     ]
 
     # Use multiprocessing
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_run_total_kappa_by_multiprocessing, args)
-        average_kappa_list.append(results)
+    results = run_workers(
+        worker_run_total_kappa_by_multiprocessing,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
+    average_kappa_list.append(results)
 
     end_time = time.time()  # Note the end time
     print(
@@ -1320,6 +1436,9 @@ def run_average_mass_by_multiprocessing(
     m_min=None,
     m_max=None,
     z_max=None,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
 ):
     """Calculate the average mass of halos over multiple iterations using
     multiprocessing. This method was built for verify the
@@ -1336,6 +1455,12 @@ def run_average_mass_by_multiprocessing(
     :type m_max: float, optional
     :param z_max: The maximum redshift to consider, defaults to None. If None, uses 5.0
     :type z_max: float, optional
+    :param seed: seed of the iterations, see run_workers()
+    :type seed: int, optional
+    :param checkpoint: name of the checkpoint file, see run_workers()
+    :type checkpoint: str, optional
+    :param resume_from: name of the checkpoint file to resume from, see run_workers()
+    :type resume_from: str, optional
     :return: A list of average mass values for each iteration
     :rtype: list
     """
@@ -1350,12 +1475,15 @@ def run_average_mass_by_multiprocessing(
 
     args = [(i, sky_area, m_min, m_max, z_max) for i in range(n_iterations)]
 
-    with get_context("spawn").Pool() as pool:
-        results = pool.starmap(worker_run_average_mass_by_multiprocessing, args)
-        for result in results:
-            total_mass_sums += (
-                result  # Sum up the mass for each bin across all iterations
-            )
+    results = run_workers(
+        worker_run_average_mass_by_multiprocessing,
+        args,
+        seed=seed,
+        checkpoint=checkpoint,
+        resume_from=resume_from,
+    )
+    for result in results:
+        total_mass_sums += result  # Sum up the mass for each bin across all iterations
 
     average_masses = total_mass_sums / n_iterations
 
@@ -0,0 +1,118 @@
+import os
+import pickle
+import time
+
+import numpy as np
+from astropy.io import fits
+
+
+class LocalButler(object):
+    """Stand-in for the data butler of the LSST Science Pipelines, serving
+    datasets stored as files in a local directory. It allows to run,
+    test and benchmark the injection pipelines (e.g.
+    ~slsim.LsstSciencePipeline.lsst_science_pipeline.multiple_lens_injection_fast)
+    without access to a data repository.
+
+    A dataset of a given type and data id is stored in
+    directory/dataset_type/ as a FITS file, read with the reader of its
+    dataset type (astropy.io.fits.getdata() by default), or as a pickle
+    file otherwise (e.g. the sky map).
+
+    Example with images of the LSST Science Pipelines::
+
+        from lsst.afw.image import ExposureF, ImageU
+
+        butler = LocalButler(
+            "dp0_patches",
+            readers={
+                "deepCoadd": ExposureF.readFits,
+                "calexp": ExposureF.readFits,
+                "deepCoadd_nImage": ImageU.readFits,
+            },
+        )
+        coadd = butler.get("deepCoadd", dataId={"tract": 3828, "patch": 24, "band": "i"})
+    """
+
+    def __init__(self, directory, readers=None, latency=0):
+        """
+
+        :param directory: directory of the datasets (created if needed)
+        :type directory: str
+        :param readers: dictionary of functions reading a FITS file name into
+         a dataset, per dataset type
+        :type readers: dict or None
+        :param latency: time added to each get() call [seconds], e.g. to
+         emulate the access time of a remote data repository in benchmarks
+        :type latency: float
+        """
+        self._directory = directory
+        self._readers = {} if readers is None else readers
+        self._latency = latency
+        os.makedirs(directory, exist_ok=True)
+
+    def filename(self, dataset_type, dataId=None, extension=".fits"):
+        """Name of the file of a dataset.
+
+        :param dataset_type: dataset type, e.g. "deepCoadd"
+        :type dataset_type: str
+        :param dataId: data id, e.g. {"tract": 3828, "patch": 24, "band":
+            "i"}
+        :type dataId: dict or None
+        :param extension: file extension, ".fits" or ".pickle"
+        :return: file name
+        """
+        name = dataset_type
+        if dataId is not None:
+            for key in sorted(dataId):
+                name += "_%s-%s" % (key, dataId[key])
+        return os.path.join(self._directory, dataset_type, name + extension)
+
+    def put(self, obj, dataset_type, dataId=None):
+        """Stores a dataset. Numpy arrays are written to a FITS file, objects
+        with a writeFits() method (e.g. exposures of the LSST Science
+        Pipelines) with that method, and other objects to a pickle file.
+
+        :param obj: dataset
+        :param dataset_type: dataset type
+        :type dataset_type: str
+        :param dataId: data id
+        :type dataId: dict or None
+        """
+        os.makedirs(os.path.join(self._directory, dataset_type), exist_ok=True)
+        if isinstance(obj, np.ndarray):
+            fits.writeto(self.filename(dataset_type, dataId), obj, overwrite=True)
+        elif hasattr(obj, "writeFits"):
+            obj.writeFits(self.filename(dataset_type, dataId))
+        else:
+            with open(self.filename(dataset_type, dataId, ".pickle"), "wb") as f:
+                pickle.dump(obj, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def get(self, dataset_type, dataId=None, parameters=None):
+        """Reads a dataset, like Butler.get().
+
+        :param dataset_type: dataset type
+        :type dataset_type: str
+        :param dataId: data id
+        :type dataId: dict or None
+        :param parameters: optional {"bbox": bbox} selecting a cutout of the
+            dataset, where bbox indexes the dataset (e.g. a ~lsst.geom.Box2I
+            for an exposure or a tuple of slices for a numpy array)
+        :type parameters: dict or None
+        :return: dataset
+        """
+        if self._latency > 0:
+            time.sleep(self._latency)
+        filename = self.filename(dataset_type, dataId)
+        if os.path.exists(filename):
+            obj = self._readers.get(dataset_type, fits.getdata)(filename)
+        elif os.path.exists(self.filename(dataset_type, dataId, ".pickle")):
+            with open(self.filename(dataset_type, dataId, ".pickle"), "rb") as f:
+                obj = pickle.load(f)
+        else:
+            raise LookupError(
+                "Dataset %s with data id %s not found in %s."
+                % (dataset_type, dataId, self._directory)
+            )
+        if parameters is not None and "bbox" in parameters:
+            obj = obj[parameters["bbox"]]
+        return obj
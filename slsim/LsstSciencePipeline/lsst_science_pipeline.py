@@ -12,10 +12,13 @@ from slsim.image_simulation import point_source_coordinate_properties
 from slsim.Util.param_util import (
     random_ra_dec,
     fits_append_table,
-    detect_object,
+    empty_sky_map,
 )
+from slsim.Util.prefetch import prefetch
+from slsim.Util.table_io import ImageTableWriter
 import h5py
 import os
+from contextlib import nullcontext
 
 try:
     import lsst.geom as geom
@@ -182,7 +185,7 @@ def lens_inejection(
     return t
 
 
-def get_dp0_images(butler, ra, dec, band_list, coadd_injection):
+def get_dp0_images(butler, ra, dec, band_list, coadd_injection, random_state=None):
     """Retrieve coadd or visit images for the given bands.
 
     :param butler: butler object
@@ -192,9 +195,13 @@ def get_dp0_images(butler, ra, dec, band_list, coadd_injection):
         injected.
     :param coadd_injection: Boolean. If True, queries the DP0 coadd
         image and if False, queries the single visit DP0 images.
+    :param random_state: ~numpy.random.RandomState choosing the single
+        visit images. If None, the global numpy random state is used.
     :return: coadd or single visit image, number of images in coadd,
         magnitude zero point, and variance map in specified bands.
     """
+    if random_state is None:
+        random_state = np.random
     skymap = butler.get("skyMap")
     point = geom.SpherePoint(ra, dec, geom.degrees)
     # cutoutSize = geom.ExtentI(num_pix, num_pix)
@@ -211,7 +218,7 @@ def get_dp0_images(butler, ra, dec, band_list, coadd_injection):
 
         if not coadd_injection:
             visit_info = coadd_image.getInfo().getCoaddInputs().ccds
-            index = np.random.randint(0, len(visit_info))
+            index = random_state.randint(0, len(visit_info))
             dataId_visit = {
                 "visit": visit_info[index]["visit"],
                 "detector": visit_info[index]["ccd"],
@@ -267,6 +274,7 @@ def lens_inejection_fast(
     center_box_size=3,
     center_source_snr_threshold=5,
     false_positive=False,
+    dp0_images=None,
 ):
     """Chooses a random lens from the lens population and injects it to a DC2
     cutout image. For this one needs to provide a butler to this function. To
@@ -303,6 +311,8 @@ def lens_inejection_fast(
      population is a false popitive poulation. False positive contains an
      elliptical galaxy at the center and blue galaxies around this central galaxy.
      for more detail, please see: slsim/FalsePositives/
+    :param dp0_images: images of the patch in the bands of band_list, as returned
+     by get_dp0_images(). If None, they are read with the butler.
     :returns: An astropy table containing Injected lens in r-band, DC2
         cutout image in r-band, cutout image with injected lens in r, g
         , and i band
@@ -315,30 +325,49 @@ def lens_inejection_fast(
         kwargs_lens_cut = lens_cut
 
     rgb_band_list = band_list
-    coadd, coadd_nImage, mag_zero_visit, variance_map = get_dp0_images(
-        butler=butler,
-        ra=ra,
-        dec=dec,
-        band_list=rgb_band_list,
-        coadd_injection=coadd_injection,
-    )
+    if dp0_images is None:
+        dp0_images = get_dp0_images(
+            butler=butler,
+            ra=ra,
+            dec=dec,
+            band_list=rgb_band_list,
+            coadd_injection=coadd_injection,
+        )
+    coadd, coadd_nImage, mag_zero_visit, variance_map = dp0_images
     bbox = coadd[0].getBBox()
     xmin, ymin = bbox.getBegin()
     xmax, ymax = bbox.getEnd()
     wcs = coadd[0].getWcs()
 
-    valid_cutouts = 0
+    # cutout centers whose central box contains no object in any band, from the
+    # summed-area tables of the patch images
+    empty_sky = np.ones((ymax - ymin, xmax - xmin), dtype=bool)
+    for j in range(len(band_list)):
+        empty_sky &= empty_sky_map(
+            coadd[j].image.array,
+            variance_map[j].array,
+            pixel_scale=pixel_scale,
+            box_size_arcsec=center_box_size,
+            snr_threshold=center_source_snr_threshold,
+        )
+    y_empty, x_empty = np.nonzero(empty_sky[150:-150, 150:-150])
+    if len(x_empty) == 0:
+        raise ValueError(
+            "The patch at ra=%s, dec=%s contains no cutout center without object."
+            % (ra, dec)
+        )
+
     table = []
-    # for i in range(len(x_center)):
-    while valid_cutouts < num_cutout_per_patch:
-        # Randomly select a position for the cutout
-        x_center = np.random.randint(xmin + 150, xmax - 150)
-        y_center = np.random.randint(ymin + 150, ymax - 150)
+    for cutout_index in range(num_cutout_per_patch):
+        # Randomly select a position for the cutout among the empty centers
+        index = np.random.randint(len(x_empty))
+        x_center = int(xmin + 150 + x_empty[index])
+        y_center = int(ymin + 150 + y_empty[index])
         cutout_bbox = generate_cutout_bbox(
             x_center=x_center, y_center=y_center, num_pix=num_pix
         )
         if isinstance(lens_pop, list):
-            lens_class = lens_pop[valid_cutouts]
+            lens_class = lens_pop[cutout_index]
         else:
             if false_positive is False:
                 lens_class = lens_pop.select_lens_at_random(**kwargs_lens_cut)
@@ -351,20 +380,8 @@ def lens_inejection_fast(
             [],
             [],
         )
-        is_valid = True
         for j, band in enumerate(band_list):
             cutout_image = coadd[j][cutout_bbox]
-            cutout_variance = variance_map[j][cutout_bbox]
-            # Check for existing objects in the cutout image
-            if detect_object(
-                cutout_image.image.array,
-                cutout_variance.array,
-                pixel_scale=pixel_scale,
-                box_size_arcsec=center_box_size,
-                snr_threshold=center_source_snr_threshold,
-            ):
-                is_valid = False
-                break  # Discard this cutout and try again
             if noise is True:
                 if coadd_injection is True:
                     exposure_map = 30 * coadd_nImage[j][cutout_bbox].array
@@ -394,26 +411,24 @@ def lens_inejection_fast(
             cutout_image_list.append(cutout_image.image.array)
             lens_image.append((final_injected_image - cutout_image.image.array))
             lens_id.append(lens_class.generate_id())
-        if is_valid:
-            # Define column names dynamically based on band_list
-            prefix = "injected_object" if false_positive else "injected_lens"
-            column_names = (
-                ["lens_id", "lens", "cutout_image"]
-                + [f"{prefix}_{band}" for band in band_list]
-                + ["cutout_center"]
-            )
+        # Define column names dynamically based on band_list
+        prefix = "injected_object" if false_positive else "injected_lens"
+        column_names = (
+            ["lens_id", "lens", "cutout_image"]
+            + [f"{prefix}_{band}" for band in band_list]
+            + ["cutout_center"]
+        )
 
-            # Construct row data dynamically
-            data = (
-                [[[lens_id[0]]], [lens_image[0]], [cutout_image_list[0]]]
-                + [[img] for img in injected_final_image]
-                + [[box_center[0]]]
-            )
+        # Construct row data dynamically
+        data = (
+            [[[lens_id[0]]], [lens_image[0]], [cutout_image_list[0]]]
+            + [[img] for img in injected_final_image]
+            + [[box_center[0]]]
+        )
 
-            # Create Table instance
-            table_1 = Table(data, names=column_names)
-            table.append(table_1)
-            valid_cutouts += 1  # Increase count of successful cutouts
+        # Create Table instance
+        table_1 = Table(data, names=column_names)
+        table.append(table_1)
     lens_catalog = vstack(table)
     return lens_catalog
 
@@ -475,6 +490,8 @@ def multiple_lens_injection_fast(
     center_source_snr_threshold=5,
     output_file=None,
     false_positive=False,
+    max_prefetch=0,
+    n_threads=1,
 ):
     """Injects random lenses from the lens population to multiple DC2 cutout
     images using lens_inejection_fast function. For this one needs to provide a
@@ -505,51 +522,90 @@ def multiple_lens_injection_fast(
     :param center_source_snr_threshold: SNR threshold for object
         detection in center box (default is 5).
     :param output_file: path to the output FITS file where data will be
-        saved
+        saved. If it ends with ".h5" or ".hdf5", the tables are appended
+        to a HDF5 file in blocks, see ~slsim.Util.table_io.ImageTableWriter
     :param false_positive: Boolean. If false, code assumes that the provided
      population is a lens population. If True, code assumes that the provided
      population is a false popitive poulation.
+    :param max_prefetch: number of patches whose images are read with the butler in
+     background threads while the lenses are injected into the current patch, such
+     that the reads overlap with the injection. At most max_prefetch + 1 patches are
+     held in memory. If 0, the patches are read one after the other.
+    :param n_threads: number of background threads reading the patches
     :returns: An astropy table containing Injected lenses in r-band, DC2
         cutout images in r-band, cutout images with injected lens in r,
         g , and i band for a given set of ra and dec. If output_file
         path is provided, it saves this astropy table in fits file with
         the given name.
     """
-    injected_images = []
-    for i in range(len(ra)):
-        if isinstance(lens_pop, list):
-            lens_pop_array = np.array(lens_pop)
-            lens_pop_group = lens_pop_array.reshape(len(ra), num_cutout_per_patch)
-            _lens_pop = list(lens_pop_group[i])
-        else:
-            _lens_pop = lens_pop
-        injected_image = lens_inejection_fast(
-            _lens_pop,
-            num_pix,
-            mag_zero_point,
-            transform_pix2angle,
-            butler,
-            ra[i],
-            dec[i],
-            num_cutout_per_patch,
-            lens_cut=lens_cut,
-            noise=noise,
-            coadd_injection=coadd_injection,
-            coadd_year=coadd_year,
+
+    def read_patch(i):
+        return get_dp0_images(
+            butler=butler,
+            ra=ra[i],
+            dec=dec[i],
             band_list=band_list,
-            center_box_size=center_box_size,
-            center_source_snr_threshold=center_source_snr_threshold,
-            false_positive=false_positive,
+            coadd_injection=coadd_injection,
+            random_state=random_states[i],
         )
-        if output_file is None:
-            injected_images.append(injected_image)
-        else:
-            first_table = not os.path.exists(output_file)
-            if first_table:
-                injected_image.write(output_file, overwrite=True)
-                first_table = False
+
+    if max_prefetch > 0:
+        # the single visits are chosen with random states seeded in the calling
+        # thread, such that the draws do not depend on the timing of the threads
+        random_states = [
+            np.random.RandomState(seed)
+            for seed in np.random.randint(2**31 - 1, size=len(ra))
+        ]
+        patches = prefetch(
+            read_patch, range(len(ra)), max_prefetch=max_prefetch, n_threads=n_threads
+        )
+    else:
+        # the images are read by lens_inejection_fast()
+        patches = [None] * len(ra)
+    injected_images = []
+    if output_file is not None and output_file.endswith((".h5", ".hdf5")):
+        # the buffered rows are written even if an injection fails
+        writer_context = ImageTableWriter(output_file, mode="a")
+    else:
+        writer_context = nullcontext()
+    with writer_context as writer:
+        for i, dp0_images in enumerate(patches):
+            if isinstance(lens_pop, list):
+                lens_pop_array = np.array(lens_pop)
+                lens_pop_group = lens_pop_array.reshape(len(ra), num_cutout_per_patch)
+                _lens_pop = list(lens_pop_group[i])
             else:
-                fits_append_table(output_file, injected_image)
+                _lens_pop = lens_pop
+            injected_image = lens_inejection_fast(
+                _lens_pop,
+                num_pix,
+                mag_zero_point,
+                transform_pix2angle,
+                butler,
+                ra[i],
+                dec[i],
+                num_cutout_per_patch,
+                lens_cut=lens_cut,
+                noise=noise,
+                coadd_injection=coadd_injection,
+                coadd_year=coadd_year,
+                band_list=band_list,
+                center_box_size=center_box_size,
+                center_source_snr_threshold=center_source_snr_threshold,
+                false_positive=false_positive,
+                dp0_images=dp0_images,
+            )
+            if output_file is None:
+                injected_images.append(injected_image)
+            elif writer is not None:
+                writer.add_table(injected_image)
+            else:
+                first_table = not os.path.exists(output_file)
+                if first_table:
+                    injected_image.write(output_file, overwrite=True)
+                    first_table = False
+                else:
+                    fits_append_table(output_file, injected_image)
     if len(injected_images) > 1:
         injected_image_catalog = vstack(injected_images)
         return injected_image_catalog
@@ -567,6 +623,9 @@ def add_object(
     calibFluxRadius=None,
     image_type="dp0",
     coadd_year=5,
+    convolution_type="fft",
+    dtype=np.float64,
+    stamp_cache=None,
 ):
     """Injects a given object in a dp0 cutout image or SLSimObject.
 
@@ -588,6 +647,13 @@ def add_object(
     :param image_type: dp0 or slsim_object.
     :param coadd_year: Year for the coadd images. This parameter is used to rescale the
      noise properties of 5 year dp0 coadd images to desired year of coadd.
+    :param convolution_type: method to convolve the lens image with the PSF kernel,
+     see ~slsim.Util.param_util.convolved_image()
+    :param dtype: data type of the returned image, e.g. np.float32. The lens image
+     is computed in double precision.
+    :param stamp_cache: if not None, the noiseless image of the deflector and extended
+     source is taken from or added to this cache, such that the same lens injected
+     into many backgrounds is rendered once, see ~slsim.Util.stamp_cache.StampCache
     :returns: an image with injected source
     """
     if image_type == "dp0":
@@ -623,6 +689,8 @@ def add_object(
         psf_kernel=psf_ker,
         transform_pix2angle=transform_pix2angle,
         exposure_time=exposure_time,
+        convolution_type=convolution_type,
+        stamp_cache=stamp_cache,
     )
     objects = [(lens_im, delta_pix)]
     for lens, pix_scale in objects:
@@ -651,7 +719,7 @@ def add_object(
                 use_noise_diff=True,
             )
             injected_image = degraded_image[0] + lens
-            return injected_image
+            return injected_image.astype(dtype, copy=False)
 
 
 def cutout_image_psf_kernel(
@@ -953,24 +1021,35 @@ def multiple_dp0_time_series_images_data(
     :param radius: radius for query
     :param band: imaging band
     :param size: cutout size of images
+    :param output_file: path to the output FITS file where data will be
+        saved. If it ends with ".h5" or ".hdf5", the tables are appended
+        to a HDF5 file in blocks, see ~slsim.Util.table_io.ImageTableWriter
     :return: List of astropy table containg time series images and other
         information. If output_file path is provided, it saves list of
         these astropy table in fits file with the given name.
     """
     expo_data_list = []
-    for center_coords in center_coords_list:
-        time_series_data = dp0_time_series_images_data(
-            butler, center_coords, radius=radius, band=band, size=size
-        )
-        if output_file is None:
-            expo_data_list.append(time_series_data)
-        else:
-            first_table = not os.path.exists(output_file)
-            if first_table:
-                time_series_data.write(output_file, overwrite=True)
-                first_table = False
+    if output_file is not None and output_file.endswith((".h5", ".hdf5")):
+        # the buffered rows are written even if an injection fails
+        writer_context = ImageTableWriter(output_file, mode="a")
+    else:
+        writer_context = nullcontext()
+    with writer_context as writer:
+        for center_coords in center_coords_list:
+            time_series_data = dp0_time_series_images_data(
+                butler, center_coords, radius=radius, band=band, size=size
+            )
+            if output_file is None:
+                expo_data_list.append(time_series_data)
+            elif writer is not None:
+                writer.add_table(time_series_data)
             else:
-                fits_append_table(output_file, time_series_data)
+                first_table = not os.path.exists(output_file)
+                if first_table:
+                    time_series_data.write(output_file, overwrite=True)
+                    first_table = False
+                else:
+                    fits_append_table(output_file, time_series_data)
     if len(time_series_data) > 1:
         return expo_data_list
     return None
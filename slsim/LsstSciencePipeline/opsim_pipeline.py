@@ -1,9 +1,122 @@
+import os
 import numpy as np
 from astropy.table import Table
-import lenstronomy.Util.util as util
 import lenstronomy.Util.kernel_util as kernel_util
 import lenstronomy.Util.data_util as data_util
 
+# kernel banks shared by the tables with the same PSF kernel parameters
+_kernel_banks = {}
+
+
+class PSFKernelBank(object):
+    """Moffat PSF kernels on a grid of FWHM values quantized in steps of
+    fwhm_step. Each kernel is computed at its first request and reused, such
+    that the exposures of an OpSim time series (and of all the time series
+    with the same parameters) only store the index of their kernel.
+
+    Example::
+
+        kernel_bank = PSFKernelBank(num_pix=101, delta_pix=0.2, moffat_beta=3.1)
+        indices = kernel_bank.index(psf_fwhm)
+        psf_kernel = kernel_bank.kernel(indices[0])
+    """
+
+    def __init__(self, num_pix=101, delta_pix=0.2, moffat_beta=3.1, fwhm_step=0.01):
+        """
+
+        :param num_pix: number of pixels per axis of the kernels
+        :param delta_pix: size of pixel in units arcseonds
+        :param moffat_beta: power index of the moffat psf kernel
+        :param fwhm_step: quantization step of the FWHM [arcsec]
+        """
+        self._num_pix = num_pix
+        self._delta_pix = delta_pix
+        self._moffat_beta = moffat_beta
+        self._fwhm_step = fwhm_step
+        self._kernels = {}
+
+    @classmethod
+    def from_meta(cls, meta):
+        """Kernel bank described by the meta data of a table written by
+        opsim_time_series_images_data(), shared between the tables with the
+        same parameters.
+
+        :param meta: table meta data, see PSFKernelBank.meta
+        :return: PSFKernelBank instance
+        """
+        key = (
+            int(meta["psf_num_pix"]),
+            float(meta["delta_pix"]),
+            float(meta["moffat_beta"]),
+            float(meta["psf_fwhm_step"]),
+        )
+        if key not in _kernel_banks:
+            _kernel_banks[key] = cls(*key)
+        return _kernel_banks[key]
+
+    @property
+    def meta(self):
+        """Parameters of the kernel bank, stored in the meta data of the
+        tables."""
+        return {
+            "psf_num_pix": self._num_pix,
+            "delta_pix": self._delta_pix,
+            "moffat_beta": self._moffat_beta,
+            "psf_fwhm_step": self._fwhm_step,
+        }
+
+    def index(self, fwhm):
+        """Indices of the kernels of the quantized FWHM values.
+
+        :param fwhm: FWHM of the PSF [arcsec]
+        :type fwhm: float or array
+        :return: kernel index or array of kernel indices
+        """
+        return np.maximum(np.round(np.asarray(fwhm) / self._fwhm_step), 1).astype(int)
+
+    def kernel(self, index):
+        """Pixel PSF kernel of a given index.
+
+        :param index: kernel index
+        :type index: int
+        :return: normalized kernel of shape (num_pix, num_pix)
+        """
+        index = int(index)
+        if index not in self._kernels:
+            psf_kernel = kernel_util.kernel_moffat(
+                num_pix=self._num_pix,
+                delta_pix=self._delta_pix,
+                fwhm=index * self._fwhm_step,
+                moffat_beta=self._moffat_beta,
+            )
+            self._kernels[index] = np.reshape(
+                psf_kernel, (self._num_pix, self._num_pix)
+            )
+        return self._kernels[index]
+
+    def kernels(self, indices):
+        """Pixel PSF kernels of given indices. Exposures with the same index
+        share the same kernel array.
+
+        :param indices: kernel indices
+        :return: list of kernels of shape (num_pix, num_pix)
+        """
+        return [self.kernel(index) for index in indices]
+
+
+def exposure_psf_kernels(exposure_data):
+    """PSF kernels of the exposures of a table, taken from its "psf_kernel"
+    column or resolved from its "psf_kernel_index" column with the kernel
+    bank described by its meta data (see PSFKernelBank).
+
+    :param exposure_data: astropy table of exposure data
+    :return: PSF kernels, one per row
+    """
+    if "psf_kernel" in exposure_data.colnames:
+        return exposure_data["psf_kernel"]
+    kernel_bank = PSFKernelBank.from_meta(exposure_data.meta)
+    return kernel_bank.kernels(exposure_data["psf_kernel_index"])
+
 
 def opsim_time_series_images_data(
     ra_list,
@@ -17,6 +130,9 @@ def opsim_time_series_images_data(
     delta_pix=0.2,
     print_warning=True,
     opsim_path=None,
+    psf_fwhm_step=0.01,
+    compact_psf=True,
+    visit_cache=None,
 ):
     """Creates time series data from opsim database.
 
@@ -36,47 +152,79 @@ def opsim_time_series_images_data(
         footprint
     :param opsim_path: optional: provide a path to the opsim database.
         if None: use "../data/OpSim_database/" + obs_strategy + ".db" as default path.
+    :param psf_fwhm_step: quantization step of the PSF FWHM [arcsec]. The Moffat
+        kernels are computed once per quantized FWHM, see PSFKernelBank.
+    :param compact_psf: if True, the tables store the index of the PSF kernel of each
+        exposure ("psf_kernel_index" column) and the parameters of the kernel bank
+        in their meta data, see exposure_psf_kernels(). If False, they store the
+        kernels ("psf_kernel" column).
+    :param visit_cache: optional
+        ~slsim.LsstSciencePipeline.opsim_visit_cache.OpSimVisitCache. If provided,
+        the visits are read from the cache, which only queries the OpSim database
+        for the sky tiles it does not contain yet. obs_strategy and opsim_path must
+        then match the observing strategy and the database of the cache, if given.
     :return: a list of astropy tables containing observation information for each
         coordinate
     """
 
-    # Import OpSimSummaryV2
-    try:
-        import opsimsummaryv2 as op
-    except ImportError:
-        raise ImportError(
-            "Users need to have OpSimSummaryV2 installed (https://github.com/bastiencarreres/OpSimSummaryV2)"
-        )
+    if visit_cache is not None:
+        if visit_cache.obs_strategy not in [None, obs_strategy]:
+            raise ValueError(
+                "The visit cache contains the visits of the observing strategy %s, "
+                "not %s." % (visit_cache.obs_strategy, obs_strategy)
+            )
+        if (
+            opsim_path is not None
+            and visit_cache.opsim_path is not None
+            and os.path.abspath(opsim_path) != os.path.abspath(visit_cache.opsim_path)
+        ):
+            raise ValueError(
+                "The visit cache queries the OpSim database %s, not %s."
+                % (visit_cache.opsim_path, opsim_path)
+            )
+        # visit sequences sorted by observation time, read from the cache
+        sequences = visit_cache.visits(ra_list, dec_list)
+    else:
+        # Import OpSimSummaryV2
+        try:
+            import opsimsummaryv2 as op
+        except ImportError:
+            raise ImportError(
+                "Users need to have OpSimSummaryV2 installed (https://github.com/bastiencarreres/OpSimSummaryV2)"
+            )
 
-    # Initialise OpSimSummaryV2 with opsim database
-    if opsim_path is None:
-        opsim_path = "../data/OpSim_database/" + obs_strategy + ".db"
-    try:
-        OpSimSurv = op.OpSimSurvey(opsim_path)
-    except FileNotFoundError:
-        raise FileNotFoundError(
-            "File not found: "
-            + opsim_path
-            + ". Input variable 'obs_strategy' should correspond to the name of an opsim database saved in the folder ../data/OpSim_database"
-        )
+        # Initialise OpSimSummaryV2 with opsim database
+        if opsim_path is None:
+            opsim_path = "../data/OpSim_database/" + obs_strategy + ".db"
+        try:
+            OpSimSurv = op.OpSimSurvey(opsim_path)
+        except FileNotFoundError:
+            raise FileNotFoundError(
+                "File not found: "
+                + opsim_path
+                + ". Input variable 'obs_strategy' should correspond to the name of an opsim database saved in the folder ../data/OpSim_database"
+            )
 
-    # Collect observations that cover the coordinates in ra_list and dec_list
-    gen = OpSimSurv.get_obs_from_coords(
-        ra_list,
-        dec_list,
-        is_deg=True,
-        formatobs=True,
-        keep_keys=["visitExposureTime", "seeingFwhmGeom", "fieldRA", "fieldDec"],
-    )
+        # Collect observations that cover the coordinates in ra_list and dec_list
+        gen = OpSimSurv.get_obs_from_coords(
+            ra_list,
+            dec_list,
+            is_deg=True,
+            formatobs=True,
+            keep_keys=["visitExposureTime", "seeingFwhmGeom", "fieldRA", "fieldDec"],
+        )
+        sequences = (next(gen).sort_values(by=["expMJD"]) for _ in range(len(ra_list)))
 
     table_data_list = []
+    kernel_bank = PSFKernelBank(
+        num_pix=num_pix,
+        delta_pix=delta_pix,
+        moffat_beta=moffat_beta,
+        fwhm_step=psf_fwhm_step,
+    )
 
     # Loop through all coordinates and compute the table_data
-    for i in range(len(ra_list)):
-
-        # Collect the next observation sequence from the opsim generator
-        seq = next(gen)
-        seq = seq.sort_values(by=["expMJD"])
+    for i, seq in enumerate(sequences):
 
         # Check if the coordinates are in the opsim LSST footprint
         opsim_ra = np.mean(seq["fieldRA"])
@@ -105,19 +253,13 @@ def opsim_time_series_images_data(
 
         radec_list = [(ra_list[i], dec_list[i])] * len(obs_time)
 
-        # Create a Moffat psf kernel for each epoch
-
-        psf_kernels = []
-
-        for psf in psf_fwhm:
-            psf_kernel = kernel_util.kernel_moffat(
-                num_pix=num_pix, delta_pix=delta_pix, fwhm=psf, moffat_beta=moffat_beta
-            )
-            psf_kernel = util.array2image(psf_kernel)
-
-            psf_kernels.append(psf_kernel)
-
-        psf_kernels = np.array(psf_kernels)
+        # Moffat psf kernel of each epoch, computed once per quantized FWHM
+        psf_kernel_index = kernel_bank.index(psf_fwhm)
+        if compact_psf:
+            psf_column, psf_name = psf_kernel_index, "psf_kernel_index"
+        else:
+            psf_column = np.array(kernel_bank.kernels(psf_kernel_index))
+            psf_name = "psf_kernel"
 
         # Calculate background noise
         bkg_noise = data_util.bkg_noise(
@@ -127,7 +269,7 @@ def opsim_time_series_images_data(
         table_data = Table(
             [
                 bkg_noise,
-                psf_kernels,
+                psf_column,
                 obs_time,
                 expo_time,
                 zero_point_mag,
@@ -136,7 +278,7 @@ def opsim_time_series_images_data(
             ],
             names=(
                 "bkg_noise",
-                "psf_kernel",
+                psf_name,
                 "obs_time",
                 "expo_time",
                 "zero_point",
@@ -144,6 +286,8 @@ def opsim_time_series_images_data(
                 "band",
             ),
         )
+        if compact_psf:
+            table_data.meta.update(kernel_bank.meta)
 
         table_data_list.append(table_data)
     return table_data_list
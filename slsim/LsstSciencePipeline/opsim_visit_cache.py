@@ -0,0 +1,263 @@
+import hashlib
+import os
+
+import h5py
+import numpy as np
+
+# visit properties queried from the OpSim database for each sky position
+VISIT_COLUMNS = [
+    "expMJD",
+    "BAND",
+    "ZPT",
+    "SKYSIG",
+    "seeingFwhmGeom",
+    "visitExposureTime",
+    "fieldRA",
+    "fieldDec",
+]
+
+
+class OpSimVisitCache(object):
+    """Persistent cache of the OpSim visit sequences of sky positions,
+    stored in a HDF5 file with one group of columns per sky tile.
+
+    The sky is divided into iso-latitude tiles of about tile_size x
+    tile_size degrees (see sky_tile_index()). The visits of a tile are
+    queried once, at the tile center, and all the positions within the
+    tile share them. With tiles much smaller than the LSST field of view,
+    the visit sequences only differ from those of the exact positions
+    near the edges of the fields. Repeated experiments over the same
+    footprint then read the visits from the file instead of scanning the
+    OpSim database.
+
+    Example::
+
+        visit_cache = OpSimVisitCache(
+            "opsim_visits.h5", opsim_path="baseline_v3.0_10yrs.db"
+        )
+        opsim_data = opsim_time_series_images_data(
+            ra_list, dec_list, "baseline_v3.0_10yrs", visit_cache=visit_cache
+        )
+    """
+
+    def __init__(
+        self, filename, opsim_path=None, tile_size=0.1, query=None, obs_strategy=None
+    ):
+        """
+
+        :param filename: name of the HDF5 file of the cache (created if needed)
+        :type filename: str
+        :param opsim_path: path to the OpSim database, queried with
+         OpSimSummaryV2 for the tiles that are not cached yet. The hash of its
+         content is stored in the file and must match the one of an existing
+         file.
+        :type opsim_path: str or None
+        :param tile_size: size of the sky tiles [degrees]. It must match the
+         tile size of an existing file.
+        :type tile_size: float
+        :param query: function of arrays of ra and dec (in degrees) returning
+         the visit sequences at these positions, as dictionaries of column
+         names and arrays. If None, the OpSim database at opsim_path is
+         queried, see OpSimSummaryQuery.
+        :param obs_strategy: name of the observing strategy, e.g.
+         "baseline_v3.0_10yrs". If None, the name of the opsim_path file
+         without extension. It must match the strategy of an existing file.
+        :type obs_strategy: str or None
+        """
+        if obs_strategy is None and opsim_path is not None:
+            obs_strategy = os.path.splitext(os.path.basename(opsim_path))[0]
+        self._filename = filename
+        self._tile_size = tile_size
+        self.opsim_path = opsim_path
+        self.obs_strategy = obs_strategy
+        if query is None:
+            query = OpSimSummaryQuery(opsim_path)
+        self._query = query
+        attrs = {"tile_size": tile_size}
+        if obs_strategy is not None:
+            attrs["obs_strategy"] = obs_strategy
+        if opsim_path is not None:
+            attrs["opsim_hash"] = opsim_database_hash(opsim_path)
+        with h5py.File(filename, "a") as f:
+            file_attrs = {name: f.attrs.setdefault(name, attrs[name]) for name in attrs}
+        if not np.isclose(file_attrs["tile_size"], tile_size):
+            raise ValueError(
+                "The cache %s has a tile size of %s degrees, not %s."
+                % (filename, file_attrs["tile_size"], tile_size)
+            )
+        if file_attrs.get("obs_strategy", obs_strategy) != obs_strategy:
+            raise ValueError(
+                "The cache %s contains the visits of the observing strategy %s, "
+                "not %s." % (filename, file_attrs["obs_strategy"], obs_strategy)
+            )
+        if file_attrs.get("opsim_hash") != attrs.get("opsim_hash"):
+            raise ValueError(
+                "The cache %s was written from another OpSim database than %s."
+                % (filename, opsim_path)
+            )
+
+    def visits(self, ra, dec):
+        """Visit sequences of sky positions, sorted by observation time. The
+        tiles not cached yet are queried at once and added to the file.
+
+        :param ra: ra of the positions [degrees]
+        :param dec: dec of the positions [degrees]
+        :return: list of dictionaries of column names and arrays, one per
+            position
+        """
+        tiles = sky_tile_index(ra, dec, self._tile_size)
+        unique_tiles = np.unique(tiles)
+        with h5py.File(self._filename, "a") as f:
+            group = f.require_group("tiles")
+            missing_tiles = [tile for tile in unique_tiles if str(tile) not in group]
+            if len(missing_tiles) > 0:
+                ra_center, dec_center = sky_tile_center(missing_tiles, self._tile_size)
+                for tile, visits in zip(
+                    missing_tiles, self._query(ra_center, dec_center)
+                ):
+                    _write_tile(group, str(tile), visits)
+            tile_visits = {tile: _read_tile(group[str(tile)]) for tile in unique_tiles}
+        return [tile_visits[tile] for tile in tiles]
+
+    def __contains__(self, position):
+        """Whether the visits of the tile of a (ra, dec) position are cached."""
+        tile = sky_tile_index(position[0], position[1], self._tile_size)
+        with h5py.File(self._filename, "r") as f:
+            return "tiles" in f and str(tile) in f["tiles"]
+
+
+class OpSimSummaryQuery(object):
+    """Query function of OpSimVisitCache reading an OpSim database with
+    OpSimSummaryV2. The database is opened at the first query."""
+
+    def __init__(self, opsim_path):
+        """
+
+        :param opsim_path: path to the OpSim database
+        :type opsim_path: str
+        """
+        self._opsim_path = opsim_path
+        self._opsim_survey = None
+
+    def __call__(self, ra, dec):
+        """Visit sequences of sky positions.
+
+        :param ra: ra of the positions [degrees]
+        :param dec: dec of the positions [degrees]
+        :return: generator of dictionaries of column names (VISIT_COLUMNS)
+            and arrays, one per position
+        """
+        if self._opsim_survey is None:
+            try:
+                import opsimsummaryv2 as op
+            except ImportError:
+                raise ImportError(
+                    "Users need to have OpSimSummaryV2 installed (https://github.com/bastiencarreres/OpSimSummaryV2)"
+                )
+            self._opsim_survey = op.OpSimSurvey(self._opsim_path)
+        sequences = self._opsim_survey.get_obs_from_coords(
+            ra,
+            dec,
+            is_deg=True,
+            formatobs=True,
+            keep_keys=["visitExposureTime", "seeingFwhmGeom", "fieldRA", "fieldDec"],
+        )
+        for _ in range(len(ra)):
+            seq = next(sequences)
+            yield {name: np.array(seq[name]) for name in VISIT_COLUMNS}
+
+
+def opsim_database_hash(opsim_path, block_size=2**20):
+    """SHA-256 hash of the content of an OpSim database file, identifying the
+    database of the visits stored in an OpSimVisitCache.
+
+    :param opsim_path: path to the OpSim database
+    :type opsim_path: str
+    :param block_size: number of bytes read at once
+    :type block_size: int
+    :return: hexadecimal digest
+    """
+    digest = hashlib.sha256()
+    with open(opsim_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def sky_tile_index(ra, dec, tile_size):
+    """Index of the iso-latitude sky tile containing sky positions. The sky
+    is divided into rings of tile_size degrees in dec, and each ring into
+    tiles of about tile_size degrees in ra, such that the tiles have
+    approximately equal areas.
+
+    :param ra: ra of the positions [degrees]
+    :param dec: dec of the positions [degrees]
+    :param tile_size: size of the tiles [degrees]
+    :return: tile index or array of tile indices
+    """
+    num_rings = int(np.ceil(180 / tile_size))
+    max_num_tiles = int(np.ceil(360 / tile_size))
+    ring = np.clip(
+        np.floor((np.asarray(dec) + 90) / tile_size).astype(int), 0, num_rings - 1
+    )
+    num_tiles = _num_tiles_in_ring(ring, tile_size)
+    tile = np.floor(np.mod(ra, 360) / 360 * num_tiles).astype(int)
+    return ring * max_num_tiles + np.minimum(tile, num_tiles - 1)
+
+
+def sky_tile_center(index, tile_size):
+    """Center of sky tiles, see sky_tile_index().
+
+    :param index: tile index or array of tile indices
+    :param tile_size: size of the tiles [degrees]
+    :return: ra, dec of the tile centers [degrees]
+    """
+    max_num_tiles = int(np.ceil(360 / tile_size))
+    ring, tile = np.divmod(np.asarray(index), max_num_tiles)
+    num_tiles = _num_tiles_in_ring(ring, tile_size)
+    dec = np.minimum(-90 + (ring + 0.5) * tile_size, 90)
+    ra = (tile + 0.5) * 360 / num_tiles
+    return ra, dec
+
+
+def _num_tiles_in_ring(ring, tile_size):
+    """Number of tiles of iso-latitude rings, see sky_tile_index().
+
+    :param ring: ring index or array of ring indices
+    :param tile_size: size of the tiles [degrees]
+    :return: number of tiles
+    """
+    dec = np.minimum(-90 + (np.asarray(ring) + 0.5) * tile_size, 90)
+    return np.maximum(np.ceil(360 * np.cos(np.radians(dec)) / tile_size), 1).astype(int)
+
+
+def _write_tile(group, name, visits):
+    """Writes the visit sequence of a tile to a HDF5 group, sorted by
+    observation time.
+
+    :param group: h5py group of the tiles
+    :param name: name of the tile group
+    :param visits: dictionary of column names and arrays
+    """
+    tile_group = group.create_group(name)
+    order = np.argsort(visits["expMJD"], kind="stable")
+    for column, values in visits.items():
+        values = np.asarray(values)[order]
+        if values.dtype.kind in "USO":
+            values = np.array(values.astype(str), dtype=h5py.string_dtype())
+        tile_group.create_dataset(column, data=values)
+
+
+def _read_tile(tile_group):
+    """Reads the visit sequence of a tile.
+
+    :param tile_group: h5py group of the tile
+    :return: dictionary of column names and arrays
+    """
+    visits = {}
+    for column, dataset in tile_group.items():
+        if h5py.check_string_dtype(dataset.dtype) is not None:
+            visits[column] = dataset.asstr()[:]
+        else:
+            visits[column] = dataset[:]
+    return visits
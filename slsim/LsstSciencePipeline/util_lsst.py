@@ -1,18 +1,32 @@
 import numpy as np
 from astropy.table import Column
 from slsim.image_simulation import lens_image_series, lens_image
+from slsim.Util.table_io import ImageTableWriter
+from slsim.LsstSciencePipeline.opsim_pipeline import exposure_psf_kernels
 from slsim.Util.param_util import (
     fits_append_table,
     convert_mjd_to_days,
     transient_event_time_mjd,
 )
 import os
+from contextlib import nullcontext
 
 
 def variable_lens_injection(
-    lens_class, band, num_pix, transform_pix2angle, exposure_data
+    lens_class,
+    band,
+    num_pix,
+    transform_pix2angle,
+    exposure_data,
+    convolution_type="fft",
+    dtype=np.float64,
+    stamp_cache=None,
+    out=None,
+    injected_out=None,
 ):
-    """Injects variable lens to the dp0 time series data.
+    """Injects variable lens to the dp0 time series data. The "lens" and
+    "injected_lens" columns of the returned table reference the arrays of the
+    image series without copying them.
 
     :param lens_class: Lens() object
     :param band: imaging band
@@ -27,12 +41,26 @@ def variable_lens_injection(
         these are zero point magnitudes for each single exposure images
         in time series image) , psf kernel for each exposure (column
         name should be "psf_kernel", these are pixel psf kernel for each
-        single exposure images in time series image), exposure time
+        single exposure images in time series image, or
+        "psf_kernel_index", see
+        ~slsim.LsstSciencePipeline.opsim_pipeline.PSFKernelBank), exposure time
         (column name should be "expo_time", these are exposure time for
         each single exposure images in time series images), observation
         time (column name should be "obs_time", these are observation
         time in days for each single exposure images in time series
         images)
+    :param convolution_type: method to convolve the lens images with the
+        PSF kernels, see ~slsim.Util.param_util.convolved_image()
+    :param dtype: data type of the lens and injected images stored in
+        the table, e.g. np.float32 to halve its memory
+    :param stamp_cache: if not None, the unconvolved images of the
+        deflector and extended source are taken from or added to this
+        cache, see ~slsim.Util.stamp_cache.StampCache
+    :param out: if not None, array (e.g. a numpy.memmap) of shape
+        (n_exposures, num_pix, num_pix) into which the lens images are
+        written, see ~slsim.image_simulation.lens_image_series()
+    :param injected_out: if not None, array of the same shape into
+        which the injected images are written
     :return: Astropy table of injected lenses and exposure information
         of dp0 data
     """
@@ -50,25 +78,33 @@ def variable_lens_injection(
         band=band,
         mag_zero_point=exposure_data["zero_point"],
         num_pix=num_pix,
-        psf_kernel=exposure_data["psf_kernel"],
+        psf_kernel=exposure_psf_kernels(exposure_data),
         transform_pix2angle=transform_pix2angle,
         exposure_time=exposure_data["expo_time"],
         t_obs=observation_time,
+        convolution_type=convolution_type,
+        dtype=dtype,
+        stamp_cache=stamp_cache,
+        out=out,
     )
-
-    final_image = []
-    for i in range(len(exposure_data["obs_time"])):
-        final_image.append(exposure_data["time_series_images"][i] + lens_images[i])
-    lens_col = Column(name="lens", data=lens_images)
-    final_image_col = Column(name="injected_lens", data=final_image)
+    if injected_out is None:
+        injected_out = np.empty(lens_images.shape, dtype=lens_images.dtype)
+    np.add(
+        np.asarray(exposure_data["time_series_images"]),
+        lens_images,
+        out=injected_out,
+        casting="unsafe",
+    )
+    lens_col = Column(name="lens", data=lens_images, copy=False)
+    final_image_col = Column(name="injected_lens", data=injected_out, copy=False)
     if "lens" in exposure_data.colnames:
-        exposure_data.replace_column("lens", lens_col)
+        exposure_data.replace_column("lens", lens_col, copy=False)
     else:
-        exposure_data.add_column(lens_col)
+        exposure_data.add_column(lens_col, copy=False)
     if "injected_lens" in exposure_data.colnames:
-        exposure_data.replace_column("injected_lens", final_image_col)
+        exposure_data.replace_column("injected_lens", final_image_col, copy=False)
     else:
-        exposure_data.add_column(final_image_col)
+        exposure_data.add_column(final_image_col, copy=False)
     return exposure_data
 
 
@@ -79,6 +115,9 @@ def multiple_variable_lens_injection(
     transform_matrices_list,
     exposure_data_list,
     output_file=None,
+    convolution_type="fft",
+    dtype=np.float64,
+    stamp_cache=None,
 ):
     """Injects multiple variable lenses to multiple dp0 time series data.
 
@@ -102,39 +141,59 @@ def multiple_variable_lens_injection(
         (column name should be "obs_time", these are observation time in
         days for each single exposure images in time series images)
     :param output_file: path to the output FITS file where data will be
-        saved
+        saved. If it ends with ".h5" or ".hdf5", the tables are appended
+        to a HDF5 file in blocks, see ~slsim.Util.table_io.ImageTableWriter
+    :param convolution_type: method to convolve the lens images with the
+        PSF kernels, see ~slsim.Util.param_util.convolved_image().
+        "fft_cached" reuses the FFTs of the kernels between lenses.
+    :param dtype: data type of the lens and injected images, e.g.
+        np.float32 to halve the size of the tables and of the output
+        file
+    :param stamp_cache: if not None, cache of the unconvolved lens
+        images, see ~slsim.Util.stamp_cache.StampCache
     :return: list of astropy table of injected lenses and exposure
         information of dp0 data for each time series lenses. If
         output_file path is provided, it saves list of these astropy
         table in fits file with the given name.
     """
     final_images_catalog = []
-    for lens_class, transform_matrices, expo_data in zip(
-        lens_class_list, transform_matrices_list, exposure_data_list
-    ):
-        variable_injected_image = variable_lens_injection(
-            lens_class,
-            band=band,
-            num_pix=num_pix,
-            transform_pix2angle=transform_matrices,
-            exposure_data=expo_data,
-        )
-        if output_file is None:
-            final_images_catalog.append(variable_injected_image)
-        else:
-            first_table = not os.path.exists(output_file)
-            if first_table:
-                variable_injected_image.write(output_file, overwrite=True)
-                first_table = False
+    if output_file is not None and output_file.endswith((".h5", ".hdf5")):
+        # the buffered rows are written even if an injection fails
+        writer_context = ImageTableWriter(output_file, mode="a")
+    else:
+        writer_context = nullcontext()
+    with writer_context as writer:
+        for lens_class, transform_matrices, expo_data in zip(
+            lens_class_list, transform_matrices_list, exposure_data_list
+        ):
+            variable_injected_image = variable_lens_injection(
+                lens_class,
+                band=band,
+                num_pix=num_pix,
+                transform_pix2angle=transform_matrices,
+                exposure_data=expo_data,
+                convolution_type=convolution_type,
+                dtype=dtype,
+                stamp_cache=stamp_cache,
+            )
+            if output_file is None:
+                final_images_catalog.append(variable_injected_image)
+            elif writer is not None:
+                writer.add_table(variable_injected_image)
             else:
-                fits_append_table(output_file, variable_injected_image)
+                first_table = not os.path.exists(output_file)
+                if first_table:
+                    variable_injected_image.write(output_file, overwrite=True)
+                    first_table = False
+                else:
+                    fits_append_table(output_file, variable_injected_image)
     if len(final_images_catalog) > 1:
         return final_images_catalog
     return None
 
 
 def opsim_variable_lens_injection(
-    lens_class, bands, num_pix, transform_pix2angle, exposure_data
+    lens_class, bands, num_pix, transform_pix2angle, exposure_data, dtype=np.float64
 ):
     """Injects variable lens to the OpSim time series data (1 object).
 
@@ -149,7 +208,9 @@ def opsim_variable_lens_injection(
         of background noise fluctuations (column name should be
         "bkg_noise"), psf kernel for each exposure (column name should
         be "psf_kernel", these are pixel psf kernel for each single
-        exposure images in time series image), observation time (column
+        exposure images in time series image, or "psf_kernel_index",
+        see ~slsim.LsstSciencePipeline.opsim_pipeline.PSFKernelBank),
+        observation time (column
         name should be "obs_time", these are observation time in days
         for each single exposure images in time series images), exposure
         time (column name should be "expo_time", these are exposure time
@@ -160,6 +221,8 @@ def opsim_variable_lens_injection(
         should be "calexp_center"), these are the coordinates in (ra,
         dec), and the band in which the observation is taken (column
         name should be "band").
+    :param dtype: data type of the lens images stored in the table, e.g.
+        np.float32
     :return: Astropy table of injected lenses and exposure information
         of dp0 data
     """
@@ -169,6 +232,8 @@ def opsim_variable_lens_injection(
         min(exposure_data["obs_time"]), max(exposure_data["obs_time"])
     )
     final_image = []
+    # the kernels are resolved from the kernel bank for compact tables
+    psf_kernels = exposure_psf_kernels(exposure_data)
 
     for obs in range(len(exposure_data["obs_time"])):
 
@@ -189,11 +254,12 @@ def opsim_variable_lens_injection(
             band=exposure_data_obs["band"],
             mag_zero_point=exposure_data_obs["zero_point"],
             num_pix=num_pix,
-            psf_kernel=exposure_data_obs["psf_kernel"],
+            psf_kernel=psf_kernels[obs],
             transform_pix2angle=transform_pix2angle,
             exposure_time=exposure_data_obs["expo_time"],
             t_obs=observation_time,
             std_gaussian_noise=std_gaussian_noise,
+            dtype=dtype,
         )
 
         final_image.append(lens_images)
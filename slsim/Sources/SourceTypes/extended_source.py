@@ -76,6 +76,14 @@ class ExtendedSource(object):
 
         return self._source.extended_source_position(reference_postion, draw_area)
 
+    def update_center(self, center_x, center_y):
+        """Sets the extended source position to a given value.
+
+        :param center_x: x-coordinate of the source center [arcsec]
+        :param center_y: y-coordinate of the source center [arcsec]
+        """
+        self._source.update_center(center_x, center_y)
+
     def extended_source_magnitude(self, band):
         """Get the magnitude of the extended source in a specific band.
 
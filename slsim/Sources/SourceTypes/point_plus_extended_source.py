@@ -46,3 +46,13 @@ class PointPlusExtendedSource(PointSource, ExtendedSource):
             cosmo=cosmo,
             **kwargs
         )
+
+    def update_center(self, center_x, center_y):
+        """Sets the position of the host and of the point source (before its
+        offset) to a given value.
+
+        :param center_x: x-coordinate of the source center [arcsec]
+        :param center_y: y-coordinate of the source center [arcsec]
+        """
+        ExtendedSource.update_center(self, center_x, center_y)
+        PointSource.update_center(self, center_x, center_y)
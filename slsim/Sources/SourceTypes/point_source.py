@@ -89,6 +89,15 @@ class PointSource(object):
 
         return self._point_source.point_source_position(reference_position, draw_area)
 
+    def update_center(self, center_x, center_y):
+        """Sets the (host) source position to a given value. The point source
+        position follows this center plus its offset.
+
+        :param center_x: x-coordinate of the source center [arcsec]
+        :param center_y: y-coordinate of the source center [arcsec]
+        """
+        self._point_source.update_center(center_x, center_y)
+
     def point_source_magnitude(self, band, image_observation_times=None):
         """Get the magnitude of the point source in a specific band.
 
@@ -67,6 +67,18 @@ class SourceBase(ABC):
         )
         return self._center_source
 
+    def update_center(self, center_x, center_y):
+        """Sets the extended source position to a given value. Subsequent calls
+        of extended_source_position() and point_source_position() are relative
+        to this center.
+
+        :param center_x: x-coordinate of the source center [arcsec]
+        :param center_y: y-coordinate of the source center [arcsec]
+        """
+        self._center_source = np.array([center_x, center_y])
+        if hasattr(self, "_center_point_source"):
+            del self._center_point_source
+
     def point_source_position(self, reference_position=None, draw_area=None):
         """Point source position. point source could be at the center of the
         extended source or it can be off from center of the extended source. In
@@ -1,6 +1,5 @@
 import numpy as np
-import numpy.random as random
-from slsim.selection import object_cut
+from slsim.selection import object_cut, catalog_column
 from slsim.Util import param_util
 from slsim.Sources.source_pop_base import SourcePopBase
 from astropy.table import Column, vstack
@@ -150,24 +149,32 @@ class Galaxies(SourcePopBase):
         """
         return self._num_select
 
-    def draw_source(self, z_max=None):
-        """Choose source at random. :param z_max: maximum redshift for source
-        to be drawn.
+    def catalog_column(self, name):
+        """Values of a column of the selected galaxy catalog, in the order used
+        by draw_source(index=...).
+
+        :param name: column name
+        :return: numpy array or None if the column is not present
+        """
+        return catalog_column(self._galaxy_select, name, list_type=self.list_type)
+
+    def draw_source(self, z_max=None, index=None, z_min=None):
+        """Choose source at random.
 
         :param z_max: maximum redshift limit for the galaxy to be drawn.
             If no galaxy is found for this limit, None will be returned.
+        :param index: index of the galaxy in the selected catalog. If
+            provided, this galaxy is used instead of a random one.
+        :type index: int or None
+        :param z_min: minimum redshift limit for the galaxy to be drawn.
+            If no galaxy is found for this limit, None will be returned.
         :return: dictionary of source
         """
-        if z_max is not None:
-            filtered_galaxies = self._galaxy_select[self._galaxy_select["z"] < z_max]
-            if len(filtered_galaxies) == 0:
+        if index is None:
+            index = self.draw_source_index(z_min=z_min, z_max=z_max)
+            if index is None:
                 return None
-            else:
-                index = random.randint(0, len(filtered_galaxies) - 1)
-                galaxy = filtered_galaxies[index]
-        else:
-            index = random.randint(0, self._num_select - 1)
-            galaxy = self._galaxy_select[index]
+        galaxy = self._galaxy_select[index]
         if "a_rot" in galaxy.colnames:
             phi_rot = galaxy["a_rot"]
         else:
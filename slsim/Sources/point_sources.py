@@ -1,6 +1,5 @@
-import numpy.random as random
 from slsim.Sources.source_pop_base import SourcePopBase
-from slsim.selection import object_cut
+from slsim.selection import object_cut, catalog_column
 from slsim.Sources.source import Source
 
 
@@ -59,6 +58,7 @@ class PointSources(SourcePopBase):
         )
 
         self._num_select = len(self._point_source_select)
+        self.list_type = list_type
         super(SourcePopBase, self).__init__()
         self.source_type = "point_source"
 
@@ -79,13 +79,31 @@ class PointSources(SourcePopBase):
         """
         return self._num_select
 
-    def draw_source(self):
+    def catalog_column(self, name):
+        """Values of a column of the selected point source catalog, in the
+        order used by draw_source(index=...).
+
+        :param name: column name
+        :return: numpy array or None if the column is not present
+        """
+        return catalog_column(self._point_source_select, name, list_type=self.list_type)
+
+    def draw_source(self, index=None, z_min=None, z_max=None):
         """Choose source at random with the selected range.
 
+        :param index: index of the point source in the selected catalog.
+            If provided, this source is used instead of a random one.
+        :type index: int or None
+        :param z_min: minimum redshift limit for the source to be drawn.
+        :param z_max: maximum redshift limit for the source to be drawn.
+            If no source is found within the redshift limits, None will
+            be returned.
         :return: dictionary of source
         """
-
-        index = random.randint(0, self._num_select - 1)
+        if index is None:
+            index = self.draw_source_index(z_min=z_min, z_max=z_max)
+            if index is None:
+                return None
         point_source = self._point_source_select[index]
         source_class = Source(
             source_dict=point_source,
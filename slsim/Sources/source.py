@@ -138,6 +138,15 @@ class Source(object):
 
         return self._single_source.point_source_position(reference_position, draw_area)
 
+    def update_center(self, center_x, center_y):
+        """Sets the source position to a given value instead of drawing it
+        within the test area.
+
+        :param center_x: x-coordinate of the source center [arcsec]
+        :param center_y: y-coordinate of the source center [arcsec]
+        """
+        self._single_source.update_center(center_x, center_y)
+
     def extended_source_magnitude(self, band):
         """Get the magnitude of the extended source in a specific band.
 
@@ -1,4 +1,6 @@
 from abc import ABC, abstractmethod
+import numpy as np
+import numpy.random as random
 
 
 class SourcePopBase(ABC):
@@ -52,6 +54,97 @@ class SourcePopBase(ABC):
         """
         pass
 
+    @abstractmethod
+    def catalog_column(self, name):
+        """Values of a column of the selected source catalog, in the order used
+        by draw_source(index=...).
+
+        :param name: column name
+        :return: numpy array or None if the column is not present
+        """
+        pass
+
+    def draw_source_index(self, size=None, z_min=None, z_max=None):
+        """Choose indices of sources at random from the selected catalog. The
+        corresponding sources can be created with draw_source(index=...).
+
+        If a redshift range is given, sources are drawn uniformly among
+        the sources with z_min < z < z_max using the redshift-sorted
+        index of the catalog.
+
+        :param size: number of indices to draw. If None, a single index
+            is returned.
+        :param z_min: minimum redshift (exclusive) of the drawn sources.
+            An array of the same length as size can be provided.
+        :param z_max: maximum redshift (exclusive) of the drawn sources.
+            An array of the same length as size can be provided.
+        :return: index or numpy array of indices. None if no source is
+            within the given redshift range.
+        """
+        if z_min is None and z_max is None:
+            return random.randint(0, self.source_number_selected - 1, size=size)
+        sort_index, _ = self._redshift_sorted
+        low, high = self._redshift_range(z_min=z_min, z_max=z_max)
+        if np.any(high <= low):
+            if size is None and np.ndim(low) == 0:
+                return None
+            raise ValueError(
+                "No source is within the requested redshift range for all draws."
+            )
+        rank = low + np.floor(random.random(size) * (high - low)).astype(int)
+        return sort_index[np.minimum(rank, high - 1)]
+
+    def source_number_in_range(self, z_min=None, z_max=None):
+        """Number of selected sources with z_min < z < z_max.
+
+        :param z_min: minimum redshift (exclusive), float or array
+        :param z_max: maximum redshift (exclusive), float or array
+        :return: number of selected sources within the redshift range
+        """
+        low, high = self._redshift_range(z_min=z_min, z_max=z_max)
+        return np.maximum(high - low, 0)
+
+    def _redshift_range(self, z_min=None, z_max=None):
+        """Range of positions in the redshift-sorted catalog with z_min < z <
+        z_max.
+
+        :param z_min: minimum redshift (exclusive), float or array
+        :param z_max: maximum redshift (exclusive), float or array
+        :return: first position and position after the last one
+        """
+        _, z_sorted = self._redshift_sorted
+        if z_min is None:
+            low = 0
+        else:
+            low = np.searchsorted(z_sorted, z_min, side="right")
+        if z_max is None:
+            high = len(z_sorted)
+        else:
+            high = np.searchsorted(z_sorted, z_max, side="left")
+        return low, high
+
+    @property
+    def _redshift_sorted(self):
+        """Index sorting the selected catalog by redshift, together with the
+        sorted redshifts. Computed once per population.
+
+        :return: sort index, sorted redshifts
+        """
+        if not hasattr(self, "_redshift_sort_index"):
+            z = self.source_redshifts
+            self._redshift_sort_index = np.argsort(z, kind="stable")
+            self._redshift_sort_z = z[self._redshift_sort_index]
+        return self._redshift_sort_index, self._redshift_sort_z
+
+    @property
+    def source_redshifts(self):
+        """Redshifts of the selected sources, in the order used by
+        draw_source(index=...).
+
+        :return: numpy array of redshifts
+        """
+        return self.catalog_column("z").astype(float)
+
     @property
     def variability_model(self):
         """
@@ -0,0 +1,238 @@
+import hashlib
+import os
+import pickle
+from multiprocessing import get_context
+
+import numpy as np
+
+from slsim.Util.param_util import temporary_random_state
+
+
+def save_checkpoint(filename, state):
+    """Saves the state of a sampler to a file. The file is first written under
+    a temporary name and then renamed, such that an interruption while writing
+    does not corrupt an existing checkpoint.
+
+    :param filename: name of the checkpoint file
+    :type filename: str
+    :param state: picklable state of the sampler
+    """
+    tmp_filename = filename + ".tmp"
+    with open(tmp_filename, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_filename, filename)
+
+
+def load_checkpoint(filename):
+    """Loads the state of a sampler saved with save_checkpoint().
+
+    :param filename: name of the checkpoint file
+    :type filename: str
+    :return: state of the sampler
+    """
+    with open(filename, "rb") as f:
+        return pickle.load(f)
+
+
+class ResultsCheckpoint(object):
+    """Checkpoint of a computation producing an ordered sequence of results
+    (e.g. the chunks of a population or the iterations of a pool).
+
+    The results are appended to a data file (filename + ".results") as
+    they are saved, and a small state file (filename), written with
+    save_checkpoint(), records the number and size of the saved results.
+    Saving a checkpoint therefore costs the size of the new results only,
+    not of all the results so far. Results appended after the last state
+    (e.g. by an interrupted save) are discarded when resuming, see
+    load_results_checkpoint().
+
+    Example::
+
+        checkpoint = ResultsCheckpoint("run.pkl")
+        for result in results:
+            checkpoint.save({"seed": seed}, [result])
+        state, results = load_results_checkpoint("run.pkl")
+    """
+
+    def __init__(self, filename, state=None):
+        """
+
+        :param filename: name of the checkpoint file
+        :type filename: str
+        :param state: state loaded with load_results_checkpoint() to
+         continue a checkpoint in the same file. If None, a new checkpoint
+         is started.
+        :type state: dict or None
+        """
+        self._filename = filename
+        self._results_filename = filename + ".results"
+        if state is None:
+            self.num_results = 0
+            self._results_size = 0
+        else:
+            self.num_results = state["num_results"]
+            self._results_size = state["results_size"]
+        with open(self._results_filename, "ab") as f:
+            f.truncate(self._results_size)
+
+    def save(self, state, new_results):
+        """Appends new results and saves the state.
+
+        :param state: picklable state of the computation
+        :type state: dict
+        :param new_results: results computed since the last save
+        :type new_results: list
+        """
+        with open(self._results_filename, "ab") as f:
+            for result in new_results:
+                pickle.dump(result, f, protocol=pickle.HIGHEST_PROTOCOL)
+            f.flush()
+            os.fsync(f.fileno())
+            self._results_size = f.tell()
+        self.num_results += len(new_results)
+        save_checkpoint(
+            self._filename,
+            dict(state, num_results=self.num_results, results_size=self._results_size),
+        )
+
+
+def load_results_checkpoint(filename):
+    """Loads a checkpoint saved with ResultsCheckpoint.
+
+    :param filename: name of the checkpoint file
+    :type filename: str
+    :return: state, list of the saved results
+    """
+    state = load_checkpoint(filename)
+    results = []
+    with open(filename + ".results", "rb") as f:
+        for _ in range(state["num_results"]):
+            results.append(pickle.load(f))
+    return state, results
+
+
+def arguments_hash(*args):
+    """SHA-256 hash of the pickled arguments of a computation, stored in
+    checkpoints to check that a run is resumed with the same arguments.
+
+    :param args: picklable arguments
+    :return: hexadecimal digest
+    """
+    return hashlib.sha256(
+        pickle.dumps(args, protocol=pickle.HIGHEST_PROTOCOL)
+    ).hexdigest()
+
+
+def seeded_call(function, seed, args):
+    """Calls a function with the global numpy random state seeded with a given
+    seed. The previous random state is restored afterwards.
+
+    :param function: function to call
+    :param seed: seed of the random state
+    :type seed: int or ~numpy.random.SeedSequence
+    :param args: positional arguments of the function
+    :type args: tuple
+    :return: return value of the function
+    """
+    with temporary_random_state(seed):
+        return function(*args)
+
+
+def _seeded_call_task(task):
+    """Unpacks a (function, seed, args) task for seeded_call() in a pool."""
+    return seeded_call(*task)
+
+
+def checkpointed_starmap(
+    function,
+    args_list,
+    seed=None,
+    checkpoint=None,
+    resume_from=None,
+    checkpoint_every=1,
+    processes=None,
+):
+    """Evaluates a function for a list of arguments in a pool of spawned
+    processes, like multiprocessing.Pool.starmap(), with reproducible random
+    numbers and checkpointing of the progress.
+
+    Each call is evaluated with the global numpy random state seeded by
+    an independent child of ~numpy.random.SeedSequence(seed), such that
+    the results do not depend on the number of processes. The results
+    are collected in order and appended to the checkpoint (see
+    ResultsCheckpoint) every checkpoint_every calls, together with the
+    seed and a hash of the function name and args_list. A run resumed
+    from a checkpoint checks this hash, only evaluates the remaining calls
+    and returns the same results as an uninterrupted run.
+
+    :param function: module-level (picklable) function
+    :param args_list: list of tuples of positional arguments, one per
+        call
+    :param seed: seed of the calls. If None, a random seed is chosen and
+        stored in the checkpoint.
+    :type seed: int or None
+    :param checkpoint: name of the checkpoint file. If None and
+        resume_from is provided, the checkpoint is written to
+        resume_from.
+    :type checkpoint: str or None
+    :param resume_from: name of a checkpoint file of an interrupted run
+        with the same function and args_list (which must pickle to the
+        same bytes)
+    :type resume_from: str or None
+    :param checkpoint_every: number of calls between two checkpoints
+    :type checkpoint_every: int
+    :param processes: number of processes of the pool. If None, the
+        number of CPUs is used.
+    :type processes: int or None
+    :return: list of return values of the calls, in the order of
+        args_list
+    """
+    num_tasks = len(args_list)
+    # the function is identified by its name, its pickle being a reference to it
+    args_hash = arguments_hash(
+        function.__module__, function.__qualname__, list(args_list)
+    )
+    if resume_from is not None:
+        state, results = load_results_checkpoint(resume_from)
+        if state["num_tasks"] != num_tasks:
+            raise ValueError(
+                "The checkpoint %s was written for %s calls, not %s."
+                % (resume_from, state["num_tasks"], num_tasks)
+            )
+        if state["args_hash"] != args_hash:
+            raise ValueError(
+                "The checkpoint %s was written for other arguments." % resume_from
+            )
+        seed = state["seed"]
+    else:
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        results = []
+    writer = None
+    if resume_from is not None and checkpoint in [None, resume_from]:
+        writer = ResultsCheckpoint(resume_from, state=state)
+    elif checkpoint is not None:
+        writer = ResultsCheckpoint(checkpoint)
+        writer.save(
+            {"seed": seed, "num_tasks": num_tasks, "args_hash": args_hash}, results
+        )
+    seed_sequences = np.random.SeedSequence(seed).spawn(num_tasks)
+    tasks = [
+        (function, seed_sequences[i], args_list[i])
+        for i in range(len(results), num_tasks)
+    ]
+    if len(tasks) > 0:
+        with get_context("spawn").Pool(processes) as pool:
+            new_results = []
+            for result in pool.imap(_seeded_call_task, tasks):
+                results.append(result)
+                new_results.append(result)
+                if writer is not None and (
+                    len(results) % checkpoint_every == 0 or len(results) == num_tasks
+                ):
+                    writer.save(
+                        {"seed": seed, "num_tasks": num_tasks, "args_hash": args_hash},
+                        new_results,
+                    )
+                    new_results = []
+    return results
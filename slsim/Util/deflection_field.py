@@ -0,0 +1,145 @@
+from collections import OrderedDict
+
+import numpy as np
+from lenstronomy.Util import util
+
+
+class DeflectionField(object):
+    """Deflection field of a lens model evaluated on regular grids. The
+    deflections of the most recently used grids are cached, keyed on the grid
+    center, pixel size and number of pixels, such that the ray-shooting of
+    several sources (or repeated evaluations for the same source) on the same
+    grid only evaluates the lens model once.
+
+    The deflections are computed for the source redshift of the lens model
+    convention. For single-plane lensing, the deflections of a source at a
+    different redshift are obtained by scaling them with the distance ratio
+    (see ray_shooting()).
+    """
+
+    def __init__(self, lens_model, kwargs_lens, max_grids=1):
+        """
+
+        :param lens_model: lenstronomy LensModel instance
+        :param kwargs_lens: lenstronomy keyword arguments of the lens model
+        :type kwargs_lens: list of dict
+        :param max_grids: maximum number of grids for which the deflections are
+         kept in memory
+        :type max_grids: int
+        """
+        self._lens_model = lens_model
+        self._kwargs_lens = kwargs_lens
+        self._max_grids = max_grids
+        self._grids = OrderedDict()
+
+    def deflection(self, center_x, center_y, delta_pix, num_pix):
+        """Coordinates and deflections of a square grid.
+
+        :param center_x: x-coordinate of the grid center [arcsec]
+        :param center_y: y-coordinate of the grid center [arcsec]
+        :param delta_pix: pixel size [arcsec]
+        :param num_pix: number of pixels per axis
+        :type num_pix: int
+        :return: x, y, alpha_x, alpha_y as flattened arrays of num_pix**2
+            entries
+        """
+        key = (float(center_x), float(center_y), float(delta_pix), int(num_pix))
+        if key in self._grids:
+            self._grids.move_to_end(key)
+            return self._grids[key]
+        x, y = util.make_grid(num_pix, delta_pix)
+        x += center_x
+        y += center_y
+        alpha_x, alpha_y = self._lens_model.alpha(x, y, self._kwargs_lens)
+        self._grids[key] = (x, y, alpha_x, alpha_y)
+        while len(self._grids) > self._max_grids:
+            self._grids.popitem(last=False)
+        return self._grids[key]
+
+    def ray_shooting(self, center_x, center_y, delta_pix, num_pix, scale=1):
+        """Maps the coordinates of a square grid to the source plane.
+
+        :param center_x: x-coordinate of the grid center [arcsec]
+        :param center_y: y-coordinate of the grid center [arcsec]
+        :param delta_pix: pixel size [arcsec]
+        :param num_pix: number of pixels per axis
+        :type num_pix: int
+        :param scale: factor applied to the deflections, i.e. the ratio
+            of the deflections of the source plane and of the lens model
+            convention
+        :type scale: float
+        :return: x, y, beta_x, beta_y as flattened arrays of num_pix**2
+            entries
+        """
+        x, y, alpha_x, alpha_y = self.deflection(center_x, center_y, delta_pix, num_pix)
+        return x, y, x - scale * alpha_x, y - scale * alpha_y
+
+    def ray_shooting_window(
+        self,
+        center_x,
+        center_y,
+        delta_pix,
+        num_pix,
+        window_x,
+        window_y,
+        window_half_size,
+        scale=1,
+    ):
+        """Maps the pixels of a square grid within a square window to the
+        source plane. Windows of the same grid (e.g. around several sources
+        of a lens) share one evaluation of the deflections.
+
+        :param center_x: x-coordinate of the grid center [arcsec]
+        :param center_y: y-coordinate of the grid center [arcsec]
+        :param delta_pix: pixel size [arcsec]
+        :param num_pix: number of pixels per axis
+        :type num_pix: int
+        :param window_x: x-coordinate of the window center [arcsec]
+        :param window_y: y-coordinate of the window center [arcsec]
+        :param window_half_size: half of the side of the window [arcsec]
+        :param scale: factor applied to the deflections, see ray_shooting()
+        :type scale: float
+        :return: x, y, beta_x, beta_y of the pixels within the window, as
+            flattened arrays
+        """
+        x, y, alpha_x, alpha_y = self.deflection(center_x, center_y, delta_pix, num_pix)
+        window = np.maximum(np.abs(x - window_x), np.abs(y - window_y))
+        window = window < window_half_size
+        x, y = x[window], y[window]
+        return x, y, x - scale * alpha_x[window], y - scale * alpha_y[window]
+
+    def clear(self):
+        """Releases the cached deflections."""
+        self._grids.clear()
+
+
+def deflection_grid(
+    center_deflector, center_sources, theta_E, num_pix_einstein_radius=200
+):
+    """Ray-shooting grid of extended sources lensed by a deflector. The pixels
+    lie on a lattice aligned with the deflector center, with
+    num_pix_einstein_radius pixels across 4 theta_E of the source with the
+    smallest Einstein radius, and the grid covers the squares of side 4
+    theta_E around all the sources.
+
+    :param center_deflector: center of the deflector [arcsec]
+    :param center_sources: centers of the sources [arcsec], with shape
+        (number of sources, 2)
+    :param theta_E: Einstein radius of each source [arcsec]
+    :param num_pix_einstein_radius: number of pixels across 4 theta_E
+    :type num_pix_einstein_radius: int
+    :return: center_x, center_y, delta_pix, num_pix of the grid, see
+        DeflectionField.deflection()
+    """
+    theta_E = np.atleast_1d(np.asarray(theta_E, dtype=float))
+    center_sources = np.atleast_2d(np.asarray(center_sources, dtype=float))
+    center_deflector = np.asarray(center_deflector, dtype=float)
+    delta_pix = np.min(theta_E) * 4 / num_pix_einstein_radius
+    # lattice indices of the bounds of the windows around the sources
+    offset = (center_sources - center_deflector) / delta_pix
+    half_size = 2 * theta_E[:, None] / delta_pix
+    index_min = np.floor(np.min(offset - half_size, axis=0))
+    index_max = np.ceil(np.max(offset + half_size, axis=0))
+    num_pix = int(np.max(index_max - index_min)) + 1
+    center_x, center_y = center_deflector + delta_pix * (index_min + (num_pix - 1) / 2)
+    return float(center_x), float(center_y), float(delta_pix), num_pix
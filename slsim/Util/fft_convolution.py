@@ -0,0 +1,101 @@
+import hashlib
+from collections import OrderedDict
+
+import numpy as np
+import scipy.fft
+
+
+class FFTConvolution(object):
+    """Convolution of images with PSF kernels through real FFTs, equivalent to
+    scipy.signal.fftconvolve(image, kernel, mode="same").
+
+    The FFTs of the kernels are cached per kernel content and padded
+    shape (least recently used kernels are discarded first), such that
+    repeated convolutions with the same few kernels only transform the
+    images. Stacks of images can be convolved with one kernel or with a
+    stack of kernels of the same shape in a single call.
+    """
+
+    def __init__(self, max_kernels=64, workers=None):
+        """
+
+        :param max_kernels: maximum number of kernel FFTs kept in memory
+        :type max_kernels: int
+        :param workers: number of threads of the scipy.fft transforms. If None,
+         the scipy.fft default (or the one of a scipy.fft.set_workers context) is
+         used.
+        :type workers: int or None
+        """
+        self._max_kernels = max_kernels
+        self._workers = workers
+        self._kernel_ffts = OrderedDict()
+
+    def convolve(self, images, kernels):
+        """Convolves images with PSF kernels.
+
+        :param images: image of shape (ny, nx) or stack of images of
+            shape (n, ny, nx)
+        :param kernels: kernel of shape (ky, kx), applied to all images,
+            or stack of kernels of shape (n, ky, kx), one per image
+        :return: convolved image(s) of the same shape as images
+        """
+        images = np.asarray(images)
+        kernels = np.asarray(kernels)
+        image_shape = images.shape[-2:]
+        kernel_shape = kernels.shape[-2:]
+        full_shape = [n + k - 1 for n, k in zip(image_shape, kernel_shape)]
+        fft_shape = tuple(scipy.fft.next_fast_len(n, real=True) for n in full_shape)
+        if kernels.ndim == 2:
+            kernel_fft = self.kernel_fft(kernels, fft_shape)
+        else:
+            kernel_fft = np.array(
+                [self.kernel_fft(kernel, fft_shape) for kernel in kernels]
+            )
+        image_fft = scipy.fft.rfft2(
+            images, s=fft_shape, axes=(-2, -1), workers=self._workers
+        )
+        convolved = scipy.fft.irfft2(
+            image_fft * kernel_fft, s=fft_shape, axes=(-2, -1), workers=self._workers
+        )
+        # center of the full convolution, as in mode="same" of scipy.signal
+        start_y = (kernel_shape[0] - 1) // 2
+        start_x = (kernel_shape[1] - 1) // 2
+        return convolved[
+            ...,
+            start_y : start_y + image_shape[0],
+            start_x : start_x + image_shape[1],
+        ]
+
+    def kernel_fft(self, kernel, fft_shape):
+        """Real FFT of a kernel zero-padded to a given shape, cached per kernel
+        content and shape.
+
+        :param kernel: kernel of shape (ky, kx)
+        :param fft_shape: padded shape of the transform
+        :type fft_shape: tuple of int
+        :return: complex array of shape (fft_shape[0], fft_shape[1] // 2
+            + 1)
+        """
+        kernel = np.ascontiguousarray(kernel)
+        key = (
+            hashlib.sha1(kernel.tobytes()).hexdigest(),
+            kernel.shape,
+            kernel.dtype.str,
+            tuple(fft_shape),
+        )
+        if key in self._kernel_ffts:
+            self._kernel_ffts.move_to_end(key)
+            return self._kernel_ffts[key]
+        kernel_fft = scipy.fft.rfft2(kernel, s=fft_shape, workers=self._workers)
+        self._kernel_ffts[key] = kernel_fft
+        while len(self._kernel_ffts) > self._max_kernels:
+            self._kernel_ffts.popitem(last=False)
+        return kernel_fft
+
+    def clear(self):
+        """Releases the cached kernel FFTs."""
+        self._kernel_ffts.clear()
+
+
+# convolution engine of param_util.convolved_image(convolution_type="fft_cached")
+default_fft_convolution = FFTConvolution()
@@ -0,0 +1,140 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+
+class NoiseGenerator(object):
+    """Poisson and Gaussian noise for stacks of images of shape (n, ny, nx),
+    drawn with numpy random Generators.
+
+    The stack is split into chunks of chunk_size images, and the noise of
+    each chunk is drawn with its own Generator, seeded with an independent
+    child of ~numpy.random.SeedSequence(seed). The noise is therefore
+    reproducible for a given seed, independently of the number of
+    threads, and the chunks can be generated in parallel threads. Each
+    call draws new noise.
+
+    Example::
+
+        noise_generator = NoiseGenerator(seed=42, n_threads=4)
+        noisy_images = noise_generator.add_noise(
+            images, exposure_time=30, std_gaussian_noise=0.1
+        )
+    """
+
+    def __init__(self, seed=None, n_threads=1, chunk_size=256):
+        """
+
+        :param seed: seed of the noise. If None, the seed is drawn from the
+         global numpy random state, such that np.random.seed() makes the noise
+         reproducible.
+        :type seed: int, ~numpy.random.SeedSequence or None
+        :param n_threads: number of threads generating the noise of the chunks
+        :type n_threads: int
+        :param chunk_size: number of images per chunk
+        :type chunk_size: int
+        """
+        if seed is None:
+            seed = np.random.randint(2**63 - 1, dtype=np.int64)
+        if not isinstance(seed, np.random.SeedSequence):
+            seed = np.random.SeedSequence(int(seed))
+        self._seed_sequence = seed
+        self._n_threads = n_threads
+        self._chunk_size = chunk_size
+
+    def add_noise(
+        self,
+        images,
+        exposure_time=None,
+        gain=1,
+        coadd_zero_point=27,
+        single_visit_zero_point=27,
+        std_gaussian_noise=None,
+        out=None,
+    ):
+        """Adds Poisson noise and Gaussian noise to a stack of images. The
+        Poisson noise is that of image_plus_poisson_noise() in
+        slsim.image_simulation: it is drawn in electrons and converted back
+        to counts per second.
+
+        The exposure times, gains, zero points and standard deviations can
+        be given for all images (scalar or map of shape (ny, nx)) or per
+        image (array of shape (n,) or (n, ny, nx)).
+
+        :param images: stack of images in counts per second
+        :type images: array of shape (n, ny, nx)
+        :param exposure_time: exposure time or exposure map. If None, no
+            Poisson noise is added.
+        :param gain: amplifier gain
+        :param coadd_zero_point: zero point of the images
+        :param single_visit_zero_point: zero point of the single-visit
+            images
+        :param std_gaussian_noise: standard deviation of the Gaussian
+            noise. If None, no Gaussian noise is added.
+        :param out: preallocated output array of the shape of images (it
+            can be images itself). If None, a new float64 array is
+            returned.
+        :return: noisy images
+        """
+        images = np.asarray(images)
+        if out is None:
+            out = np.empty(images.shape)
+        num_images = len(images)
+        image_shape = images.shape[1:]
+        if exposure_time is not None:
+            zero_point_scale = 10 ** (
+                0.4
+                * (
+                    _per_image(coadd_zero_point, num_images, image_shape)
+                    - _per_image(single_visit_zero_point, num_images, image_shape)
+                )
+            )
+            cps_to_electrons = (
+                _per_image(exposure_time, num_images, image_shape)
+                * _per_image(gain, num_images, image_shape)
+                / zero_point_scale
+            )
+        if std_gaussian_noise is not None:
+            std_gaussian_noise = _per_image(std_gaussian_noise, num_images, image_shape)
+
+        def add_chunk_noise(chunk, seed_sequence):
+            rng = np.random.default_rng(seed_sequence)
+            image = images[chunk].astype(float)
+            if exposure_time is not None:
+                image_positive = np.clip(image, 0, None)
+                noisy_electrons = rng.poisson(image_positive * cps_to_electrons[chunk])
+                image = noisy_electrons / cps_to_electrons[chunk]
+            if std_gaussian_noise is not None:
+                image += std_gaussian_noise[chunk] * rng.standard_normal(image.shape)
+            out[chunk] = image
+
+        chunks = [
+            slice(start, start + self._chunk_size)
+            for start in range(0, num_images, self._chunk_size)
+        ]
+        seed_sequences = self._seed_sequence.spawn(len(chunks))
+        if self._n_threads > 1 and len(chunks) > 1:
+            with ThreadPoolExecutor(self._n_threads) as executor:
+                list(executor.map(add_chunk_noise, chunks, seed_sequences))
+        else:
+            for chunk, seed_sequence in zip(chunks, seed_sequences):
+                add_chunk_noise(chunk, seed_sequence)
+        return out
+
+
+def _per_image(value, num_images, image_shape):
+    """Broadcasts a noise parameter given for all images or per image to
+    the stack, see NoiseGenerator.add_noise().
+
+    :param value: scalar, array of shape (num_images,), map of shape
+        image_shape or array of shape (num_images,) + image_shape
+    :param num_images: number of images
+    :param image_shape: shape of the images
+    :return: array broadcastable to (num_images,) + image_shape
+    """
+    value = np.asarray(value, dtype=float)
+    if value.ndim <= 1:
+        return np.broadcast_to(value, (num_images,)).reshape(
+            (num_images,) + (1,) * len(image_shape)
+        )
+    return np.broadcast_to(value, (num_images,) + tuple(image_shape))
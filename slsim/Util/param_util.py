@@ -1,3 +1,4 @@
+import io
 import numpy as np
 import scipy
 from scipy.signal import convolve2d
@@ -11,6 +12,8 @@ from astropy import units as u
 from astropy.stats import sigma_clipped_stats
 from astropy.convolution import Gaussian2DKernel
 import warnings
+from contextlib import contextmanager
+from slsim.Util.fft_convolution import default_fft_convolution
 
 
 def epsilon2e(epsilon):
@@ -111,11 +114,19 @@ def convolved_image(image, psf_kernel, convolution_type="fft"):
     :param psf_kernel: kernel used to convolve the given image. It
         should be a pixel psf kernel.
     :param convolution_type: method to be used to convolve image.
-        currently fftconvolve and convolve2d are supported. The default
-        type is fftconvolve and we prefer to use fftconvolve over
-        convolve2d because it is relatively faster for our purpose.
+        currently fftconvolve ("fft"), convolve2d ("grid") and a cached
+        FFT convolution ("fft_cached") are supported. The default type
+        is fftconvolve and we prefer to use fftconvolve over convolve2d
+        because it is relatively faster for our purpose. "fft_cached"
+        gives the same result as "fft" but keeps the FFTs of the kernels
+        for repeated convolutions with the same kernels, and also
+        accepts a stack of images of shape (n, ny, nx) with one kernel
+        or a stack of n kernels (see
+        ~slsim.Util.fft_convolution.FFTConvolution).
     :returns: convolved image.
     """
+    if convolution_type == "fft_cached":
+        return default_fft_convolution.convolve(image, psf_kernel)
     if convolution_type == "fft":
         return fftconvolve(image, psf_kernel, mode="same")
     if convolution_type == "grid":
@@ -327,10 +338,14 @@ def fits_append_table(filename, table):
     :param filename: Name of the FITS file to append to
     :param table: Astropy Table object to append
     """
-    hdulist = fits.open(filename, mode="append")
-    hdulist.append(fits.BinTableHDU(table))
-    hdulist.writeto(filename, overwrite=True)
-    hdulist.close()
+    # the extension is written after an empty primary HDU and only its bytes are
+    # appended to the file, such that the existing extensions are neither read
+    # nor rewritten
+    primary_hdu = fits.PrimaryHDU()
+    buffer = io.BytesIO()
+    fits.HDUList([primary_hdu, fits.BinTableHDU(table)]).writeto(buffer)
+    with open(filename, "ab") as f:
+        f.write(buffer.getvalue()[len(primary_hdu.header.tostring()) :])
 
 
 def catalog_with_angular_size_in_arcsec(galaxy_catalog, input_catalog_type="skypy"):
@@ -648,6 +663,64 @@ def detect_object(image, variance, pixel_scale=0.2, box_size_arcsec=3, snr_thres
     return snr > snr_threshold
 
 
+def empty_sky_map(image, variance, pixel_scale=0.2, box_size_arcsec=3, snr_threshold=5):
+    """Map of the pixels around which the central box of a cutout contains no
+    object, i.e. the cutouts centered on these pixels pass detect_object()
+    with the same parameters. The flux and variance of the boxes around all
+    pixels are computed at once from summed-area tables of the image and
+    the variance map.
+
+    :param image: image, e.g. a full coadd patch
+    :param variance: variance map of the same size as the image
+    :param pixel_scale: Pixel scale in arcsec/pixel (default is 0.2
+        arcsec/pixel).
+    :param box_size_arcsec: Size of the central box in arcsec (default
+        is 3 arcsec).
+    :param snr_threshold: SNR threshold for object detection (default is
+        5).
+    :return: boolean array of the shape of the image. True if the box
+        around the pixel lies within the image and contains no object
+        (SNR <= threshold).
+    """
+    box_size_pix = 2 * (int(box_size_arcsec / pixel_scale) // 2) + 1
+    half_box = box_size_pix // 2
+    total_flux = _box_sums(np.asarray(image, dtype=float), box_size_pix)
+    total_variance = _box_sums(np.asarray(variance, dtype=float), box_size_pix)
+    total_noise = np.sqrt(np.clip(total_variance, 0, None))
+    snr = np.divide(
+        total_flux,
+        total_noise,
+        out=np.zeros_like(total_flux),
+        where=total_noise > 0,
+    )
+    empty_map = np.zeros(np.shape(image), dtype=bool)
+    empty_map[
+        half_box : half_box + snr.shape[0], half_box : half_box + snr.shape[1]
+    ] = (snr <= snr_threshold)
+    return empty_map
+
+
+def _box_sums(image, box_size):
+    """Sums of an image over all boxes of box_size x box_size pixels fully
+    contained in the image, from its summed-area table.
+
+    :param image: 2d array
+    :param box_size: size of the boxes in pixels
+    :return: array of shape (ny - box_size + 1, nx - box_size + 1), whose
+        entry [i, j] is the sum over image[i:i + box_size, j:j +
+        box_size]
+    """
+    summed_area = np.zeros((image.shape[0] + 1, image.shape[1] + 1))
+    np.cumsum(image, axis=0, out=summed_area[1:, 1:])
+    np.cumsum(summed_area[1:, 1:], axis=1, out=summed_area[1:, 1:])
+    return (
+        summed_area[box_size:, box_size:]
+        - summed_area[:-box_size, box_size:]
+        - summed_area[box_size:, :-box_size]
+        + summed_area[:-box_size, :-box_size]
+    )
+
+
 def gaussian_psf(fwhm, delta_pix=0.2, num_pix=41):
     """Generate a normalized 2D Gaussian PSF array.
 
@@ -706,3 +779,25 @@ def surface_brightness_reff(angular_size, source_model_list, kwargs_extended_sou
         surface_brightness_amp, mag_zero_point=_mag_zero_dummy
     )
     return mag_arcsec2
+
+
+@contextmanager
+def temporary_random_state(seed):
+    """Context manager that seeds the global numpy random state and restores
+    the previous state on exit. This allows to reproduce the random draws of
+    routines that use the global numpy random state (e.g. a chunk of a
+    population draw) without altering the random state of the caller. The
+    global random state is shared by the threads of a process, such that the
+    seeded draws are only reproducible if no other thread draws from it.
+
+    :param seed: seed of the random state
+    :type seed: int, array of int or ~numpy.random.SeedSequence
+    """
+    state = np.random.get_state()
+    if isinstance(seed, np.random.SeedSequence):
+        seed = seed.generate_state(4)
+    np.random.seed(seed)
+    try:
+        yield
+    finally:
+        np.random.set_state(state)
@@ -0,0 +1,272 @@
+import h5py
+import numpy as np
+from astropy.table import Table
+
+# number of images stored in the image property columns of lens_catalog_rows()
+MAX_NUM_IMAGES = 5
+
+
+def lens_catalog_rows(lens, lens_index=0, bands=None, image_properties=False):
+    """Summary of a lens as catalog rows, one row per lensed source. Without
+    image_properties, only quantities that do not require solving the lens
+    equation are included.
+
+    :param lens: Lens instance
+    :param lens_index: index of the lens in the population
+    :type lens_index: int
+    :param bands: list of imaging bands for which the deflector and
+        source magnitudes are stored. If None, no magnitudes are stored.
+    :type bands: list of str or None
+    :param image_properties: if True, the number of images and the
+        positions, macro-model magnifications and time delays (relative
+        to the first image, in days) of the images are included, as
+        arrays of MAX_NUM_IMAGES entries padded with NaN, as well as the
+        lensed source magnitudes with the total macro-model
+        magnification. For extended sources without point source, the
+        images of the source center are used and no time delays are
+        computed.
+    :type image_properties: bool
+    :return: list of dictionaries with column names and values
+    """
+    if bands is None:
+        bands = []
+    center_lens = lens.deflector_position
+    e1_light, e2_light, e1_mass, e2_mass = lens.deflector_ellipticity()
+    kappa, gamma1, gamma2 = lens.los_linear_distortions
+    row_lens = {
+        "lens_index": lens_index,
+        "lens_id": lens.generate_id(),
+        "source_number": lens.source_number,
+        "z_deflector": lens.deflector_redshift,
+        "velocity_dispersion": lens.deflector_velocity_dispersion(),
+        "stellar_mass": lens.deflector_stellar_mass(),
+        "deflector_center_x": center_lens[0],
+        "deflector_center_y": center_lens[1],
+        "e1_light": e1_light,
+        "e2_light": e2_light,
+        "e1_mass": e1_mass,
+        "e2_mass": e2_mass,
+        "kappa_ext": kappa,
+        "gamma1_ext": gamma1,
+        "gamma2_ext": gamma2,
+        "importance_weight": lens.importance_weight,
+    }
+    for band in bands:
+        row_lens["mag_deflector_" + band] = lens.deflector_magnitude(band)
+    rows = []
+    for source_index in range(lens.source_number):
+        source = lens.source(source_index)
+        row = dict(row_lens)
+        row["source_index"] = source_index
+        row["z_source"] = source.redshift
+        row["theta_E"] = lens.einstein_radius[source_index]
+        if source.source_type == "extended":
+            center_source = source.extended_source_position(center_lens, lens.test_area)
+        else:
+            center_source = source.point_source_position(center_lens, lens.test_area)
+        row["source_center_x"] = center_source[0]
+        row["source_center_y"] = center_source[1]
+        for band in bands:
+            if source.source_type in ["extended", "point_plus_extended"]:
+                row["mag_source_" + band] = source.extended_source_magnitude(band)
+            if source.source_type in ["point_source", "point_plus_extended"]:
+                # mean magnitude for variable point sources
+                row["ps_mag_source_" + band] = np.mean(
+                    source.point_source_magnitude(band)
+                )
+        if image_properties:
+            row.update(_image_properties(lens, source_index, bands))
+        rows.append(row)
+    return rows
+
+
+def _image_properties(lens, source_index, bands):
+    """Image properties of a lensed source, see lens_catalog_rows().
+
+    :param lens: Lens instance
+    :param source_index: index of the source in the lens
+    :param bands: list of imaging bands
+    :return: dictionary with column names and values
+    """
+    source = lens.source(source_index)
+    if source.source_type == "extended":
+        x_image, y_image = lens.extended_source_image_positions()[source_index]
+        magnification = lens.extended_source_magnification_for_individual_image()[
+            source_index
+        ]
+        arrival_time = np.full(len(x_image), np.nan)
+    else:
+        x_image, y_image = lens.point_source_image_positions()[source_index]
+        magnification = lens.point_source_magnification()[source_index]
+        arrival_time = lens.point_source_arrival_times()[source_index]
+    columns = image_columns(x_image, y_image, magnification, arrival_time)
+    total_magnification = np.sum(np.abs(magnification))
+    for band in bands:
+        if source.source_type in ["extended", "point_plus_extended"]:
+            columns["mag_source_lensed_" + band] = source.extended_source_magnitude(
+                band
+            ) - 2.5 * np.log10(total_magnification)
+        if source.source_type in ["point_source", "point_plus_extended"]:
+            columns["ps_mag_source_lensed_" + band] = np.mean(
+                source.point_source_magnitude(band)
+            ) - 2.5 * np.log10(total_magnification)
+    return columns
+
+
+def image_columns(x_image, y_image, magnification, arrival_time):
+    """Number of images and image property columns of a lensed source, see
+    lens_catalog_rows().
+
+    :param x_image: x-coordinates of the images [arcsec]
+    :param y_image: y-coordinates of the images [arcsec]
+    :param magnification: macro-model magnifications of the images
+    :param arrival_time: arrival times of the images [days] (NaN if not
+        computed)
+    :return: dictionary with column names and values, with arrays of
+        MAX_NUM_IMAGES entries padded with NaN
+    """
+    num_images = len(x_image)
+    columns = {"num_images": num_images}
+    for name, values in [
+        ("x_image", x_image),
+        ("y_image", y_image),
+        ("magnification", magnification),
+        ("time_delay", arrival_time - np.min(arrival_time, initial=np.inf)),
+    ]:
+        column = np.full(MAX_NUM_IMAGES, np.nan)
+        column[: min(num_images, MAX_NUM_IMAGES)] = values[:MAX_NUM_IMAGES]
+        columns[name] = column
+    return columns
+
+
+class LensPopulationWriter(object):
+    """Writes a lens population to a HDF5 file in chunks of fixed size, with
+    one column per quantity (see lens_catalog_rows()) and one row per lensed
+    source. Only the current chunk is kept in memory.
+
+    Example::
+
+        with LensPopulationWriter("lenses.h5", bands=["i"]) as writer:
+            for lens in lens_pop.iter_population(kwargs_lens_cuts):
+                writer.add_lens(lens)
+    """
+
+    def __init__(self, filename, chunk_size=1000, bands=None, group="lenses", mode="w"):
+        """
+
+        :param filename: name of the HDF5 file
+        :type filename: str
+        :param chunk_size: number of rows buffered in memory before they are
+         written to the file. Also the HDF5 chunk size of the columns.
+        :type chunk_size: int
+        :param bands: list of imaging bands for which magnitudes are stored
+        :type bands: list of str or None
+        :param group: name of the HDF5 group containing the columns
+        :type group: str
+        :param mode: "w" to create a new file (overwriting an existing one) or
+         "a" to append lenses to an existing population.
+        :type mode: str
+        """
+        if mode not in ["w", "a"]:
+            raise ValueError("mode must be 'w' or 'a', not %s." % mode)
+        self._file = h5py.File(filename, mode)
+        self._group = self._file.require_group(group)
+        self._chunk_size = chunk_size
+        self._bands = bands
+        self._rows = []
+        self.num_lenses = int(self._group.attrs.get("num_lenses", 0))
+
+    def add_lens(self, lens):
+        """Adds a lens to the population. The buffered rows are written to the
+        file once chunk_size rows are reached.
+
+        :param lens: Lens instance
+        """
+        self._rows.extend(
+            lens_catalog_rows(lens, lens_index=self.num_lenses, bands=self._bands)
+        )
+        self.num_lenses += 1
+        if len(self._rows) >= self._chunk_size:
+            self.flush()
+
+    def add_lenses(self, lenses):
+        """Adds lenses from an iterable (e.g. LensPop.iter_population()).
+
+        :param lenses: iterable of Lens instances
+        :return: number of lenses added
+        """
+        num_lenses = self.num_lenses
+        for lens in lenses:
+            self.add_lens(lens)
+        return self.num_lenses - num_lenses
+
+    def flush(self):
+        """Writes the buffered rows to the file."""
+        if len(self._rows) > 0:
+            append_columns(
+                self._group,
+                {name: [row[name] for row in self._rows] for name in self._rows[0]},
+                chunk_size=self._chunk_size,
+            )
+            self._rows = []
+        self._group.attrs["num_lenses"] = self.num_lenses
+        self._file.flush()
+
+    def close(self):
+        """Writes the remaining rows and closes the file."""
+        if self._file:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def append_columns(group, columns, chunk_size=1000):
+    """Appends rows to the resizable one-dimensional datasets of a HDF5 group,
+    creating the datasets at the first call.
+
+    :param group: h5py.Group (or File) instance
+    :param columns: dictionary of column names and values of the new
+        rows
+    :param chunk_size: HDF5 chunk size of newly created datasets
+    """
+    for name, values in columns.items():
+        if isinstance(values[0], str):
+            values = np.array(values, dtype=h5py.string_dtype())
+        else:
+            values = np.asarray(values)
+        if name not in group:
+            group.create_dataset(
+                name,
+                data=values,
+                maxshape=(None,) + values.shape[1:],
+                chunks=(chunk_size,) + values.shape[1:],
+            )
+        else:
+            dataset = group[name]
+            num_rows = dataset.shape[0]
+            dataset.resize(num_rows + len(values), axis=0)
+            dataset[num_rows:] = values
+
+
+def read_lens_population(filename, group="lenses"):
+    """Reads a lens population written with LensPopulationWriter.
+
+    :param filename: name of the HDF5 file
+    :type filename: str
+    :param group: name of the HDF5 group containing the columns
+    :type group: str
+    :return: astropy Table with one row per lensed source
+    """
+    with h5py.File(filename, "r") as f:
+        columns = {}
+        for name, dataset in f[group].items():
+            if h5py.check_string_dtype(dataset.dtype) is not None:
+                columns[name] = dataset.asstr()[:]
+            else:
+                columns[name] = dataset[:]
+    return Table(columns)
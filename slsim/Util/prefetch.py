@@ -0,0 +1,52 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import islice
+
+
+def prefetch(function, arguments, max_prefetch=2, n_threads=1):
+    """Evaluates a function for a sequence of arguments in background
+    threads and yields the results in order, such that the next results
+    (e.g. images read from disk) are computed while the caller processes the
+    current one.
+
+    At most max_prefetch calls are pending at any time besides the result
+    being processed by the caller, which bounds the memory held by the
+    prefetched results. Exceptions raised by a call are raised when its
+    result is yielded.
+
+    Example::
+
+        for images in prefetch(read_images, filenames, max_prefetch=2):
+            process(images)
+
+    :param function: function of one argument. It is called from the
+        background threads and should not use the global numpy random state.
+    :param arguments: iterable of arguments
+    :param max_prefetch: maximum number of pending calls. If 0, the calls
+        are evaluated serially in the calling thread.
+    :type max_prefetch: int
+    :param n_threads: number of background threads
+    :type n_threads: int
+    :return: generator of the return values, in the order of arguments
+    """
+    arguments = iter(arguments)
+    if max_prefetch < 1:
+        for argument in arguments:
+            yield function(argument)
+        return
+    executor = ThreadPoolExecutor(n_threads)
+    futures = deque(
+        executor.submit(function, argument)
+        for argument in islice(arguments, max_prefetch)
+    )
+    try:
+        while len(futures) > 0:
+            result = futures.popleft().result()
+            for argument in islice(arguments, 1):
+                futures.append(executor.submit(function, argument))
+            yield result
+    finally:
+        # the calls not yet started are dropped if the generator is closed early
+        for future in futures:
+            future.cancel()
+        executor.shutdown(wait=True)
@@ -0,0 +1,190 @@
+import hashlib
+import os
+from collections import OrderedDict
+
+import numpy as np
+
+
+class StampCache(object):
+    """Cache of rendered image stamps, keyed by a content hash (see
+    stamp_key()), with an in-memory tier of the most recently used stamps
+    and an optional on-disk tier.
+
+    The on-disk tier stores each stamp as a .npy file in a directory and
+    reads it back memory-mapped, such that a noiseless model image can
+    be reused across processes and sessions without being rendered
+    again. The least recently used files are removed once the size of
+    the directory exceeds max_disk_bytes. Stamps are returned read-only.
+
+    Example::
+
+        stamp_cache = StampCache(max_stamps=256, directory="stamps")
+        image = sharp_image(lens, "i", 27, 0.2, 64, stamp_cache=stamp_cache)
+    """
+
+    def __init__(self, max_stamps=128, directory=None, max_disk_bytes=10**9):
+        """
+
+        :param max_stamps: maximum number of stamps kept in memory
+        :type max_stamps: int
+        :param directory: directory of the on-disk tier (created if needed).
+         If None, stamps are only cached in memory.
+        :type directory: str or None
+        :param max_disk_bytes: maximum total size of the stamps stored in the
+         directory [bytes]
+        :type max_disk_bytes: int
+        """
+        self._max_stamps = max_stamps
+        self._directory = directory
+        self._max_disk_bytes = max_disk_bytes
+        self._stamps = OrderedDict()
+        # file sizes of the on-disk stamps, from the least to the most recently used
+        self._files = OrderedDict()
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+            files = [
+                entry for entry in os.scandir(directory) if entry.name.endswith(".npy")
+            ]
+            for entry in sorted(files, key=lambda entry: entry.stat().st_mtime):
+                self._files[entry.name[:-4]] = entry.stat().st_size
+
+    def get(self, key):
+        """Cached stamp.
+
+        :param key: stamp key
+        :type key: str
+        :return: read-only numpy array, or None if the stamp is not
+            cached
+        """
+        if key in self._stamps:
+            self._stamps.move_to_end(key)
+            return self._stamps[key]
+        if key in self._files:
+            filename = self._filename(key)
+            try:
+                stamp = np.load(filename, mmap_mode="r")
+            except (OSError, ValueError):
+                # removed or incomplete file
+                del self._files[key]
+                return None
+            os.utime(filename)
+            self._files.move_to_end(key)
+            self._add_to_memory(key, stamp)
+            return stamp
+        return None
+
+    def put(self, key, stamp):
+        """Adds a stamp to the cache.
+
+        :param key: stamp key
+        :type key: str
+        :param stamp: image stamp
+        :type stamp: numpy array
+        """
+        stamp = np.array(stamp)
+        stamp.setflags(write=False)
+        self._add_to_memory(key, stamp)
+        if self._directory is not None and key not in self._files:
+            filename = self._filename(key)
+            # write to a temporary file first such that other processes never
+            # read an incomplete stamp
+            temporary_filename = filename + ".%s.tmp" % os.getpid()
+            with open(temporary_filename, "wb") as f:
+                np.save(f, stamp)
+            os.replace(temporary_filename, filename)
+            self._files[key] = os.path.getsize(filename)
+            self._evict_files()
+
+    def clear(self, disk=False):
+        """Releases the stamps kept in memory.
+
+        :param disk: if True, the on-disk stamps are removed as well
+        :type disk: bool
+        """
+        self._stamps.clear()
+        if disk:
+            for key in list(self._files):
+                self._remove_file(key)
+
+    def __contains__(self, key):
+        return key in self._stamps or key in self._files
+
+    def __len__(self):
+        return len(set(self._stamps) | set(self._files))
+
+    @property
+    def disk_bytes(self):
+        """Total size of the on-disk stamps [bytes]."""
+        return sum(self._files.values())
+
+    def _filename(self, key):
+        return os.path.join(self._directory, key + ".npy")
+
+    def _add_to_memory(self, key, stamp):
+        self._stamps[key] = stamp
+        self._stamps.move_to_end(key)
+        while len(self._stamps) > self._max_stamps:
+            self._stamps.popitem(last=False)
+
+    def _evict_files(self):
+        disk_bytes = self.disk_bytes
+        while disk_bytes > self._max_disk_bytes and len(self._files) > 0:
+            key = next(iter(self._files))
+            disk_bytes -= self._files[key]
+            self._remove_file(key)
+
+    def _remove_file(self, key):
+        del self._files[key]
+        try:
+            os.remove(self._filename(key))
+        except FileNotFoundError:
+            pass
+
+
+def stamp_key(*objects):
+    """Stable hash of nested dictionaries, lists, tuples, strings, numbers
+    and numpy arrays (e.g. lenstronomy keyword arguments), independent of
+    the session and of the dictionary order. Other objects are represented
+    by their repr().
+
+    :param objects: objects to hash
+    :return: hexadecimal SHA-1 digest
+    :rtype: str
+    """
+    sha1 = hashlib.sha1()
+    _update_hash(sha1, objects)
+    return sha1.hexdigest()
+
+
+def _update_hash(sha1, obj):
+    """Adds an object to a hash, see stamp_key().
+
+    :param sha1: hashlib hash object
+    :param obj: object to hash
+    """
+    if isinstance(obj, dict):
+        sha1.update(b"d%d" % len(obj))
+        for name in sorted(obj, key=str):
+            _update_hash(sha1, str(name))
+            _update_hash(sha1, obj[name])
+    elif isinstance(obj, (list, tuple)):
+        sha1.update(b"l%d" % len(obj))
+        for item in obj:
+            _update_hash(sha1, item)
+    elif isinstance(obj, str):
+        encoded = obj.encode()
+        sha1.update(b"s%d:" % len(encoded) + encoded)
+    elif obj is None or isinstance(obj, (bool, np.bool_)):
+        sha1.update(b"n" + repr(None if obj is None else bool(obj)).encode())
+    elif isinstance(obj, np.ndarray) and obj.dtype.kind == "O":
+        _update_hash(sha1, obj.tolist())
+    elif isinstance(obj, (int, float, np.number, np.ndarray)):
+        array = np.asarray(obj)
+        if array.dtype.kind in "biuf":
+            # numbers of equal value hash equally, independently of their type
+            array = array.astype(float)
+        array = np.ascontiguousarray(array)
+        sha1.update(b"a%s%s:" % (array.dtype.str.encode(), repr(array.shape).encode()))
+        sha1.update(array.tobytes())
+    else:
+        _update_hash(sha1, repr(obj))
@@ -0,0 +1,239 @@
+import h5py
+import numpy as np
+from astropy.table import Table
+
+
+class ImageTableWriter(object):
+    """Appends astropy tables with scalar and image columns (e.g. the catalogs
+    of injected lenses or time series images) to a HDF5 file, in blocks of
+    chunk_size rows. Only the current block is kept in memory.
+
+    Each block of a column is written as its own dataset, either contiguous,
+    such that ImageTableReader memory-maps it, or compressed. Appending a
+    table therefore costs the same regardless of the size of the file, and
+    the file does not grow by one FITS extension per table. A "table_index"
+    column records the index of the table each row was added with.
+
+    Example::
+
+        with ImageTableWriter("injected_lenses.h5", chunk_size=256) as writer:
+            for table in tables:
+                writer.add_table(table)
+        reader = ImageTableReader("injected_lenses.h5")
+        images = reader["injected_lens_i"][:64]
+    """
+
+    def __init__(
+        self, filename, chunk_size=100, compression=None, group="table", mode="w"
+    ):
+        """
+
+        :param filename: name of the HDF5 file
+        :type filename: str
+        :param chunk_size: number of rows per block
+        :type chunk_size: int
+        :param compression: HDF5 compression filter of the blocks (e.g. "gzip" or
+         "lzf"). If None, the blocks are stored contiguously and can be
+         memory-mapped.
+        :type compression: str or None
+        :param group: name of the HDF5 group containing the columns
+        :type group: str
+        :param mode: "w" to create a new file (overwriting an existing one) or
+         "a" to append tables to an existing file.
+        :type mode: str
+        """
+        if mode not in ["w", "a"]:
+            raise ValueError("mode must be 'w' or 'a', not %s." % mode)
+        self._file = h5py.File(filename, mode)
+        self._group = self._file.require_group(group)
+        self._chunk_size = chunk_size
+        self._compression = compression
+        self._columns = {}
+        self._num_buffered = 0
+        self.num_rows = int(self._group.attrs.get("num_rows", 0))
+        self.num_tables = int(self._group.attrs.get("num_tables", 0))
+        self._num_blocks = int(self._group.attrs.get("num_blocks", 0))
+        self._names = [name for name in self._group if name != "table_index"]
+
+    def add_table(self, table):
+        """Adds the rows of a table. Full blocks are written to the file.
+
+        :param table: astropy Table with the same columns as the previous
+            tables
+        """
+        if len(self._names) == 0:
+            self._names = list(table.colnames)
+        elif set(table.colnames) != set(self._names):
+            raise ValueError(
+                "The columns %s of the table do not match the columns %s of the "
+                "file." % (table.colnames, self._names)
+            )
+        for name in self._names:
+            self._columns.setdefault(name, []).append(np.asarray(table[name]))
+        self._columns.setdefault("table_index", []).append(
+            np.full(len(table), self.num_tables)
+        )
+        self._num_buffered += len(table)
+        self.num_rows += len(table)
+        self.num_tables += 1
+        while self._num_buffered >= self._chunk_size:
+            self._write_block(self._chunk_size)
+
+    def flush(self):
+        """Writes the buffered rows to the file as a (partial) block."""
+        if self._num_buffered > 0:
+            self._write_block(self._num_buffered)
+        self._group.attrs["num_rows"] = self.num_rows
+        self._group.attrs["num_tables"] = self.num_tables
+        self._group.attrs["num_blocks"] = self._num_blocks
+        self._file.flush()
+
+    def close(self):
+        """Writes the remaining rows and closes the file."""
+        if self._file:
+            self.flush()
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _write_block(self, num_rows):
+        """Writes the first num_rows buffered rows as a block.
+
+        :param num_rows: number of rows of the block
+        """
+        for name, arrays in self._columns.items():
+            values = np.concatenate(arrays)
+            self._columns[name] = [values[num_rows:]]
+            values = values[:num_rows]
+            if values.dtype.kind in "USO":
+                values = np.array(values.astype(str), dtype=h5py.string_dtype())
+            kwargs = {}
+            if self._compression is not None:
+                kwargs = {"chunks": values.shape, "compression": self._compression}
+            self._group.require_group(name).create_dataset(
+                str(self._num_blocks), data=values, **kwargs
+            )
+        self._num_blocks += 1
+        self._num_buffered -= num_rows
+        self._group.attrs["num_blocks"] = self._num_blocks
+
+
+class ImageTableReader(object):
+    """Reads a file written with ImageTableWriter. The columns are accessed
+    by name and indexed along the rows, e.g. reader["lens"][10:20], which
+    only reads the blocks containing the requested rows. Contiguous blocks
+    are memory-mapped, such that training pipelines can draw random batches
+    of images without loading the file in memory.
+    """
+
+    def __init__(self, filename, group="table"):
+        """
+
+        :param filename: name of the HDF5 file
+        :type filename: str
+        :param group: name of the HDF5 group containing the columns
+        :type group: str
+        """
+        self._file = h5py.File(filename, "r")
+        group = self._file[group]
+        num_blocks = int(group.attrs.get("num_blocks", 0))
+        self._columns = {
+            name: _BlockColumn(
+                [group[name][str(block)] for block in range(num_blocks)], filename
+            )
+            for name in group
+        }
+        self.num_rows = int(group.attrs.get("num_rows", 0))
+        self.num_tables = int(group.attrs.get("num_tables", 0))
+
+    @property
+    def colnames(self):
+        """Names of the columns."""
+        return list(self._columns)
+
+    def __getitem__(self, name):
+        return self._columns[name]
+
+    def __len__(self):
+        return self.num_rows
+
+    def read(self, rows=slice(None)):
+        """Reads rows into an astropy Table.
+
+        :param rows: index of the rows, e.g. a slice or an array of indices
+        :return: astropy Table
+        """
+        return Table({name: column[rows] for name, column in self._columns.items()})
+
+    def close(self):
+        """Closes the file."""
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+class _BlockColumn(object):
+    """Column of an ImageTableReader, stored as a sequence of blocks."""
+
+    def __init__(self, datasets, filename):
+        """
+
+        :param datasets: h5py datasets of the blocks
+        :param filename: name of the HDF5 file
+        """
+        self._blocks = [_open_block(dataset, filename) for dataset in datasets]
+        self._offsets = np.cumsum([0] + [len(dataset) for dataset in datasets])
+        if len(datasets) > 0:
+            self.shape = (int(self._offsets[-1]),) + datasets[0].shape[1:]
+        else:
+            self.shape = (0,)
+
+    def __len__(self):
+        return self.shape[0]
+
+    def __getitem__(self, index):
+        rows = np.arange(len(self))[index]
+        if np.ndim(rows) == 0:
+            block = np.searchsorted(self._offsets, rows, side="right") - 1
+            return self._blocks[block][rows - self._offsets[block]]
+        blocks = np.searchsorted(self._offsets, rows, side="right") - 1
+        values = []
+        for block in np.unique(blocks):
+            local_rows = rows[blocks == block] - self._offsets[block]
+            # read the range of the requested rows of the block at once
+            start, stop = np.min(local_rows), np.max(local_rows) + 1
+            values.append(
+                (block, np.asarray(self._blocks[block][start:stop])[local_rows - start])
+            )
+        if len(values) == 0:
+            return np.empty((0,) + self.shape[1:])
+        result = np.empty((len(rows),) + values[0][1].shape[1:], values[0][1].dtype)
+        for block, value in values:
+            result[blocks == block] = value
+        return result
+
+
+def _open_block(dataset, filename):
+    """Memory-maps a contiguous, uncompressed block of an ImageTableWriter
+    file. Other blocks are read through h5py.
+
+    :param dataset: h5py dataset of the block
+    :param filename: name of the HDF5 file
+    :return: numpy.memmap or object supporting slicing
+    """
+    if h5py.check_string_dtype(dataset.dtype) is not None:
+        return dataset.asstr()
+    offset = dataset.id.get_offset()
+    if dataset.chunks is None and offset is not None and dataset.size > 0:
+        return np.memmap(
+            filename, mode="r", dtype=dataset.dtype, offset=offset, shape=dataset.shape
+        )
+    return dataset
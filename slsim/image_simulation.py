@@ -1,13 +1,17 @@
 import numpy as np
 from lenstronomy.SimulationAPI.sim_api import SimAPI
 from astropy.visualization import make_lupton_rgb
+from scipy import ndimage
 from lenstronomy.Data.psf import PSF
 from lenstronomy.ImSim.Numerics.point_source_rendering import PointSourceRendering
+from lenstronomy.Util import util
 from slsim.Util.param_util import (
     magnitude_to_amplitude,
     convolved_image,
     transformmatrix_to_pixelscale,
 )
+from slsim.Util.stamp_cache import stamp_key
+from slsim.Util.noise import NoiseGenerator
 
 
 def simulate_image(
@@ -42,38 +46,192 @@ def simulate_image(
     :return: simulated image
     :rtype: 2d numpy array
     """
-    kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band)
+    return simulate_images(
+        [lens_class],
+        [band],
+        num_pix,
+        add_noise=add_noise,
+        observatory=observatory,
+        kwargs_psf=kwargs_psf,
+        kwargs_numerics=kwargs_numerics,
+        **kwargs
+    )[0, 0]
+
+
+def simulate_images(
+    lens_class_list,
+    band_list,
+    num_pix,
+    add_noise=True,
+    observatory="LSST",
+    kwargs_psf=None,
+    kwargs_numerics=None,
+    **kwargs
+):
+    """Creates images of several lenses in several bands with noise. The
+    images are the same as the ones of simulate_image() for each lens and band,
+    but the lenstronomy setup (pixel grid, PSF and numerics) is built once per
+    band and lenstronomy model configuration instead of once per image, and
+    the lens-plane ray-shooting is done once per lens for all bands (see
+    multi_band_extended_images()).
+
+    :param lens_class_list: list of Lens() objects
+    :param band_list: list of imaging bands
+    :param num_pix: number of pixels per axis
+    :param add_noise: if True, add noise
+    :param observatory: telescope type to be simulated
+    :type observatory: str
+    :param kwargs_psf: (optional) specific PSF quantities to overwrite
+        default options, applied to all bands (see simulate_image())
+    :type kwargs_psf: dict
+    :param kwargs_numerics: numerics options, see simulate_image()
+    :type kwargs_numerics: dict
+    :param kwargs: additional keyword arguments for the bands
+    :type kwargs: dict
+    :return: simulated images
+    :rtype: numpy array of shape (len(lens_class_list), len(band_list),
+        num_pix, num_pix)
+    """
     from slsim.Observations import image_quality_lenstronomy
 
-    kwargs_single_band = image_quality_lenstronomy.kwargs_single_band(
-        observatory=observatory, band=band, **kwargs
-    )
-    if kwargs_psf is not None:
-        kwargs_single_band.update(kwargs_psf)
-    sim_api = SimAPI(
-        numpix=num_pix, kwargs_single_band=kwargs_single_band, kwargs_model=kwargs_model
-    )
-    kwargs_lens_light, kwargs_source, kwargs_ps = sim_api.magnitude2amplitude(
-        kwargs_lens_light_mag=kwargs_params.get("kwargs_lens_light", None),
-        kwargs_source_mag=kwargs_params.get("kwargs_source", None),
-        kwargs_ps_mag=kwargs_params.get("kwargs_ps", None),
-    )
     if kwargs_numerics is None:
         kwargs_numerics = {
             "point_source_supersampling_factor": 1,
             "supersampling_factor": 3,
         }
-    image_model = sim_api.image_model_class(kwargs_numerics)
-    kwargs_lens = kwargs_params.get("kwargs_lens", None)
-    image = image_model.image(
-        kwargs_lens=kwargs_lens,
-        kwargs_source=kwargs_source,
-        kwargs_lens_light=kwargs_lens_light,
-        kwargs_ps=kwargs_ps,
-    )
-    if add_noise:
-        image += sim_api.noise_for_model(model=image)
-    return image
+    kwargs_band_list = []
+    for band in band_list:
+        kwargs_single_band = image_quality_lenstronomy.kwargs_single_band(
+            observatory=observatory, band=band, **kwargs
+        )
+        if kwargs_psf is not None:
+            kwargs_single_band.update(kwargs_psf)
+        kwargs_band_list.append(kwargs_single_band)
+
+    images = np.zeros((len(lens_class_list), len(band_list), num_pix, num_pix))
+    # SimAPI and ImageModel instances per band and lenstronomy model configuration
+    image_models = {}
+    for i, lens_class in enumerate(lens_class_list):
+        ray_shooting_cache = []
+        for j, band in enumerate(band_list):
+            kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band)
+            key = (j, _kwargs_model_key(kwargs_model))
+            if key not in image_models:
+                sim_api = SimAPI(
+                    numpix=num_pix,
+                    kwargs_single_band=kwargs_band_list[j],
+                    kwargs_model=kwargs_model,
+                )
+                image_models[key] = (
+                    sim_api,
+                    sim_api.image_model_class(kwargs_numerics),
+                )
+            sim_api, image_model = image_models[key]
+            kwargs_lens_light, kwargs_source, kwargs_ps = sim_api.magnitude2amplitude(
+                kwargs_lens_light_mag=kwargs_params.get("kwargs_lens_light", None),
+                kwargs_source_mag=kwargs_params.get("kwargs_source", None),
+                kwargs_ps_mag=kwargs_params.get("kwargs_ps", None),
+            )
+            kwargs_lens = kwargs_params.get("kwargs_lens", None)
+            image = _extended_image(
+                image_model,
+                _source_plane_coordinates(image_model, kwargs_lens, ray_shooting_cache),
+                kwargs_source,
+                kwargs_lens_light,
+            )
+            image += image_model.point_source(kwargs_ps, kwargs_lens)
+            if add_noise:
+                image += sim_api.noise_for_model(model=image)
+            images[i, j] = image
+    return images
+
+
+def _source_plane_coordinates(image_model, kwargs_lens, cache):
+    """Source-plane coordinates of the evaluation grid of an ImageModel for
+    each source light profile. The deflections do not depend on the band, such
+    that the coordinates of a lens are cached and reused by the ImageModel
+    instances of other bands with the same evaluation grid.
+
+    :param image_model: lenstronomy ImageModel instance
+    :param kwargs_lens: lenstronomy lens model keyword arguments
+    :param cache: list of (x, y, coordinates) of the grids evaluated for
+        this lens, updated in place
+    :return: list of (beta_x, beta_y) for each source light profile
+    """
+    x, y = image_model.ImageNumerics.coordinates_evaluate
+    for x_cached, y_cached, coordinates in cache:
+        if np.array_equal(x_cached, x) and np.array_equal(y_cached, y):
+            return coordinates
+    num_profiles = len(image_model.SourceModel.profile_type_list)
+    if image_model.LensModel.multi_plane:
+        # sources at different redshifts are mapped to their own source planes
+        coordinates = [
+            image_model.source_mapping.image2source(x, y, kwargs_lens, index_source=k)
+            for k in range(num_profiles)
+        ]
+    elif num_profiles > 0:
+        coordinates = [image_model.LensModel.ray_shooting(x, y, kwargs_lens)]
+        coordinates *= num_profiles
+    else:
+        coordinates = []
+    cache.append((x, y, coordinates))
+    return coordinates
+
+
+def _extended_image(
+    image_model,
+    source_coordinates,
+    kwargs_source,
+    kwargs_lens_light,
+    unconvolved=False,
+    source_add=True,
+    lens_light_add=True,
+):
+    """Image of the lensed extended sources and of the deflector light
+    evaluated on given source-plane coordinates (see
+    _source_plane_coordinates()), without point sources.
+
+    :param image_model: lenstronomy ImageModel instance
+    :param source_coordinates: list of (beta_x, beta_y) of the
+        evaluation grid for each source light profile
+    :param kwargs_source: source light keyword arguments (amplitudes)
+    :param kwargs_lens_light: deflector light keyword arguments
+        (amplitudes)
+    :param unconvolved: if True, the image is not convolved with the PSF
+    :param source_add: if True, includes the source light
+    :param lens_light_add: if True, includes the deflector light
+    :return: 2d array of surface brightness pixels
+    """
+    x, y = image_model.ImageNumerics.coordinates_evaluate
+    flux = np.zeros_like(x)
+    if source_add:
+        for k, (beta_x, beta_y) in enumerate(source_coordinates):
+            flux += image_model.SourceModel.surface_brightness(
+                beta_x, beta_y, kwargs_source, k=k
+            )
+    if lens_light_add:
+        flux += image_model.LensLightModel.surface_brightness(x, y, kwargs_lens_light)
+    return image_model.ImageNumerics.re_size_convolve(flux, unconvolved=unconvolved)
+
+
+def _kwargs_model_key(kwargs_model):
+    """Hashable key of a lenstronomy model configuration, such that lenses with
+    the same profiles (and redshifts) share their SimAPI instances.
+
+    :param kwargs_model: lenstronomy model keyword arguments
+    :type kwargs_model: dict
+    :return: tuple
+    """
+    key = []
+    for name in sorted(kwargs_model):
+        value = kwargs_model[name]
+        if isinstance(value, (list, tuple)):
+            value = tuple(value)
+        elif not isinstance(value, (str, int, float, type(None))):
+            # e.g. the astropy cosmology instance
+            value = id(value)
+        key.append((name, value))
+    return tuple(key)
 
 
 def sharp_image(
@@ -84,6 +242,9 @@ def sharp_image(
     num_pix,
     with_source=True,
     with_deflector=True,
+    supersampling_tolerance=None,
+    dtype=np.float64,
+    stamp_cache=None,
 ):
     """Creates an unconvolved image of a selected lens. Point source image is
     not included in this function.
@@ -95,44 +256,325 @@ def sharp_image(
     :param num_pix: number of pixels per axis
     :param with_source: bool, if True computes source
     :param with_deflector: bool, if True includes deflector light
+    :param supersampling_tolerance: if not None, only the pixels near
+        arcs and compact light are supersampled, with this tolerance
+        relative to the peak surface brightness (see
+        multi_band_extended_images())
+    :type supersampling_tolerance: float or None
+    :param dtype: data type of the returned image, e.g. np.float32. The
+        image is computed in double precision and cast at the end.
+    :param stamp_cache: if not None, the image is taken from or added to
+        this cache
+    :type stamp_cache: ~slsim.Util.stamp_cache.StampCache or None
     :return: 2d array unblurred image
     """
-    kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band)
-    kwargs_band = {
-        "pixel_scale": delta_pix,
-        "magnitude_zero_point": mag_zero_point,
-        "background_noise": 0,  # these are keywords not being used but need to be
-        ## set in SimAPI
-        "psf_type": "NONE",  # these are keywords not being used but need to be set
-        ##in SimAPI
-        "exposure_time": 1,
-    }  # these are keywords not being used but need to be set in
-    ##SimAPI
-    sim_api = SimAPI(
-        numpix=num_pix, kwargs_single_band=kwargs_band, kwargs_model=kwargs_model
-    )
-    kwargs_lens_light, kwargs_source, kwargs_ps = sim_api.magnitude2amplitude(
-        kwargs_lens_light_mag=kwargs_params.get("kwargs_lens_light", None),
-        kwargs_source_mag=kwargs_params.get("kwargs_source", None),
-        kwargs_ps_mag=kwargs_params.get("kwargs_ps", None),
-    )
+    return multi_band_extended_images(
+        lens_class,
+        [band],
+        mag_zero_point,
+        delta_pix,
+        num_pix,
+        with_source=with_source,
+        with_deflector=with_deflector,
+        supersampling_tolerance=supersampling_tolerance,
+        dtype=dtype,
+        stamp_cache=stamp_cache,
+    )[0]
+
+
+def multi_band_extended_images(
+    lens_class,
+    band_list,
+    mag_zero_point,
+    delta_pix,
+    num_pix,
+    with_source=True,
+    with_deflector=True,
+    supersampling_tolerance=None,
+    dtype=np.float64,
+    stamp_cache=None,
+):
+    """Creates unconvolved images of a selected lens in several bands. The
+    supersampled pixel grid is ray-shot once and the source and deflector
+    light of each band is evaluated on the same source-plane coordinates. Point
+    source images are not included in this function.
+
+    By default, all pixels are supersampled by a factor 5. With
+    supersampling_tolerance, the images are first evaluated at the pixel
+    centers, and only the pixels where this differs from the pixel average by
+    more than the tolerance (see supersampling_mask()) and their neighbours are
+    supersampled, which is much cheaper for cutouts dominated by sky and smooth
+    deflector light. Light that is not resolved at the pixel scale can fall
+    between the pixel centers, such that the pixels around the lensed images
+    and the deflector core are supersampled as well (see compact_light_mask()).
+
+    :param lens_class: Lens() object
+    :param band_list: list of imaging bands
+    :param mag_zero_point: magnitude zero point, for all bands or one
+        per band
+    :type mag_zero_point: float or list of float
+    :param delta_pix: pixel scale of image generated
+    :param num_pix: number of pixels per axis
+    :param with_source: bool, if True computes source
+    :param with_deflector: bool, if True includes deflector light
+    :param supersampling_tolerance: if not None, tolerance of the
+        adaptive supersampling relative to the peak surface brightness
+        of each image, e.g. 1e-3
+    :type supersampling_tolerance: float or None
+    :param dtype: data type of the returned images, e.g. np.float32 to
+        halve their memory. The images are computed in double precision
+        and cast at the end.
+    :param stamp_cache: if not None, the image of each band is taken from
+        this cache if it was rendered before for the same lens model,
+        zero point, pixel grid and options, and only the other bands are
+        rendered and added to the cache
+    :type stamp_cache: ~slsim.Util.stamp_cache.StampCache or None
+    :return: unblurred images
+    :rtype: numpy array of shape (len(band_list), num_pix, num_pix)
+    """
+    mag_zero_point_list = np.broadcast_to(mag_zero_point, len(band_list))
+    if stamp_cache is not None:
+        keys = [
+            _extended_stamp_key(
+                lens_class,
+                band,
+                mag_zero_point_list[j],
+                delta_pix,
+                num_pix,
+                with_source,
+                with_deflector,
+                supersampling_tolerance,
+            )
+            for j, band in enumerate(band_list)
+        ]
+        images = [stamp_cache.get(key) for key in keys]
+        missing = [j for j, image in enumerate(images) if image is None]
+        if len(missing) > 0:
+            images_missing = multi_band_extended_images(
+                lens_class,
+                [band_list[j] for j in missing],
+                mag_zero_point_list[missing],
+                delta_pix,
+                num_pix,
+                with_source=with_source,
+                with_deflector=with_deflector,
+                supersampling_tolerance=supersampling_tolerance,
+            )
+            for j, image in zip(missing, images_missing):
+                stamp_cache.put(keys[j], image)
+                images[j] = image
+        return np.array(images, dtype=dtype).reshape(len(band_list), num_pix, num_pix)
     kwargs_numerics = {"supersampling_factor": 5}
-    image_model = sim_api.image_model_class(kwargs_numerics)
-    kwargs_lens = kwargs_params.get("kwargs_lens", None)
-    image = image_model.image(
-        kwargs_lens=kwargs_lens,
-        kwargs_source=kwargs_source,
-        kwargs_lens_light=kwargs_lens_light,
-        kwargs_ps=kwargs_ps,
-        unconvolved=True,
-        source_add=with_source,
-        lens_light_add=with_deflector,
-        point_source_add=False,
+    if supersampling_tolerance is not None:
+        images = _extended_images(
+            lens_class,
+            band_list,
+            mag_zero_point_list,
+            delta_pix,
+            num_pix,
+            with_source,
+            with_deflector,
+            kwargs_numerics={"supersampling_factor": 1},
+        )
+        kwargs_numerics = {
+            "supersampling_factor": 5,
+            "compute_mode": "adaptive",
+            "supersampled_indexes": supersampling_mask(images, supersampling_tolerance)
+            | compact_light_mask(
+                lens_class, delta_pix, num_pix, with_source, with_deflector
+            ),
+        }
+    images = _extended_images(
+        lens_class,
+        band_list,
+        mag_zero_point_list,
+        delta_pix,
+        num_pix,
+        with_source,
+        with_deflector,
+        kwargs_numerics=kwargs_numerics,
     )
-    return image
+    return images.astype(dtype, copy=False)
+
+
+def _extended_stamp_key(
+    lens_class,
+    band,
+    mag_zero_point,
+    delta_pix,
+    num_pix,
+    with_source,
+    with_deflector,
+    supersampling_tolerance,
+):
+    """Key of an unconvolved image in a StampCache, see
+    multi_band_extended_images(). The point sources do not enter the
+    image and their keyword arguments are not part of the key.
+
+    :return: stamp key
+    :rtype: str
+    """
+    kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band)
+    kwargs_params = {
+        name: kwargs for name, kwargs in kwargs_params.items() if name != "kwargs_ps"
+    }
+    return stamp_key(
+        "extended_image",
+        kwargs_model,
+        kwargs_params,
+        band,
+        mag_zero_point,
+        delta_pix,
+        num_pix,
+        with_source,
+        with_deflector,
+        supersampling_tolerance,
+    )
+
+
+def supersampling_mask(images, tolerance):
+    """Pixels that need to be supersampled, estimated from images evaluated at
+    the pixel centers. For a smooth surface brightness, the pixel average
+    differs from the value at the center by the Laplacian (in pixel units)
+    divided by 24. Pixels where this exceeds the tolerance relative to the
+    peak of the image, in any of the images, are selected together with their
+    neighbours.
+
+    :param images: image or stack of images evaluated at the pixel
+        centers
+    :param tolerance: tolerance relative to the peak of each image
+    :type tolerance: float
+    :return: 2d boolean array
+    """
+    images = np.asarray(images)
+    if images.ndim == 2:
+        images = images[np.newaxis]
+    mask = np.zeros(images.shape[1:], dtype=bool)
+    for image in images:
+        peak = np.max(np.abs(image))
+        if peak > 0:
+            error = np.abs(ndimage.laplace(image, mode="nearest")) / 24
+            mask |= error > tolerance * peak
+    return ndimage.binary_dilation(mask)
+
+
+def compact_light_mask(
+    lens_class, delta_pix, num_pix, with_source=True, with_deflector=True
+):
+    """Pixels around the light of a lens that may not be resolved at the pixel
+    scale, and hence missed by images evaluated at the pixel centers (see
+    supersampling_mask()). These are the pixels within a pixel plus twice the
+    source size, stretched by the magnification, of the lensed images of each
+    source, and within the Einstein radius of the deflector center. If the size
+    of a source is not known (e.g. for interpolated sources), all the pixels are
+    selected.
+
+    :param lens_class: Lens() object
+    :param delta_pix: pixel scale of the image
+    :param num_pix: number of pixels per axis
+    :param with_source: bool, if True includes the lensed images
+    :param with_deflector: bool, if True includes the deflector core
+    :return: 2d boolean array
+    """
+    x, y = util.make_grid(num_pix, delta_pix)
+    x, y = x.reshape(num_pix, num_pix), y.reshape(num_pix, num_pix)
+    mask = np.zeros((num_pix, num_pix), dtype=bool)
+    if with_source:
+        image_positions = lens_class.extended_source_image_positions()
+        magnifications = lens_class.extended_source_magnification_for_individual_image()
+        for j in range(lens_class.source_number):
+            source = lens_class.source(j)
+            if source.angular_size is None:
+                return np.ones((num_pix, num_pix), dtype=bool)
+            size = np.max(source.angular_size)
+            x_image, y_image = image_positions[j]
+            magnification = magnifications[j]
+            if len(x_image) == 0:
+                x_image, y_image = source.extended_source_position(
+                    reference_position=lens_class.deflector_position,
+                    draw_area=lens_class.test_area,
+                )
+                x_image, y_image, magnification = [x_image], [y_image], [1]
+            for x_, y_, mu in zip(x_image, y_image, magnification):
+                radius = delta_pix + 2 * size * max(1, abs(mu))
+                mask |= (x - x_) ** 2 + (y - y_) ** 2 < radius**2
+    if with_deflector:
+        center_x, center_y = lens_class.deflector_position
+        radius = max(np.max(lens_class.einstein_radius), delta_pix)
+        mask |= (x - center_x) ** 2 + (y - center_y) ** 2 < radius**2
+    return mask
+
+
+def _extended_images(
+    lens_class,
+    band_list,
+    mag_zero_point_list,
+    delta_pix,
+    num_pix,
+    with_source,
+    with_deflector,
+    kwargs_numerics,
+):
+    """Unconvolved images of a lens in several bands for given lenstronomy
+    numerics options, see multi_band_extended_images().
+
+    :param mag_zero_point_list: magnitude zero point of each band
+    :param kwargs_numerics: lenstronomy numerics keyword arguments
+    :return: numpy array of shape (len(band_list), num_pix, num_pix)
+    """
+    images = np.zeros((len(band_list), num_pix, num_pix))
+    # SimAPI and ImageModel instances per zero point and lenstronomy model
+    # configuration
+    image_models = {}
+    ray_shooting_cache = []
+    for j, band in enumerate(band_list):
+        kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band)
+        key = (float(mag_zero_point_list[j]), _kwargs_model_key(kwargs_model))
+        if key not in image_models:
+            kwargs_band = {
+                "pixel_scale": delta_pix,
+                "magnitude_zero_point": mag_zero_point_list[j],
+                "background_noise": 0,  # these are keywords not being used but
+                ## need to be set in SimAPI
+                "psf_type": "NONE",  # these are keywords not being used but need
+                ## to be set in SimAPI
+                "exposure_time": 1,
+            }  # these are keywords not being used but need to be set in
+            ##SimAPI
+            sim_api = SimAPI(
+                numpix=num_pix,
+                kwargs_single_band=kwargs_band,
+                kwargs_model=kwargs_model,
+            )
+            image_models[key] = (sim_api, sim_api.image_model_class(kwargs_numerics))
+        sim_api, image_model = image_models[key]
+        kwargs_lens_light, kwargs_source, kwargs_ps = sim_api.magnitude2amplitude(
+            kwargs_lens_light_mag=kwargs_params.get("kwargs_lens_light", None),
+            kwargs_source_mag=kwargs_params.get("kwargs_source", None),
+            kwargs_ps_mag=kwargs_params.get("kwargs_ps", None),
+        )
+        kwargs_lens = kwargs_params.get("kwargs_lens", None)
+        if with_source:
+            source_coordinates = _source_plane_coordinates(
+                image_model, kwargs_lens, ray_shooting_cache
+            )
+        else:
+            source_coordinates = []
+        images[j] = _extended_image(
+            image_model,
+            source_coordinates,
+            kwargs_source,
+            kwargs_lens_light,
+            unconvolved=True,
+            source_add=with_source,
+            lens_light_add=with_deflector,
+        )
+    return images
 
 
-def sharp_rgb_image(lens_class, rgb_band_list, mag_zero_point, delta_pix, num_pix):
+def sharp_rgb_image(
+    lens_class, rgb_band_list, mag_zero_point, delta_pix, num_pix, stamp_cache=None
+):
     """Creates an unconvolved rgb image of a selected lens.
 
     :param lens_class: Lens() object
@@ -141,28 +583,17 @@ def sharp_rgb_image(lens_class, rgb_band_list, mag_zero_point, delta_pix, num_pi
     :param mag_zero_point: magnitude zero point in band
     :param delta_pix: pixel scale of image generated
     :param num_pix: number of pixels per axis
+    :param stamp_cache: if not None, cache of the images of the bands
+        (see multi_band_extended_images())
     :return: rgb image
     """
-    image_r = sharp_image(
-        lens_class=lens_class,
-        band=rgb_band_list[0],
-        mag_zero_point=mag_zero_point,
-        delta_pix=delta_pix,
-        num_pix=num_pix,
-    )
-    image_g = sharp_image(
+    image_r, image_g, image_b = multi_band_extended_images(
         lens_class=lens_class,
-        band=rgb_band_list[1],
-        mag_zero_point=mag_zero_point,
-        delta_pix=delta_pix,
-        num_pix=num_pix,
-    )
-    image_b = sharp_image(
-        lens_class=lens_class,
-        band=rgb_band_list[2],
+        band_list=rgb_band_list[:3],
         mag_zero_point=mag_zero_point,
         delta_pix=delta_pix,
         num_pix=num_pix,
+        stamp_cache=stamp_cache,
     )
     image_rgb = make_lupton_rgb(image_r, image_g, image_b, stretch=0.5)
     return image_rgb
@@ -297,6 +728,7 @@ def point_source_image_without_variability(
     num_pix,
     psf_kernel,
     transform_pix2angle,
+    dtype=np.float64,
 ):
     """Creates lensed point source images without variability on the basis of
     given information.
@@ -309,6 +741,8 @@ def point_source_image_without_variability(
     :param psf_kernel: psf kernel for an image.
     :param transform_pix2angle: transformation matrix (2x2) of pixels
         into coordinate displacements
+    :param dtype: data type of the returned image, e.g. np.float32. The
+        rendering is done in double precision.
     :return: point source images
     """
     kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band=band)
@@ -343,7 +777,7 @@ def point_source_image_without_variability(
         )
     else:
         point_source_image = np.zeros((num_pix, num_pix))
-    return point_source_image
+    return point_source_image.astype(dtype, copy=False)
 
 
 def point_source_image_at_time(
@@ -355,6 +789,7 @@ def point_source_image_at_time(
     psf_kernel,
     transform_pix2angle,
     time,
+    dtype=np.float64,
 ):
     """Creates lensed point source images with variability at a given time on
     the basis of given information.
@@ -368,6 +803,8 @@ def point_source_image_at_time(
     :param transform_pix2angle: transformation matrix (2x2) of pixels
         into coordinate displacements
     :param time: time is an image observation time [day].
+    :param dtype: data type of the returned image, e.g. np.float32. The
+        rendering is done in double precision.
     :return: point source images with variability
     """
 
@@ -407,7 +844,7 @@ def point_source_image_at_time(
         )
     else:
         point_source_image = np.zeros((num_pix, num_pix))
-    return point_source_image
+    return point_source_image.astype(dtype, copy=False)
 
 
 def point_source_image_with_variability(
@@ -419,45 +856,266 @@ def point_source_image_with_variability(
     psf_kernels,
     transform_pix2angle,
     t_obs,
+    dtype=np.float64,
+    max_epochs_per_batch=256,
 ):
     """Creates lensed point source images with variability for series of time
-    on the basis of given information.
+    on the basis of given information. The magnitudes of all epochs are
+    evaluated at once and the images are rendered in a single pass with
+    multi_epoch_point_source_images().
 
     :param lens_class: Lens() object
     :param band: imaging band
     :param mag_zero_point: magnitude zero point for each exposure
-    :param delta_pix: pixel scale of image generated
+    :param delta_pix: pixel scale of image generated (the pixel grid is
+        defined by transform_pix2angle)
     :param num_pix: number of pixels per axis
     :param psf_kernels: psf kernels in the sequence of exposures being
         simulated.
     :param transform_pix2angle: transformation matrix (2x2) of pixels
-        into coordinate displacements
+        into coordinate displacements, for all exposures or one per
+        exposure
     :param t_obs: array of image observation time [day].
-    :return: array of point source images with variability
+    :param dtype: data type of the returned images, e.g. np.float32. The
+        rendering is done in double precision.
+    :param max_epochs_per_batch: maximum number of exposures rendered at
+        once, see multi_epoch_point_source_images()
+    :return: point source images with variability
+    :rtype: numpy array of shape (len(t_obs), num_pix, num_pix)
     """
-    all_image = []
-    for time, psf_kernel, mag_zero, transf_matrix in zip(
-        t_obs, psf_kernels, mag_zero_point, transform_pix2angle
-    ):
-        image_test = point_source_image_at_time(
-            lens_class,
-            band=band,
-            mag_zero_point=mag_zero,
-            delta_pix=delta_pix,
-            num_pix=num_pix,
-            psf_kernel=psf_kernel,
-            transform_pix2angle=transf_matrix,
-            time=time,
+    t_obs = np.atleast_1d(np.asarray(t_obs, dtype=float))
+    kwargs_model, kwargs_params = lens_class.lenstronomy_kwargs(band=band)
+    if kwargs_params["kwargs_ps"] is None:
+        return np.zeros((len(t_obs), num_pix, num_pix), dtype=dtype)
+    image_positions = lens_class.point_source_image_positions()
+    ra_image = np.concatenate([ps_coord[0] for ps_coord in image_positions])
+    dec_image = np.concatenate([ps_coord[1] for ps_coord in image_positions])
+    # (n_image, n_epoch) magnitudes of all sources
+    variable_mag = lens_class.point_source_magnitude(band=band, lensed=True, time=t_obs)
+    variable_mag = np.concatenate(
+        [np.reshape(mag, (len(mag), len(t_obs))) for mag in variable_mag]
+    )
+    variable_mag = np.nan_to_num(variable_mag, nan=np.inf)
+    images = multi_epoch_point_source_images(
+        ra_image,
+        dec_image,
+        magnitudes=variable_mag.T,
+        mag_zero_points=mag_zero_point,
+        psf_kernels=psf_kernels,
+        num_pix=num_pix,
+        transform_pix2angle=transform_pix2angle,
+        dtype=dtype,
+        max_epochs_per_batch=max_epochs_per_batch,
+    )
+    return images
+
+
+def multi_epoch_point_source_images(
+    ra_image,
+    dec_image,
+    magnitudes,
+    mag_zero_points,
+    psf_kernels,
+    num_pix,
+    transform_pix2angle,
+    dtype=np.float64,
+    max_epochs_per_batch=256,
+):
+    """Renders point sources of given magnitudes in a series of exposures.
+    The (normalized) PSF kernels are shifted to the sub-pixel positions of
+    the images by linear interpolation and added to the images at once for
+    all exposures, as lenstronomy's PointSourceRendering does for a single
+    exposure without supersampling, but without building any lenstronomy
+    object per exposure.
+
+    The exposures are rendered in batches of at most max_epochs_per_batch,
+    such that the memory of the intermediate arrays (the kernels moved and
+    shifted for each exposure and image) does not grow with the length of
+    the series.
+
+    :param ra_image: RA positions of the images [arcsec], relative to
+        the image center (see centered_coordinate_system())
+    :type ra_image: array of shape (n_image,)
+    :param dec_image: DEC positions of the images [arcsec]
+    :type dec_image: array of shape (n_image,)
+    :param magnitudes: magnitudes of the images in each exposure. Non-
+        finite magnitudes are not rendered.
+    :type magnitudes: array of shape (n_epoch, n_image)
+    :param mag_zero_points: magnitude zero point, for all exposures or
+        one per exposure
+    :param psf_kernels: psf kernel of odd size, for all exposures, or
+        list of psf kernels of odd size, one per exposure
+    :param num_pix: number of pixels per axis
+    :param transform_pix2angle: transformation matrix (2x2) of pixels
+        into coordinate displacements, for all exposures or one per
+        exposure
+    :param dtype: data type of the returned images, e.g. np.float32. The
+        rendering is done in double precision.
+    :param max_epochs_per_batch: maximum number of exposures rendered at
+        once
+    :type max_epochs_per_batch: int
+    :return: point source images
+    :rtype: numpy array of shape (n_epoch, num_pix, num_pix)
+    """
+    magnitudes = np.atleast_2d(magnitudes)
+    num_epoch = len(magnitudes)
+    mag_zero_points = np.broadcast_to(mag_zero_points, num_epoch)
+    transform_pix2angle = np.broadcast_to(transform_pix2angle, (num_epoch, 2, 2))
+    if np.ndim(psf_kernels[0]) == 1:
+        psf_kernels = [psf_kernels] * num_epoch
+    images = np.empty((num_epoch, num_pix, num_pix), dtype=dtype)
+    for start in range(0, num_epoch, max_epochs_per_batch):
+        batch = slice(start, start + max_epochs_per_batch)
+        images[batch] = _point_source_images_batch(
+            ra_image,
+            dec_image,
+            magnitudes[batch],
+            mag_zero_points[batch],
+            psf_kernels[batch],
+            num_pix,
+            transform_pix2angle[batch],
         )
-        all_image.append(image_test)
-    variab_images = [list(x) for x in zip(*all_image)]
-    image = np.array(variab_images)
-    n = len(image)
-    subarray_shape = image[0].shape
-    results = np.zeros(subarray_shape)
-    for i in range(n):
-        results += image[i]
-    return results
+    return images
+
+
+def _point_source_images_batch(
+    ra_image,
+    dec_image,
+    magnitudes,
+    mag_zero_points,
+    psf_kernels,
+    num_pix,
+    transform_pix2angle,
+):
+    """Renders point sources in a batch of exposures, see
+    multi_epoch_point_source_images().
+
+    :param ra_image: RA positions of the images [arcsec]
+    :param dec_image: DEC positions of the images [arcsec]
+    :param magnitudes: magnitudes of the images, of shape (n_epoch, n_image)
+    :param mag_zero_points: magnitude zero points, of shape (n_epoch,)
+    :param psf_kernels: list of psf kernels of odd size, one per exposure
+    :param num_pix: number of pixels per axis
+    :param transform_pix2angle: transformation matrices, of shape
+        (n_epoch, 2, 2)
+    :return: point source images of shape (n_epoch, num_pix, num_pix)
+    """
+    num_epoch, num_image = magnitudes.shape
+    amp = magnitude_to_amplitude(magnitudes, mag_zero_points[:, np.newaxis])
+    kernels = _normalized_kernels(psf_kernels, num_epoch)
+    k_y, k_x = kernels.shape[1:]
+    radius_y, radius_x = (k_y - 1) // 2, (k_x - 1) // 2
+
+    # pixel coordinates of the images in each exposure
+    x_pos = np.zeros((num_epoch, num_image))
+    y_pos = np.zeros((num_epoch, num_image))
+    for transform in np.unique(transform_pix2angle, axis=0):
+        epochs = np.all(transform_pix2angle == transform, axis=(1, 2))
+        kwargs_grid = centered_coordinate_system(num_pix, transform)
+        transform_angle2pix = np.linalg.inv(transform)
+        x_pos[epochs], y_pos[epochs] = np.dot(
+            transform_angle2pix,
+            [
+                ra_image - kwargs_grid["ra_at_xy_0"],
+                dec_image - kwargs_grid["dec_at_xy_0"],
+            ],
+        )[:, np.newaxis]
+    x_int = np.round(x_pos).astype(int)
+    y_int = np.round(y_pos).astype(int)
+
+    # the kernels are shifted by linear interpolation, as scipy.ndimage.shift(
+    # order=1): each shifted kernel combines the kernel moved by -1, 0 and +1
+    # pixel along each axis, with zero weight for kernel pixels interpolated
+    # from outside the kernel
+    weights_y = _shift_weights(y_pos - y_int, k_y)
+    weights_x = _shift_weights(x_pos - x_int, k_x)
+    kernels_padded = np.pad(kernels, ((0, 0), (1, 1), (1, 1)))
+    kernels_moved = np.array(
+        [
+            [kernels_padded[:, i : i + k_y, j : j + k_x] for j in range(3)]
+            for i in range(3)
+        ]
+    )
+    # overlapping images with a finite amplitude
+    visible = (
+        np.isfinite(amp)
+        & (np.abs(x_int - (num_pix - 1) / 2) <= (num_pix - 1) / 2 + radius_x)
+        & (np.abs(y_int - (num_pix - 1) / 2) <= (num_pix - 1) / 2 + radius_y)
+    )
+    amp = np.where(visible, amp, 0)
+    shifted_kernels = np.einsum(
+        "ekai,ekbj,abeij,ek->ekij",
+        weights_y,
+        weights_x,
+        kernels_moved,
+        amp,
+        optimize=True,
+    )
+
+    # the kernels are added to images padded by twice the kernel radius, such
+    # that partially overlapping kernels are not cut
+    images = np.zeros((num_epoch, num_pix + 4 * radius_y, num_pix + 4 * radius_x))
+    epoch_index = np.arange(num_epoch)[:, np.newaxis, np.newaxis]
+    rows = np.arange(k_y)[np.newaxis, :, np.newaxis]
+    columns = np.arange(k_x)[np.newaxis, np.newaxis, :]
+    row_start = np.where(visible, y_int + radius_y, 0)
+    column_start = np.where(visible, x_int + radius_x, 0)
+    for i in range(num_image):
+        images[
+            epoch_index,
+            row_start[:, i, np.newaxis, np.newaxis] + rows,
+            column_start[:, i, np.newaxis, np.newaxis] + columns,
+        ] += shifted_kernels[:, i]
+    return images[
+        :,
+        2 * radius_y : 2 * radius_y + num_pix,
+        2 * radius_x : 2 * radius_x + num_pix,
+    ]
+
+
+def _normalized_kernels(psf_kernels, num_epoch):
+    """Stack of normalized psf kernels, padded to a common shape.
+
+    :param psf_kernels: psf kernel of odd size, or list of psf kernels
+        of odd size, one per exposure
+    :param num_epoch: number of exposures
+    :return: array of shape (num_epoch, k_y, k_x)
+    """
+    if np.ndim(psf_kernels[0]) == 1:
+        psf_kernels = [psf_kernels] * num_epoch
+    shape = np.max([np.shape(kernel) for kernel in psf_kernels], axis=0)
+    kernels = np.zeros((num_epoch, shape[0], shape[1]))
+    for i, kernel in enumerate(psf_kernels):
+        kernel = np.asarray(kernel, dtype=float)
+        if kernel.shape[0] % 2 == 0 or kernel.shape[1] % 2 == 0:
+            raise ValueError(
+                "psf kernel dimensions must be odd, not %s" % (kernel.shape,)
+            )
+        pad_y = (shape[0] - kernel.shape[0]) // 2
+        pad_x = (shape[1] - kernel.shape[1]) // 2
+        kernels[i, pad_y : pad_y + kernel.shape[0], pad_x : pad_x + kernel.shape[1]] = (
+            kernel / np.sum(kernel)
+        )
+    return kernels
+
+
+def _shift_weights(shift, num_pix_kernel):
+    """Weights of the kernel moved by -1, 0 and +1 pixel in a linear
+    interpolation shift along one axis, see
+    multi_epoch_point_source_images().
+
+    :param shift: sub-pixel shifts, between -0.5 and 0.5
+    :param num_pix_kernel: kernel size along the axis
+    :return: array of shape shift.shape + (3, num_pix_kernel)
+    """
+    weights = np.stack(
+        [np.maximum(shift, 0), 1 - np.abs(shift), np.maximum(-shift, 0)], axis=-1
+    )
+    weights = np.repeat(weights[..., np.newaxis], num_pix_kernel, axis=-1)
+    # kernel pixels interpolated from outside the kernel are set to zero
+    weights[..., 0] *= (shift <= 0)[..., np.newaxis]
+    weights[..., -1] *= (shift >= 0)[..., np.newaxis]
+    return weights
 
 
 def deflector_images_with_different_zeropoint(
@@ -492,7 +1150,12 @@ def deflector_images_with_different_zeropoint(
 
 
 def image_plus_poisson_noise(
-    image, exposure_time, gain=1, coadd_zero_point=27, single_visit_zero_point=27
+    image,
+    exposure_time,
+    gain=1,
+    coadd_zero_point=27,
+    single_visit_zero_point=27,
+    seed=None,
 ):
     """Creates an image with possion noise.
 
@@ -504,36 +1167,41 @@ def image_plus_poisson_noise(
         27).
     :param single_visit_zero_point: Zero point of the single-visit image
         (default 27 for g-band).
+    :param seed: seed of the noise. If None, it is drawn from the global
+        numpy random state, see ~slsim.Util.noise.NoiseGenerator
     :return: image with possion noise. The function returns ADU/sec in
         all cases, regardless of whether gain = 1 or not. The noise is
         applied in the electron domain, but the final image is converted
         back to ADU/sec.
     """
-    # make sure all values in an image are positive
-    image_positive = np.clip(image, 0, None)
-    # Compute zero point scaling factor
-    zero_point_scale = 10 ** (0.4 * (coadd_zero_point - single_visit_zero_point))
-    # Convert counts-per-second to electrons
-    cps_to_electrons = exposure_time * gain / zero_point_scale
-    # get electron count with poisson noise
-    noisy_electrons = np.random.poisson(image_positive * cps_to_electrons)
-    # convert back to count per sec
-    noisy_image = noisy_electrons / cps_to_electrons
-    return noisy_image
-
-
-def image_plus_poisson_noise_for_list_of_image(images, exposure_times):
-    """Creates an image with possion noise.
+    return NoiseGenerator(seed=seed).add_noise(
+        np.asarray(image)[np.newaxis],
+        exposure_time=exposure_time,
+        gain=gain,
+        coadd_zero_point=coadd_zero_point,
+        single_visit_zero_point=single_visit_zero_point,
+    )[0]
+
 
-    :param images: list of images
+def image_plus_poisson_noise_for_list_of_image(images, exposure_times, seed=None):
+    """Creates an image with possion noise. The noise of all images is drawn
+    at once.
+
+    :param images: list of images of the same shape
     :param exposure_time: list of exposure times or exposure maps
+    :param seed: seed of the noise. If None, it is drawn from the global
+        numpy random state, see ~slsim.Util.noise.NoiseGenerator
     :return: list of images with possion noise
     """
-    list_of_noisy_images = [
-        image_plus_poisson_noise(data, expo_time)
-        for data, expo_time in zip(images, exposure_times)
-    ]
-    return list_of_noisy_images
+    images = np.asarray(images)
+    if any(np.ndim(expo_time) > 0 for expo_time in exposure_times):
+        exposure_times = [
+            np.broadcast_to(expo_time, images.shape[1:]) for expo_time in exposure_times
+        ]
+    noisy_images = NoiseGenerator(seed=seed).add_noise(
+        images, exposure_time=exposure_times
+    )
+    return list(noisy_images)
 
 
 def lens_image(
@@ -556,6 +1224,10 @@ def lens_image(
         "z": 31.45,
         "y": 30.63,
     },
+    convolution_type="fft",
+    dtype=np.float64,
+    stamp_cache=None,
+    seed=None,
 ):
     """Creates lens image on the basis of given information. It can simulate
     both static lens image and variable lens image.
@@ -583,6 +1255,17 @@ def lens_image(
         sould contain at least values for the band in which one need to
         simulate images. Default values are average magnitude zero
         points for LSST single visists in each band.
+    :param convolution_type: method to convolve the deflector and
+        extended source with the PSF, see
+        ~slsim.Util.param_util.convolved_image()
+    :param dtype: data type of the returned image, e.g. np.float32 to
+        halve its memory. The image, including its noise, is computed in
+        double precision and cast at the end.
+    :param stamp_cache: if not None, the unconvolved image of the
+        deflector and extended source is taken from or added to this
+        cache, see ~slsim.Util.stamp_cache.StampCache
+    :param seed: seed of the noise. If None, it is drawn from the global
+        numpy random state, see ~slsim.Util.noise.NoiseGenerator
     :return: lens image
     """
     delta_pix = transformmatrix_to_pixelscale(transform_pix2angle)
@@ -594,9 +1277,12 @@ def lens_image(
         num_pix=num_pix,
         with_source=with_source,
         with_deflector=with_deflector,
+        stamp_cache=stamp_cache,
     )
     convolved_deflector_source = convolved_image(
-        image=deflector_source, psf_kernel=psf_kernel
+        image=deflector_source,
+        psf_kernel=psf_kernel,
+        convolution_type=convolution_type,
     )
     if t_obs is None:
         image_ps = point_source_image_without_variability(
@@ -620,21 +1306,71 @@ def lens_image(
             time=t_obs,
         )
     image = convolved_deflector_source + image_ps
-    if exposure_time is not None:
-        # For DP0 images, gain is always 0.7.
-        final_image = image_plus_poisson_noise(
-            image=image,
-            exposure_time=exposure_time,
-            gain=gain,
-            coadd_zero_point=mag_zero_point,
-            single_visit_zero_point=single_visit_mag_zero_points[band],
-        )
-    else:
-        final_image = image
+    image = _add_lens_image_noise(
+        image[np.newaxis],
+        band_list=[band],
+        mag_zero_point_list=[mag_zero_point],
+        exposure_time_list=[exposure_time],
+        std_gaussian_noise=std_gaussian_noise,
+        gain=gain,
+        single_visit_mag_zero_points=single_visit_mag_zero_points,
+        seed=seed,
+    )[0]
+    return image.astype(dtype, copy=False)
+
+
+def _add_lens_image_noise(
+    images,
+    band_list,
+    mag_zero_point_list,
+    exposure_time_list,
+    std_gaussian_noise,
+    gain,
+    single_visit_mag_zero_points,
+    seed,
+):
+    """Adds the Poisson noise of the exposures with an exposure time and the
+    Gaussian noise to a stack of lens images at once, in place. The
+    parameters are described in lens_image_series().
+
+    :param images: noiseless lens images of shape (n, num_pix, num_pix)
+    :param exposure_time_list: exposure time or exposure map of each
+        image, or None for images without Poisson noise
+    :param seed: seed of the noise, see
+        ~slsim.Util.noise.NoiseGenerator
+    :return: images
+    """
+    epochs = [
+        i for i, expo_time in enumerate(exposure_time_list) if expo_time is not None
+    ]
+    if len(epochs) == 0 and std_gaussian_noise is None:
+        return images
+    noise_generator = NoiseGenerator(seed=seed)
+    if len(epochs) > 0:
+        exposure_times = [exposure_time_list[i] for i in epochs]
+        if any(np.ndim(expo_time) > 0 for expo_time in exposure_times):
+            exposure_times = [
+                np.broadcast_to(expo_time, images.shape[1:])
+                for expo_time in exposure_times
+            ]
+        kwargs_noise = {
+            "exposure_time": exposure_times,
+            # For DP0 images, gain is always 0.7.
+            "gain": gain,
+            "coadd_zero_point": [mag_zero_point_list[i] for i in epochs],
+            "single_visit_zero_point": [
+                single_visit_mag_zero_points[band_list[i]] for i in epochs
+            ],
+        }
+        if len(epochs) == len(images):
+            noise_generator.add_noise(images, out=images, **kwargs_noise)
+        else:
+            images[epochs] = noise_generator.add_noise(images[epochs], **kwargs_noise)
     if std_gaussian_noise is not None:
-        gaussian_noise = np.random.normal(0, std_gaussian_noise, final_image.shape)
-        return final_image + gaussian_noise
-    return final_image
+        noise_generator.add_noise(
+            images, std_gaussian_noise=std_gaussian_noise, out=images
+        )
+    return images
 
 
 def lens_image_series(
@@ -657,6 +1393,11 @@ def lens_image_series(
         "z": 31.45,
         "y": 30.63,
     },
+    convolution_type="fft",
+    dtype=np.float64,
+    stamp_cache=None,
+    seed=None,
+    out=None,
 ):
     """Creates lens image on the basis of given information. This function is
     designed to simulate time series images of a lens.
@@ -672,8 +1413,8 @@ def lens_image_series(
     :param exposure_time: list of exposure time for each exposure. It could be single
         exposure time or a exposure map.
     :param t_obs: array of image observation time [day] for a lens.
-    :param std_gaussian_noise: array of standard deviation for gaussian noise for each
-        image
+    :param std_gaussian_noise: standard deviation for gaussian noise, for all images or
+        an array with one value per image
     :param with_source: If True, simulates image with extended source in lens
         configuration.
     :param with_deflector: If True, simulates image with deflector.
@@ -688,32 +1429,111 @@ def lens_image_series(
                 }. It sould contain at least values for the band in which one need to
                 simulate images. Default values are average magnitude zero points for
                 LSST single visists in each band.
-    :return: list of series of images of a lens
+    :param convolution_type: method to convolve the deflector and extended source
+        with the PSF kernels, see ~slsim.Util.param_util.convolved_image(). With
+        "fft_cached", the FFTs of the kernels are reused across calls.
+    :param dtype: data type of the returned images, e.g. np.float32 to halve
+        the memory of long series. The noiseless image of each exposure is
+        computed in double precision and cast when it is written. The noise is
+        drawn in double precision from the cast images and the noisy images are
+        cast again.
+    :param stamp_cache: if not None, the unconvolved images of the deflector and
+        extended source are taken from or added to this cache, see
+        ~slsim.Util.stamp_cache.StampCache
+    :param seed: seed of the noise, which is added to all images at once. If None,
+        it is drawn from the global numpy random state, see
+        ~slsim.Util.noise.NoiseGenerator
+    :param out: if not None, array (e.g. a numpy.memmap) of shape
+        (n_exposures, num_pix, num_pix) into which the images are written in place,
+        such that no other copy of the series is kept. Its data type overrides dtype.
+    :return: series of images of a lens, of shape (n_exposures, num_pix, num_pix).
+        This is out, if given.
     """
 
     # If band is one string, extend to list
     if isinstance(band, str):
         band = [band] * len(mag_zero_point)
+    if exposure_time is None:
+        exposure_time = [None] * len(mag_zero_point)
 
-    image_series = []
-    for time, psf_kern, mag_zero, transf_matrix, expo_time, band_obs in zip(
-        t_obs, psf_kernel, mag_zero_point, transform_pix2angle, exposure_time, band
-    ):
-        image = lens_image(
+    # the deflector and extended source do not vary with time: they are rendered
+    # once per band and pixel scale (at the zero point of the first exposure) and
+    # convolved once per distinct PSF kernel. The images of the other exposures
+    # are obtained by scaling with their zero point.
+    delta_pix_list = [
+        transformmatrix_to_pixelscale(transf_matrix)
+        for transf_matrix in transform_pix2angle
+    ]
+    static_zero_points = {}
+    for band_obs, mag_zero, delta_pix in zip(band, mag_zero_point, delta_pix_list):
+        static_zero_points.setdefault((band_obs, float(delta_pix)), mag_zero)
+    static_images = {}
+    for delta_pix in set(key[1] for key in static_zero_points):
+        keys = [key for key in static_zero_points if key[1] == delta_pix]
+        images = multi_band_extended_images(
             lens_class=lens_class,
-            band=band_obs,
-            mag_zero_point=mag_zero,
+            band_list=[key[0] for key in keys],
+            mag_zero_point=[static_zero_points[key] for key in keys],
+            delta_pix=delta_pix,
             num_pix=num_pix,
-            psf_kernel=psf_kern,
-            transform_pix2angle=transf_matrix,
-            exposure_time=expo_time,
-            t_obs=time,
-            std_gaussian_noise=std_gaussian_noise,
             with_source=with_source,
             with_deflector=with_deflector,
-            gain=gain,
-            single_visit_mag_zero_points=single_visit_mag_zero_points,
+            stamp_cache=stamp_cache,
+        )
+        static_images.update(zip(keys, images))
+    convolved_static_images = {}
+
+    if out is None:
+        out = np.empty((len(band), num_pix, num_pix), dtype=dtype)
+    elif np.shape(out) != (len(band), num_pix, num_pix):
+        raise ValueError(
+            "out must be of shape %s, not %s."
+            % ((len(band), num_pix, num_pix), np.shape(out))
+        )
+    images = out
+
+    # the point source images of all exposures in a band are rendered at once.
+    # The static images are added to them in double precision and each noiseless
+    # image is cast to the data type of out when it is written.
+    for band_obs in set(band):
+        epochs = [i for i, band_i in enumerate(band) if band_i == band_obs]
+        point_images = point_source_image_with_variability(
+            lens_class,
+            band=band_obs,
+            mag_zero_point=np.asarray(mag_zero_point)[epochs],
+            delta_pix=delta_pix_list[epochs[0]],
+            num_pix=num_pix,
+            psf_kernels=[psf_kernel[i] for i in epochs],
+            transform_pix2angle=np.asarray(transform_pix2angle)[epochs],
+            t_obs=np.asarray(t_obs)[epochs],
         )
-        image_series.append(image)
+        for i, point_image in zip(epochs, point_images):
+            mag_zero = mag_zero_point[i]
+            static_key = (band_obs, float(delta_pix_list[i]))
+            psf_kern = np.asarray(psf_kernel[i])
+            convolved_key = static_key + (psf_kern.shape, psf_kern.tobytes())
+            if convolved_key not in convolved_static_images:
+                convolved_static_images[convolved_key] = convolved_image(
+                    image=static_images[static_key],
+                    psf_kernel=psf_kern,
+                    convolution_type=convolution_type,
+                )
+            convolved_deflector_source = convolved_static_images[convolved_key]
+            if mag_zero != static_zero_points[static_key]:
+                convolved_deflector_source = convolved_deflector_source * 10 ** (
+                    0.4 * (mag_zero - static_zero_points[static_key])
+                )
+            images[i] = np.asarray(point_image, dtype=np.float64) + (
+                convolved_deflector_source
+            )
 
-    return image_series
+    return _add_lens_image_noise(
+        images,
+        band_list=band,
+        mag_zero_point_list=mag_zero_point,
+        exposure_time_list=exposure_time,
+        std_gaussian_noise=std_gaussian_noise,
+        gain=gain,
+        single_visit_mag_zero_points=single_visit_mag_zero_points,
+        seed=seed,
+    )
@@ -4,19 +4,32 @@ import numpy as np
 from lenstronomy.Analysis.lens_profile import LensProfileAnalysis
 from lenstronomy.Cosmo.lens_cosmo import LensCosmo
 from lenstronomy.LensModel.lens_model import LensModel
+from lenstronomy.LensModel.Profiles.sie import SIE
 from lenstronomy.LensModel.Solver.lens_equation_solver import LensEquationSolver
 from lenstronomy.LensModel.Solver.lens_equation_solver import (
     analytical_lens_model_support,
 )
 
+from slsim.Util.deflection_field import DeflectionField, deflection_grid
 from slsim.Util.param_util import ellipticity_slsim_to_lenstronomy
 from lenstronomy.LightModel.light_model import LightModel
 from lenstronomy.Util import constants
 from lenstronomy.Util import data_util
-from lenstronomy.Util import util
 
 from slsim.lensed_system_base import LensedSystemBase
 
+# stages of Lens.validity_test() in the order in which they are evaluated
+VALIDITY_TEST_STAGES = (
+    "redshift",
+    "einstein_radius",
+    "source_position",
+    "caustic",
+    "image_number",
+    "image_separation",
+    "second_brightest_image",
+    "mag_arc_limit",
+)
+
 
 class Lens(LensedSystemBase):
     """Class to manage individual lenses."""
@@ -30,6 +43,7 @@ class Lens(LensedSystemBase):
         test_area=4 * np.pi,
         magnification_limit=0.01,
         los_class=None,
+        importance_weight=1,
     ):
         """
 
@@ -67,6 +81,11 @@ class Lens(LensedSystemBase):
         :type magnification_limit: float >= 0
         :param los_class: line of sight dictionary (optional, takes these values instead of drawing from distribution)
         :type los_class: ~LOSIndividual() class object
+        :param importance_weight: ratio of the probability density of the source
+         positions in the test area to the density from which they were drawn. It
+         is 1 for uniformly drawn positions; see the importance_sampling option of
+         LensPop.draw_population().
+        :type importance_weight: float
         """
         super().__init__(
             source_class=source_class,
@@ -77,6 +96,9 @@ class Lens(LensedSystemBase):
         self.test_area = test_area
         self._lens_equation_solver = lens_equation_solver
         self._magnification_limit = magnification_limit
+        self.importance_weight = importance_weight
+        self._lens_model_cache = {}
+        self._extended_source_magnification_cache = {}
 
         if isinstance(source_class, list):
             self._source = source_class
@@ -160,14 +182,7 @@ class Lens(LensedSystemBase):
         """
 
         lens_model_list, kwargs_lens = self.deflector_mass_model_lenstronomy()
-        lens_model_class = LensModel(
-            lens_model_list=lens_model_list,
-            z_lens=self.deflector_redshift,
-            z_source_convention=self.max_redshift_source_class.redshift,
-            multi_plane=False,
-            z_source=source.redshift,
-        )
-        lens_eq_solver = LensEquationSolver(lens_model_class)
+        lens_eq_solver = self._lens_equation_solver_instance(source)
         source_pos_x, source_pos_y = source.extended_source_position(
             reference_position=self.deflector_position, draw_area=self.test_area
         )
@@ -215,14 +230,7 @@ class Lens(LensedSystemBase):
         :return: x-pos, y-pos
         """
         lens_model_list, kwargs_lens = self.deflector_mass_model_lenstronomy()
-        lens_model_class = LensModel(
-            lens_model_list=lens_model_list,
-            z_lens=self.deflector_redshift,
-            z_source_convention=self.max_redshift_source_class.redshift,
-            multi_plane=False,
-            z_source=source.redshift,
-        )
-        lens_eq_solver = LensEquationSolver(lens_model_class)
+        lens_eq_solver = self._lens_equation_solver_instance(source)
         point_source_pos_x, point_source_pos_y = source.point_source_position(
             reference_position=self.deflector_position, draw_area=self.test_area
         )
@@ -255,7 +263,9 @@ class Lens(LensedSystemBase):
         second_brightest_image_cut=None,
     ):
         """Check whether multiple lensing configuration matches selection and
-        plausibility criteria.
+        plausibility criteria. The criteria are evaluated in order of
+        increasing cost (see VALIDITY_TEST_STAGES) and the stage at which each
+        source is rejected is available in validity_rejection_stage.
 
         :param min_image_separation: minimum image separation
         :param max_image_separation: maximum image separation
@@ -272,6 +282,7 @@ class Lens(LensedSystemBase):
         :return: A boolean or dict of boolean.
         """
         validity_results = {}
+        self._validity_rejection_stages = [None] * self.source_number
         for index, source in enumerate(self._source):
             validity_results[index] = self._validity_test(
                 source,
@@ -296,7 +307,8 @@ class Lens(LensedSystemBase):
         source_index=None,
     ):
         """Check whether a single lensing configuration matches selection and
-        plausibility criteria.
+        plausibility criteria. The stage of the first failed criterion is
+        stored and can be accessed with validity_rejection_stage.
 
         :param min_image_separation: minimum image separation
         :param max_image_separation: maximum image separation
@@ -313,13 +325,55 @@ class Lens(LensedSystemBase):
         :param source_index: index of a source in source list.
         :return: boolean
         """
+        rejection_stage = self._validity_rejection_stage(
+            source,
+            min_image_separation=min_image_separation,
+            max_image_separation=max_image_separation,
+            mag_arc_limit=mag_arc_limit,
+            second_brightest_image_cut=second_brightest_image_cut,
+            source_index=source_index,
+        )
+        if not hasattr(self, "_validity_rejection_stages"):
+            self._validity_rejection_stages = [None] * self.source_number
+        if source_index is not None:
+            self._validity_rejection_stages[source_index] = rejection_stage
+        return rejection_stage is None
+
+    @property
+    def validity_rejection_stage(self):
+        """Stage of the validity test (see VALIDITY_TEST_STAGES) at which each
+        source was rejected in the last call of validity_test().
+
+        :return: list with the name of the failed stage for each source,
+            or None for sources passing the test (or not tested yet)
+        """
+        if not hasattr(self, "_validity_rejection_stages"):
+            return [None] * self.source_number
+        return self._validity_rejection_stages
+
+    def _validity_rejection_stage(
+        self,
+        source,
+        min_image_separation=0,
+        max_image_separation=10,
+        mag_arc_limit=None,
+        second_brightest_image_cut=None,
+        source_index=None,
+    ):
+        """Evaluates the criteria of the validity test for a single source in
+        order of increasing cost and stops at the first failed criterion. The
+        parameters are described in _validity_test().
+
+        :return: name of the failed stage (see VALIDITY_TEST_STAGES) or
+            None if all criteria are met
+        """
 
         # Criteria 1:The redshift of the lens (z_lens) must be less than the
         # redshift of the source (z_source).
         z_lens = self.deflector.redshift
         z_source = source.redshift
         if z_lens >= z_source:
-            return False
+            return "redshift"
 
         # Criteria 2: The angular Einstein radius of the lensing configuration (theta_E)
         # times 2 must be greater than or equal to the minimum image separation
@@ -330,7 +384,7 @@ class Lens(LensedSystemBase):
             <= 2 * self._einstein_radius(source)
             <= max_image_separation
         ):
-            return False
+            return "einstein_radius"
 
         # Criteria 3: The distance between the lens center and the source position
         # must be less than or equal to the angular Einstein radius
@@ -348,24 +402,51 @@ class Lens(LensedSystemBase):
             np.sum((center_lens - center_source) ** 2)
             > self._einstein_radius(source) ** 2 * 2
         ):
-            return False
+            return "source_position"
+
+        # Criteria 4: For singular isothermal ellipsoids with external shear and
+        # convergence, the source must lie within the analytic tangential caustic or
+        # cut, outside of which only a single image is formed.
+        if not self._source_within_caustic(source, source_pos):
+            return "caustic"
 
-        # Criteria 4: The lensing configuration must produce at least two SL images.
+        # Criteria 5: The lensing configuration must produce at least two SL images.
         if self._source_type in ["point_source", "point_plus_extended"]:
             image_positions = self._point_source_image_positions(source)
         else:
             image_positions = self._extended_source_image_positions(source)
         if len(image_positions[0]) < 2:
-            return False
+            return "image_number"
 
-        # Criteria 5: The maximum separation between any two image positions must be
+        # Criteria 6: The maximum separation between any two image positions must be
         # greater than or equal to the minimum image separation and less than or
         # equal to the maximum image separation.
         image_separation = image_separation_from_positions(image_positions)
         if not min_image_separation <= image_separation <= max_image_separation:
-            return False
+            return "image_separation"
 
-        # Criteria 6: (optional)
+        # Criteria 7: (optional)
+        # computes the magnitude of each image and if the second brightest image has
+        # the magnitude less or equal to "second_bright_mag_max" provided in the dict
+        # second_bright_image_cut. This only requires the magnifications at the image
+        # positions and is evaluated before the ray-shooting of criteria 8.
+        if second_brightest_image_cut is not None:
+            for band_max, mag_max in second_brightest_image_cut.items():
+                if self._source_type == "extended":
+                    image_magnitude_list = (
+                        self.extended_source_magnitude_for_each_image(
+                            band=band_max, lensed=True
+                        )
+                    )
+                elif self._source_type in ["point_plus_extended", "point_source"]:
+                    image_magnitude_list = self.point_source_magnitude(
+                        band=band_max, lensed=True
+                    )
+                second_brightest_mag = np.sort(image_magnitude_list[0])[1]
+                if second_brightest_mag > mag_max:
+                    return "second_brightest_image"
+
+        # Criteria 8: (optional)
         # compute the magnified brightness of the lensed extended arc for different
         # bands at least in one band, the magnitude has to be brighter than the limit
         if mag_arc_limit is not None and source.source_type in [
@@ -385,30 +466,48 @@ class Lens(LensedSystemBase):
                     bool_mag_limit = True
                     break
             if bool_mag_limit is False:
-                return False
+                return "mag_arc_limit"
         # TODO make similar criteria for point source magnitudes
-        # Criteria 7: (optional)
-        # computes the magnitude of each image and if the second brightest image has
-        # the magnitude less or equal to "second_bright_mag_max" provided in the dict
-        # second_bright_image_cut.
-        if second_brightest_image_cut is not None:
-            for band_max, mag_max in second_brightest_image_cut.items():
-                if self._source_type == "extended":
-                    image_magnitude_list = (
-                        self.extended_source_magnitude_for_each_image(
-                            band=band_max, lensed=True
-                        )
-                    )
-                elif self._source_type in ["point_plus_extended", "point_source"]:
-                    image_magnitude_list = self.point_source_magnitude(
-                        band=band_max, lensed=True
-                    )
-                second_brightest_mag = np.sort(image_magnitude_list[0])[1]
-                if second_brightest_mag > mag_max:
-                    return False
-        return True
+        return None
         # TODO: test for signal-to-noise ratio in surface brightness
 
+    def _source_within_caustic(self, source, source_position):
+        """Checks whether a source can be multiply imaged by a singular
+        isothermal ellipsoid with external shear and convergence, using the
+        analytic radius of its tangential caustic and cut (see
+        isothermal_multiple_image_radius()). For other mass profiles, this
+        criterion is always met.
+
+        :param source: Source class instance. The redshift of this
+            source is used to scale the deflection.
+        :param source_position: source position [arcsec]
+        :return: boolean
+        """
+        lens_model_list, kwargs_lens = self.deflector_mass_model_lenstronomy()
+        return source_within_isothermal_caustic(
+            lens_model_list,
+            kwargs_lens,
+            source_position,
+            beta=self._deflection_scale(source),
+        )
+
+    def _deflection_scale(self, source):
+        """Ratio of the deflections for a source and for the source redshift of
+        the lenstronomy convention (the highest source redshift).
+
+        :param source: Source class instance
+        :return: deflection scaling factor
+        """
+        # deflections scale with the distance ratio for sources at other redshifts
+        # than the one of the lenstronomy convention
+        if source.redshift == self.max_redshift_source_class.redshift:
+            return 1
+        return self._lens_cosmo.beta_double_source_plane(
+            z_lens=self.deflector_redshift,
+            z_source_2=self.max_redshift_source_class.redshift,
+            z_source_1=source.redshift,
+        )
+
     @property
     def deflector_redshift(self):
         """
@@ -469,7 +568,9 @@ class Lens(LensedSystemBase):
         return self._theta_E_list
 
     def _einstein_radius(self, source):
-        """Einstein radius, including external shear.
+        """Einstein radius, including external shear. The result is cached
+        together with the lenstronomy instances of the source (see
+        _lens_model_instance()).
 
         :param source: Source class instance. The redshift of this
             source is used in the LensCosmo or LensModel.
@@ -479,13 +580,9 @@ class Lens(LensedSystemBase):
             theta_E = 0
             return theta_E
         lens_model_list, kwargs_lens = self.deflector_mass_model_lenstronomy()
-        lens_model = LensModel(
-            lens_model_list=lens_model_list,
-            z_lens=self.deflector_redshift,
-            z_source_convention=self.max_redshift_source_class.redshift,
-            multi_plane=False,
-            z_source=source.redshift,
-        )
+        cache_entry = self._lens_model_cache_entry(source)
+        if "einstein_radius" in cache_entry:
+            return cache_entry["einstein_radius"]
         if self.deflector.deflector_type in ["EPL"]:
             kappa_ext_convention = self.los_class.convergence
             gamma_pl = self.deflector.halo_properties
@@ -505,7 +602,9 @@ class Lens(LensedSystemBase):
             theta_E /= (1 - kappa_ext) ** (1.0 / (gamma_pl - 1))
         else:
             # numerical solution for the Einstein radius
-            lens_analysis = LensProfileAnalysis(lens_model=lens_model)
+            lens_analysis = LensProfileAnalysis(
+                lens_model=self._lens_model_instance(source)
+            )
             kwargs_lens_ = copy.deepcopy(kwargs_lens)
             for kwargs in kwargs_lens_:
                 if "center_x" in kwargs:
@@ -515,6 +614,7 @@ class Lens(LensedSystemBase):
             theta_E = lens_analysis.effective_einstein_radius(
                 kwargs_lens_, r_min=1e-4, r_max=5e1, num_points=100
             )
+        cache_entry["einstein_radius"] = theta_E
         return theta_E
 
     def deflector_ellipticity(self):
@@ -809,13 +909,7 @@ class Lens(LensedSystemBase):
             source) in same order as image positions
         """
         lens_model_list, kwargs_lens = self.deflector_mass_model_lenstronomy()
-        lensModel = LensModel(
-            lens_model_list=lens_model_list,
-            z_lens=self.deflector_redshift,
-            z_source_convention=self.max_redshift_source_class.redshift,
-            multi_plane=False,
-            z_source=source.redshift,
-        )
+        lensModel = self._lens_model_instance(source)
         if extended is True:
             img_x, img_y = self._extended_source_image_positions(source)
         else:
@@ -862,47 +956,35 @@ class Lens(LensedSystemBase):
         integrated flux-weighted magnification factor of the extended host
         galaxy. This function does the operation for single source.
 
+        The magnification does not depend on the band (the source size is the
+        same in all bands) and is memoized per source. The source is ray-shot
+        on the pixels within 2 theta_E of its center of a grid shared by all
+        the sources of the lens (see _deflection_grid()), such that the
+        deflections are evaluated once per deflector.
+
         :param source: Source class instance
         :param source_index: index of a source in source list.
         :return: integrated magnification factor of host magnitude
         """
-        lens_mass_model_list, kwargs_lens = self.deflector_mass_model_lenstronomy()
-        light_model_list = source.extended_source_light_model()
-        kwargs_source_mag = source.kwargs_extended_source_light(
-            reference_position=self.deflector_position, draw_area=self.test_area
-        )
-
-        lightModel = LightModel(light_model_list=light_model_list)
-        lensModel = LensModel(
-            lens_model_list=lens_mass_model_list,
-            z_lens=self.deflector_redshift,
-            z_source_convention=self.max_redshift_source_class.redshift,
-            multi_plane=False,
-            z_source=source.redshift,
-        )
-        theta_E = self._einstein_radius(source)
-        center_source = source.extended_source_position(
-            reference_position=self.deflector_position, draw_area=self.test_area
-        )
-
-        kwargs_source_amp = data_util.magnitude2amplitude(
-            lightModel, kwargs_source_mag, magnitude_zero_point=0
-        )
-
-        num_pix = 200
-        delta_pix = theta_E * 4 / num_pix
-        x, y = util.make_grid(numPix=num_pix, deltapix=delta_pix)
-        x += center_source[0]
-        y += center_source[1]
-        beta_x, beta_y = lensModel.ray_shooting(x, y, kwargs_lens)
-        flux_lensed = np.sum(
-            lightModel.surface_brightness(beta_x, beta_y, kwargs_source_amp)
+        self.deflector_mass_model_lenstronomy()
+        if source_index in self._extended_source_magnification_cache:
+            return self._extended_source_magnification_cache[source_index]
+        self._extended_source_magnification = extended_source_grid_magnification(
+            source,
+            self._deflection_field(),
+            self._deflection_grid(),
+            reference_position=self.deflector_position,
+            draw_area=self.test_area,
+            theta_E=self._einstein_radius(source),
+            scale=self._deflection_scale(source),
         )
-        flux_no_lens = np.sum(lightModel.surface_brightness(x, y, kwargs_source_amp))
-        if flux_no_lens > 0:
-            self._extended_source_magnification = flux_lensed / flux_no_lens
-        else:
-            self._extended_source_magnification = 0
+        if source_index is not None:
+            self._extended_source_magnification_cache[source_index] = (
+                self._extended_source_magnification
+            )
+            # the grids are no longer needed once all sources are evaluated
+            if len(self._extended_source_magnification_cache) == self.source_number:
+                self._deflection_field().clear()
         return self._extended_source_magnification
 
     def lenstronomy_kwargs(self, band=None):
@@ -970,36 +1052,136 @@ class Lens(LensedSystemBase):
         """
         if hasattr(self, "_lens_mass_model_list") and hasattr(self, "_kwargs_lens"):
             return self._lens_mass_model_list, self._kwargs_lens
-        if self.deflector.deflector_type in ["EPL", "NFW_HERNQUIST", "NFW_CLUSTER"]:
-            lens_mass_model_list, kwargs_lens = self.deflector.mass_model_lenstronomy(
-                lens_cosmo=self._lens_cosmo
-            )
-        else:
-            raise ValueError(
-                "Deflector model %s not supported for lenstronomy model"
-                % self.deflector.deflector_type
-            )
-        # adding line-of-sight structure
-        kappa_ext, gamma1, gamma2 = self.los_linear_distortions
-        gamma1_lenstronomy, gamma2_lenstronomy = ellipticity_slsim_to_lenstronomy(
-            e1_slsim=gamma1, e2_slsim=gamma2
+        # lenstronomy instances built for a previous mass model are discarded
+        self._lens_model_cache = {}
+        self._extended_source_magnification_cache = {}
+        lens_mass_model_list, kwargs_lens = deflector_mass_model_lenstronomy(
+            self.deflector, self.los_class, self._lens_cosmo
         )
-        kwargs_lens.append(
-            {
-                "gamma1": gamma1_lenstronomy,
-                "gamma2": gamma2_lenstronomy,
-                "ra_0": 0,
-                "dec_0": 0,
-            }
-        )
-        kwargs_lens.append({"kappa": kappa_ext, "ra_0": 0, "dec_0": 0})
-        lens_mass_model_list.append("SHEAR")
-        lens_mass_model_list.append("CONVERGENCE")
         self._kwargs_lens = kwargs_lens
         self._lens_mass_model_list = lens_mass_model_list
 
         return lens_mass_model_list, kwargs_lens
 
+    def _lens_model_instance(self, source):
+        """LensModel instance of the deflector mass model for a source. The
+        instances are cached per lens model list, source redshift and multi-
+        plane option, and discarded when the mass model is recomputed in
+        deflector_mass_model_lenstronomy().
+
+        :param source: Source class instance. The redshift of this
+            source is used in the LensModel.
+        :return: ~lenstronomy.LensModel.lens_model.LensModel instance
+        """
+        cache_entry = self._lens_model_cache_entry(source)
+        if "lens_model" not in cache_entry:
+            cache_entry["lens_model"] = LensModel(
+                lens_model_list=list(cache_entry["lens_model_list"]),
+                z_lens=self.deflector_redshift,
+                z_source_convention=self.max_redshift_source_class.redshift,
+                multi_plane=cache_entry["multi_plane"],
+                z_source=source.redshift,
+            )
+        return cache_entry["lens_model"]
+
+    def _lens_equation_solver_instance(self, source):
+        """LensEquationSolver instance of the cached LensModel of a source (see
+        _lens_model_instance()).
+
+        :param source: Source class instance. The redshift of this
+            source is used in the LensModel.
+        :return: ~lenstronomy.LensModel.Solver.lens_equation_solver.LensEquationSolver
+            instance
+        """
+        cache_entry = self._lens_model_cache_entry(source)
+        if "lens_equation_solver" not in cache_entry:
+            cache_entry["lens_equation_solver"] = LensEquationSolver(
+                self._lens_model_instance(source)
+            )
+        return cache_entry["lens_equation_solver"]
+
+    def _deflection_field(self):
+        """Deflection field of the deflector mass model on the ray-shooting
+        grids of the extended sources, computed for the source redshift of
+        the lenstronomy convention and cached with the lenstronomy instances
+        (see _lens_model_instance()).
+
+        :return: ~slsim.Util.deflection_field.DeflectionField instance
+        """
+        _, kwargs_lens = self.deflector_mass_model_lenstronomy()
+        source = self.max_redshift_source_class
+        cache_entry = self._lens_model_cache_entry(source)
+        if "deflection_field" not in cache_entry:
+            cache_entry["deflection_field"] = DeflectionField(
+                self._lens_model_instance(source), kwargs_lens
+            )
+        return cache_entry["deflection_field"]
+
+    def _deflection_grid(self, num_pix_einstein_radius=200):
+        """Ray-shooting grid of the extended sources (see
+        ~slsim.Util.deflection_field.deflection_grid()). It is computed once per
+        mass model, with the deflection field (see _deflection_field()).
+
+        :param num_pix_einstein_radius: number of pixels across 4 theta_E
+        :type num_pix_einstein_radius: int
+        :return: center_x, center_y, delta_pix, num_pix of the grid, see
+            ~slsim.Util.deflection_field.DeflectionField.deflection()
+        """
+        cache_entry = self._lens_model_cache_entry(self.max_redshift_source_class)
+        if "deflection_grid" not in cache_entry:
+            theta_E = np.array(
+                [self._einstein_radius(source) for source in self._source]
+            )
+            center_source = np.array(
+                [
+                    source.extended_source_position(
+                        reference_position=self.deflector_position,
+                        draw_area=self.test_area,
+                    )
+                    for source in self._source
+                ]
+            )
+            cache_entry["deflection_grid"] = deflection_grid(
+                self.deflector_position,
+                center_source,
+                theta_E,
+                num_pix_einstein_radius=num_pix_einstein_radius,
+            )
+        return cache_entry["deflection_grid"]
+
+    def _lens_model_cache_entry(self, source):
+        """Cache of the deflector mass model for a source, see
+        _lens_model_instance().
+
+        :param source: Source class instance
+        :return: dictionary with the cache key entries
+            ("lens_model_list", "multi_plane") and, once computed, the
+            LensModel instance ("lens_model"), the LensEquationSolver
+            instance ("lens_equation_solver"), the Einstein radius
+            ("einstein_radius"), the DeflectionField instance
+            ("deflection_field") and its grid ("deflection_grid")
+        """
+        lens_model_list, _ = self.deflector_mass_model_lenstronomy()
+        multi_plane = False
+        key = (tuple(lens_model_list), source.redshift, multi_plane)
+        if key not in self._lens_model_cache:
+            self._lens_model_cache[key] = {
+                "lens_model_list": key[0],
+                "multi_plane": multi_plane,
+            }
+        return self._lens_model_cache[key]
+
+    def __getstate__(self):
+        # the cached lenstronomy instances are rebuilt when needed instead of being
+        # pickled with the lens
+        state = self.__dict__.copy()
+        state.pop("_lens_model_cache", None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lens_model_cache = {}
+
     def deflector_light_model_lenstronomy(self, band):
         """Returns lens model instance and parameters in lenstronomy
         conventions.
@@ -1176,6 +1358,130 @@ def image_separation_from_positions(image_positions):
     return image_separation
 
 
+def deflector_mass_model_lenstronomy(deflector, los_class, lens_cosmo):
+    """Lenstronomy mass model of a deflector with the external shear and
+    convergence of its line of sight.
+
+    :param deflector: Deflector instance
+    :param los_class: ~LOSIndividual instance
+    :param lens_cosmo: ~lenstronomy.Cosmo.lens_cosmo.LensCosmo instance of
+        the deflector and the source redshift of the lenstronomy convention
+    :return: lens_model_list, kwargs_lens
+    """
+    if deflector.deflector_type in ["EPL", "NFW_HERNQUIST", "NFW_CLUSTER"]:
+        lens_mass_model_list, kwargs_lens = deflector.mass_model_lenstronomy(
+            lens_cosmo=lens_cosmo
+        )
+    else:
+        raise ValueError(
+            "Deflector model %s not supported for lenstronomy model"
+            % deflector.deflector_type
+        )
+    # adding line-of-sight structure
+    kappa_ext = los_class.convergence
+    gamma1, gamma2 = los_class.shear
+    gamma1_lenstronomy, gamma2_lenstronomy = ellipticity_slsim_to_lenstronomy(
+        e1_slsim=gamma1, e2_slsim=gamma2
+    )
+    kwargs_lens.append(
+        {
+            "gamma1": gamma1_lenstronomy,
+            "gamma2": gamma2_lenstronomy,
+            "ra_0": 0,
+            "dec_0": 0,
+        }
+    )
+    kwargs_lens.append({"kappa": kappa_ext, "ra_0": 0, "dec_0": 0})
+    lens_mass_model_list.append("SHEAR")
+    lens_mass_model_list.append("CONVERGENCE")
+    return lens_mass_model_list, kwargs_lens
+
+
+def source_within_isothermal_caustic(
+    lens_model_list, kwargs_lens, source_position, beta=1
+):
+    """Checks whether a source can be multiply imaged by a singular
+    isothermal ellipsoid with external shear and convergence, using the
+    analytic radius of its tangential caustic and cut (see
+    isothermal_multiple_image_radius()). For other mass profiles, this
+    criterion is always met.
+
+    :param lens_model_list: lenstronomy lens model list
+    :param kwargs_lens: lenstronomy keyword arguments of the lens model
+    :param source_position: source position [arcsec]
+    :param beta: ratio of the deflections for the source and for the
+        source redshift of the lenstronomy convention
+    :return: boolean
+    """
+    if lens_model_list != ["SIE", "SHEAR", "CONVERGENCE"]:
+        return True
+    kwargs_sie, kwargs_shear, kwargs_kappa = kwargs_lens
+    kappa = beta * kwargs_kappa["kappa"]
+    gamma1 = beta * kwargs_shear["gamma1"]
+    gamma2 = beta * kwargs_shear["gamma2"]
+    radius = isothermal_multiple_image_radius(
+        theta_E=beta * kwargs_sie["theta_E"],
+        e1=kwargs_sie["e1"],
+        e2=kwargs_sie["e2"],
+        gamma1=gamma1,
+        gamma2=gamma2,
+        kappa=kappa,
+    )
+    # the shear and convergence are centered at the origin, which shifts the
+    # caustic of a deflector at center_lens to the source position
+    # (1 - kappa - Gamma) * center_lens
+    center_x, center_y = kwargs_sie["center_x"], kwargs_sie["center_y"]
+    dx = source_position[0] - ((1 - kappa - gamma1) * center_x - gamma2 * center_y)
+    dy = source_position[1] - ((1 - kappa + gamma1) * center_y - gamma2 * center_x)
+    return dx**2 + dy**2 <= radius**2
+
+
+def extended_source_grid_magnification(
+    source, deflection_field, grid, reference_position, draw_area, theta_E, scale=1
+):
+    """Integrated flux-weighted magnification of an extended source, ray-shot
+    on the pixels of a grid within 2 theta_E of its center.
+
+    :param source: Source class instance
+    :param deflection_field: ~slsim.Util.deflection_field.DeflectionField
+        instance of the deflector
+    :param grid: center_x, center_y, delta_pix, num_pix of the grid, see
+        ~slsim.Util.deflection_field.deflection_grid()
+    :param reference_position: center of the deflector [arcsec]
+    :param draw_area: test area of the source position [arcsec^2]
+    :param theta_E: Einstein radius of the source [arcsec]
+    :param scale: ratio of the deflections for the source and for the
+        source redshift of the lenstronomy convention
+    :return: integrated magnification factor
+    """
+    light_model_list = source.extended_source_light_model()
+    kwargs_source_mag = source.kwargs_extended_source_light(
+        reference_position=reference_position, draw_area=draw_area
+    )
+    lightModel = LightModel(light_model_list=light_model_list)
+    center_source = source.extended_source_position(
+        reference_position=reference_position, draw_area=draw_area
+    )
+    kwargs_source_amp = data_util.magnitude2amplitude(
+        lightModel, kwargs_source_mag, magnitude_zero_point=0
+    )
+    # the pixels within 2 theta_E of the source on the grid of the deflector
+    x, y, beta_x, beta_y = deflection_field.ray_shooting_window(
+        *grid,
+        center_source[0],
+        center_source[1],
+        2 * theta_E,
+        scale=scale,
+    )
+    flux_lensed = np.sum(
+        lightModel.surface_brightness(beta_x, beta_y, kwargs_source_amp)
+    )
+    flux_no_lens = np.sum(lightModel.surface_brightness(x, y, kwargs_source_amp))
+    if flux_no_lens > 0:
+        return flux_lensed / flux_no_lens
+    return 0
+
+
 def theta_e_when_source_infinity(deflector_dict=None, v_sigma=None):
     """Calculate Einstein radius in arc-seconds for a source at infinity.
 
@@ -1193,3 +1499,83 @@ def theta_e_when_source_infinity(deflector_dict=None, v_sigma=None):
         4 * np.pi * (v_sigma * 1000.0 / constants.c) ** 2 / constants.arcsec
     )
     return theta_E_infinity
+
+
+def isothermal_caustic(theta_E, e1, e2, gamma1=0, gamma2=0, kappa=0, num_points=720):
+    """Tangential caustic and cut of a singular isothermal ellipsoid
+    (lenstronomy 'SIE' profile centered at the origin) with external shear and
+    convergence.
+
+    Since the isothermal deflection only depends on the direction, both are
+    analytic functions of the angle: along each direction, the critical curve
+    lies at the radius where the Jacobian (1 - kappa - Gamma) - H(1) / r is
+    singular, with H(1) the Hessian of the ellipsoid at unit radius. The cut is
+    the image of the center, i.e. minus the deflection at unit radius.
+
+    :param theta_E: Einstein radius of the ellipsoid [arcsec]
+    :param e1: eccentricity component of the ellipsoid
+    :param e2: eccentricity component of the ellipsoid
+    :param gamma1: external shear component (lenstronomy convention)
+    :param gamma2: external shear component (lenstronomy convention)
+    :param kappa: external convergence
+    :param num_points: number of sampled directions
+    :type num_points: int
+    :return: caustic_x, caustic_y, cut_x, cut_y evaluated in num_points
+        directions [arcsec]; None if the external shear and convergence
+        alone are supercritical.
+    """
+    # Jacobian of the external shear and convergence
+    m11, m22, m12 = 1 - kappa - gamma1, 1 - kappa + gamma1, -gamma2
+    det_m = m11 * m22 - m12**2
+    if det_m <= 0 or m11 + m22 <= 0:
+        return None
+    phi = np.linspace(0, 2 * np.pi, num_points, endpoint=False)
+    x, y = np.cos(phi), np.sin(phi)
+    sie = SIE()
+    alpha_x, alpha_y = sie.derivatives(x, y, theta_E, e1, e2)
+    f_xx, f_xy, _, f_yy = sie.hessian(x, y, theta_E, e1, e2)
+    # the isothermal Hessian has a vanishing determinant, such that
+    # det(M - H(1) / r) = 0 at r = tr(adj(M) H(1)) / det(M)
+    r_crit = (m22 * f_xx + m11 * f_yy - 2 * m12 * f_xy) / det_m
+    caustic_x = (m11 * x + m12 * y) * r_crit - alpha_x
+    caustic_y = (m12 * x + m22 * y) * r_crit - alpha_y
+    return caustic_x, caustic_y, -alpha_x, -alpha_y
+
+
+def isothermal_multiple_image_radius(
+    theta_E, e1, e2, gamma1=0, gamma2=0, kappa=0, num_points=720
+):
+    """Radius in the source plane around the center of a singular isothermal
+    ellipsoid (lenstronomy 'SIE' profile) with external shear and convergence
+    outside of which a source has a single image.
+
+    Multiple images are only formed within the tangential caustic and
+    the cut of the lens (see isothermal_caustic()). They are evaluated
+    on num_points directions and the largest distance to the center,
+    increased by 1% to account for the sampling, is returned.
+
+    :param theta_E: Einstein radius of the ellipsoid [arcsec]
+    :param e1: eccentricity component of the ellipsoid
+    :param e2: eccentricity component of the ellipsoid
+    :param gamma1: external shear component (lenstronomy convention)
+    :param gamma2: external shear component (lenstronomy convention)
+    :param kappa: external convergence
+    :param num_points: number of sampled directions
+    :type num_points: int
+    :return: radius [arcsec]; infinity if the external shear and
+        convergence alone are supercritical.
+    """
+    caustic = isothermal_caustic(
+        theta_E,
+        e1,
+        e2,
+        gamma1=gamma1,
+        gamma2=gamma2,
+        kappa=kappa,
+        num_points=num_points,
+    )
+    if caustic is None:
+        return np.inf
+    caustic_x, caustic_y, cut_x, cut_y = caustic
+    radius = max(np.max(np.hypot(caustic_x, caustic_y)), np.max(np.hypot(cut_x, cut_y)))
+    return 1.01 * radius
@@ -1,13 +1,46 @@
+import copy
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
 import numpy as np
+from lenstronomy.Cosmo.lens_cosmo import LensCosmo
+from lenstronomy.LensModel.lens_model import LensModel
+from lenstronomy.LensModel.Solver.lens_equation_solver import (
+    LensEquationSolver,
+    analytical_lens_model_support,
+)
 
 from slsim.lens import Lens
 from typing import Optional
 from astropy.cosmology import Cosmology
-from slsim.lens import theta_e_when_source_infinity
+from astropy.table import Table
+from slsim.lens import (
+    deflector_mass_model_lenstronomy,
+    extended_source_grid_magnification,
+    image_separation_from_positions,
+    isothermal_caustic,
+    source_within_isothermal_caustic,
+    theta_e_when_source_infinity,
+)
 from slsim.Sources.source_pop_base import SourcePopBase
 from slsim.LOS.los_pop import LOSPop
 from slsim.Deflectors.deflectors_base import DeflectorsBase
 from slsim.lensed_population_base import LensedPopulationBase
+from slsim.Util.param_util import (
+    ellipticity_slsim_to_lenstronomy,
+    temporary_random_state,
+)
+from slsim.Util.deflection_field import DeflectionField, deflection_grid
+from slsim.Util.population_io import (
+    LensPopulationWriter,
+    image_columns,
+    lens_catalog_rows,
+)
+from slsim.Util.checkpoint import (
+    ResultsCheckpoint,
+    arguments_hash,
+    load_results_checkpoint,
+)
 
 
 class LensPop(LensedPopulationBase):
@@ -47,6 +80,7 @@ class LensPop(LensedPopulationBase):
         self.los_pop = los_pop
         if self.los_pop is None:
             self.los_pop = LOSPop()
+        self._validity_rejection_counts = Counter()
 
     def select_lens_at_random(self, test_area=None, **kwargs_lens_cut):
         """Draw a random lens within the cuts of the lens and source, with
@@ -86,6 +120,18 @@ class LensPop(LensedPopulationBase):
             if gg_lens.validity_test(**kwargs_lens_cut):
                 return gg_lens
 
+    @property
+    def validity_rejection_counts(self):
+        """Number of deflector-source pairs tested when drawing populations
+        with this instance that were rejected at each stage of the validity
+        test (see ~slsim.lens.VALIDITY_TEST_STAGES), and number of accepted
+        pairs ("accepted"). In batched mode, the redshift, Einstein radius and
+        source position stages are counted before Lens instances are created.
+
+        :return: dictionary with stage names and numbers of pairs
+        """
+        return dict(self._validity_rejection_counts)
+
     @property
     def deflector_number(self):
         """Number of potential deflectors (meaning all objects with mass that
@@ -104,25 +150,40 @@ class LensPop(LensedPopulationBase):
         """
         return round(self._factor_source * self._sources.source_number_selected)
 
-    def get_num_sources_tested_mean(self, testarea):
+    def get_num_sources_tested_mean(self, testarea, z_min=None):
         """Compute the mean of source galaxies needed to be tested within the
         test area.
 
         num_sources_tested_mean/ testarea = num_sources/ sky_area;
         testarea is in units of arcsec^2, f_sky is in units of deg^2. 1
         deg^2 = 12960000 arcsec^2
+
+        :param testarea: test area in arcsec^2
+        :param z_min: if provided, only sources with redshift above
+            z_min (e.g. behind the deflector) are counted. Float or
+            array of the same shape as testarea.
         """
         num_sources = self.source_number
+        if z_min is not None and self._sources.source_number_selected > 0:
+            num_sources = (
+                num_sources
+                * self._sources.source_number_in_range(z_min=z_min)
+                / self._sources.source_number_selected
+            )
         num_sources_tested_mean = (testarea * num_sources) / (
             12960000 * self._factor_source * self._sources.sky_area.to_value("deg2")
         )
         return num_sources_tested_mean
 
-    def get_num_sources_tested(self, testarea=None, num_sources_tested_mean=None):
+    def get_num_sources_tested(
+        self, testarea=None, num_sources_tested_mean=None, z_min=None
+    ):
         """Draw a realization of the expected distribution (Poisson) around the
         mean for the number of source galaxies tested."""
         if num_sources_tested_mean is None:
-            num_sources_tested_mean = self.get_num_sources_tested_mean(testarea)
+            num_sources_tested_mean = self.get_num_sources_tested_mean(
+                testarea, z_min=z_min
+            )
         num_sources_range = np.random.poisson(lam=num_sources_tested_mean)
         return num_sources_range
 
@@ -131,6 +192,15 @@ class LensPop(LensedPopulationBase):
         kwargs_lens_cuts,
         multi_source=False,
         speed_factor=1,
+        batched=False,
+        batch_size=1000,
+        importance_sampling=None,
+        n_workers=1,
+        executor=None,
+        seed=None,
+        checkpoint=None,
+        checkpoint_every=1,
+        resume_from=None,
     ):
         """Return full population list of all lenses within the area.
 
@@ -155,35 +225,615 @@ class LensPop(LensedPopulationBase):
             "second_bright_mag_max": 23}
         :param speed_factor: factor by which the number of deflectors is
             decreased to speed up the calculations.
+        :param batched: if True, deflectors are processed in batches. The
+            deflector properties, test areas, number of tested sources,
+            source redshifts and source positions are drawn as arrays
+            and Lens instances are only created for candidates passing
+            the redshift and Einstein radius cuts of the validity test.
+            The population statistics are the same as for the default
+            loop.
+        :type batched: bool
+        :param batch_size: number of deflectors processed together in
+            batched mode. This is also the number of deflectors per task
+            when the population is drawn in parallel or with a seed.
+        :type batch_size: int
+        :param importance_sampling: fraction of the source positions
+            drawn within the tangential caustic of the deflectors
+            instead of uniformly in the test area, to enrich the
+            population in quadruply imaged and highly magnified
+            configurations. The caustic is approximated by the one of a
+            singular isothermal ellipsoid with the Einstein radius, mass
+            ellipticity and line-of-sight shear and convergence of the
+            lens; the positions are drawn uniformly in the smallest disk
+            containing it. Each lens carries the importance weight of the
+            source positions of all the candidates tested for its
+            deflector, up to the first valid one with
+            multi_source=False (Lens.importance_weight), such that sums
+            of weights over the population are unbiased estimates of the
+            numbers of lenses without importance sampling. Requires
+            batched=True and SIS-normalized EPL deflectors.
+            If None, the positions are drawn uniformly.
+        :type importance_sampling: float in (0, 1) or None
+        :param n_workers: number of worker processes. If larger than 1,
+            the deflectors are split in chunks of batch_size that are
+            drawn in a ~concurrent.futures.ProcessPoolExecutor. The
+            populations are sent once to each worker process.
+        :type n_workers: int
+        :param executor: executor used to draw the chunks instead of a
+            process pool with n_workers (e.g. an MPI or dask executor
+            with the ~concurrent.futures.Executor interface). Each chunk
+            seeds the global numpy random state of the process drawing it,
+            such that the executor must draw the chunks in separate
+            processes; a ~concurrent.futures.ThreadPoolExecutor is rejected.
+        :param seed: seed of the population draw. If provided (or if the
+            population is drawn in parallel), each chunk of deflectors
+            is drawn with an independent child of
+            ~numpy.random.SeedSequence(seed) and from the populations as
+            they are at the time of the call. The returned list is then
+            identical for a given seed, independent of the number of
+            workers, and the global random state is not altered.
+        :type seed: int or None
+        :param checkpoint: name of a file in which the progress is saved
+            (seed, number of chunks of deflectors drawn and validity test
+            counts so far) every checkpoint_every chunks of batch_size
+            deflectors. The lenses of the new chunks are appended to
+            checkpoint + ".results", see
+            ~slsim.Util.checkpoint.ResultsCheckpoint. The population is
+            then drawn per chunk as for a given seed; if no seed is
+            given, a random seed is chosen and stored in the checkpoint.
+        :type checkpoint: str or None
+        :param checkpoint_every: number of chunks between two
+            checkpoints
+        :type checkpoint_every: int
+        :param resume_from: name of the checkpoint file of an
+            interrupted draw with the same options and populations. The
+            draw continues after the last saved chunk and returns the
+            same population as an uninterrupted draw. The checkpoint is
+            updated in this file unless checkpoint is provided.
+        :type resume_from: str or None
         :return: List of Lens instances with parameters of the
             deflectors and lens and source light.
         :rtype: list
         """
+        if checkpoint is not None or resume_from is not None:
+            return self._draw_population_checkpointed(
+                int(self.deflector_number / speed_factor),
+                {
+                    "kwargs_lens_cuts": kwargs_lens_cuts,
+                    "multi_source": multi_source,
+                    "speed_factor": speed_factor,
+                    "batched": batched,
+                    "batch_size": batch_size,
+                    "importance_sampling": importance_sampling,
+                },
+                seed=seed,
+                n_workers=n_workers,
+                executor=executor,
+                checkpoint=checkpoint,
+                checkpoint_every=checkpoint_every,
+                resume_from=resume_from,
+            )
+        return list(
+            self.iter_population(
+                kwargs_lens_cuts,
+                multi_source=multi_source,
+                speed_factor=speed_factor,
+                batched=batched,
+                batch_size=batch_size,
+                importance_sampling=importance_sampling,
+                n_workers=n_workers,
+                executor=executor,
+                seed=seed,
+            )
+        )
+
+    def iter_population(
+        self,
+        kwargs_lens_cuts,
+        multi_source=False,
+        speed_factor=1,
+        batched=False,
+        batch_size=1000,
+        importance_sampling=None,
+        n_workers=1,
+        executor=None,
+        seed=None,
+    ):
+        """Generator of the full population of lenses within the area. The
+        lenses are yielded as they are accepted, such that the population does
+        not need to be held in memory. Iterating through it yields the same
+        lenses as draw_population() returns.
+
+        Without seed and parallelization, each lens is yielded as soon
+        as it is found. Otherwise, the lenses are yielded per chunk of
+        batch_size deflectors and at most 2 * n_workers chunks are drawn
+        ahead of the consumer (also with a user-provided executor).
+
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :return: generator of Lens instances. The other parameters are
+            described in draw_population().
+        """
+        num_deflectors = int(self.deflector_number / speed_factor)
+        kwargs_draw = {
+            "kwargs_lens_cuts": kwargs_lens_cuts,
+            "multi_source": multi_source,
+            "speed_factor": speed_factor,
+            "batched": batched,
+            "batch_size": batch_size,
+            "importance_sampling": importance_sampling,
+        }
+        if seed is None and n_workers == 1 and executor is None:
+            yield from self._iter_population_chunk(num_deflectors, **kwargs_draw)
+            return
+
+        for chunk_result in self._iter_population_chunks(
+            num_deflectors,
+            kwargs_draw,
+            seed=seed,
+            n_workers=n_workers,
+            executor=executor,
+        ):
+            yield from chunk_result
+
+    def _iter_population_chunks(
+        self,
+        num_deflectors,
+        kwargs_draw,
+        seed=None,
+        n_workers=1,
+        executor=None,
+        start_chunk=0,
+    ):
+        """Generator of the lenses of the population, per chunk of batch_size
+        deflectors. Each chunk is drawn with an independent child of
+        ~numpy.random.SeedSequence(seed).
+
+        :param num_deflectors: total number of deflectors
+        :param kwargs_draw: keyword arguments of
+            _iter_population_chunk()
+        :param start_chunk: index of the first chunk to draw. The
+            previous chunks are skipped (e.g. when resuming from a
+            checkpoint).
+        :type start_chunk: int
+        :return: generator of lists of Lens instances, in chunk order.
+            The other parameters are described in draw_population().
+        """
+        if isinstance(executor, ThreadPoolExecutor):
+            # the threads would reseed and share the global random state
+            raise ValueError(
+                "The chunks of a population are drawn with the global numpy random "
+                "state and cannot be drawn in threads. Use an executor of processes."
+            )
+        chunk_sizes, seed_sequences = _population_chunks(
+            num_deflectors, kwargs_draw["batch_size"], seed
+        )
+        chunk_sizes = chunk_sizes[start_chunk:]
+        seed_sequences = seed_sequences[start_chunk:]
+        if executor is None and n_workers == 1:
+            # the chunks are drawn from one copy of the populations as they are at this
+            # point, as it is the case for the chunks drawn by worker processes
+            draw_chunk = _PopulationChunkDrawer(copy.deepcopy(self))
+            yield from self._merge_validity_counts(
+                draw_chunk(chunk_size, seed_sequence, kwargs_draw)
+                for chunk_size, seed_sequence in zip(chunk_sizes, seed_sequences)
+            )
+        elif executor is None:
+            # the populations are sent once to each worker process
+            with ProcessPoolExecutor(
+                max_workers=n_workers,
+                initializer=_init_population_worker,
+                initargs=(self,),
+            ) as executor:
+                yield from self._merge_validity_counts(
+                    _map_population_chunks(
+                        executor,
+                        _draw_worker_population_chunk,
+                        chunk_sizes,
+                        seed_sequences,
+                        kwargs_draw,
+                        2 * n_workers,
+                    )
+                )
+        else:
+            # the populations are sent with each chunk
+            yield from self._merge_validity_counts(
+                _map_population_chunks(
+                    executor,
+                    _PopulationChunkDrawer(copy.deepcopy(self)),
+                    chunk_sizes,
+                    seed_sequences,
+                    kwargs_draw,
+                    2 * n_workers,
+                )
+            )
+
+    def _merge_validity_counts(self, chunk_results):
+        """Adds the validity test counts of drawn chunks to the counts of this
+        instance.
+
+        :param chunk_results: iterable of (list of Lens instances,
+            validity test counts) of each chunk, see
+            _draw_population_chunk()
+        :return: generator of lists of Lens instances
+        """
+        for lens_list, validity_counts in chunk_results:
+            self._validity_rejection_counts.update(validity_counts)
+            yield lens_list
+
+    def _draw_population_checkpointed(
+        self,
+        num_deflectors,
+        kwargs_draw,
+        seed=None,
+        n_workers=1,
+        executor=None,
+        checkpoint=None,
+        checkpoint_every=1,
+        resume_from=None,
+    ):
+        """Draws the population per chunk of deflectors and saves the progress
+        to a checkpoint file, see draw_population().
+
+        :param num_deflectors: total number of deflectors
+        :param kwargs_draw: keyword arguments of
+            _iter_population_chunk()
+        :return: list of Lens instances. The other parameters are
+            described in draw_population().
+        """
+        options = dict(kwargs_draw, num_deflectors=num_deflectors)
+        writer = None
+        if resume_from is not None:
+            state, chunk_results = load_results_checkpoint(resume_from)
+            if state["options"] != options:
+                raise ValueError(
+                    "The checkpoint %s was written for a population draw with "
+                    "different options: %s." % (resume_from, state["options"])
+                )
+            seed = state["seed"]
+            num_chunks_done = state["num_chunks_done"]
+            validity_counts = Counter(state.get("validity_rejection_counts", {}))
+            self._validity_rejection_counts.update(validity_counts)
+            if checkpoint in [None, resume_from]:
+                writer = ResultsCheckpoint(resume_from, state=state)
+        else:
+            if seed is None:
+                seed = np.random.SeedSequence().entropy
+            chunk_results = []
+            num_chunks_done = 0
+            validity_counts = Counter()
+        # the lenses of each chunk are appended to the checkpoint once
+        lens_population = [lens for lens_list in chunk_results for lens in lens_list]
+        if writer is None and checkpoint is not None:
+            writer = ResultsCheckpoint(checkpoint)
+            new_chunk_results = chunk_results
+        else:
+            new_chunk_results = []
+        # counts of this instance before the remaining chunks are drawn
+        validity_counts_start = Counter(self._validity_rejection_counts)
+        num_chunks = int(np.ceil(num_deflectors / kwargs_draw["batch_size"]))
+        for chunk_result in self._iter_population_chunks(
+            num_deflectors,
+            kwargs_draw,
+            seed=seed,
+            n_workers=n_workers,
+            executor=executor,
+            start_chunk=num_chunks_done,
+        ):
+            lens_population.extend(chunk_result)
+            new_chunk_results.append(chunk_result)
+            num_chunks_done += 1
+            if writer is not None and (
+                num_chunks_done % checkpoint_every == 0 or num_chunks_done == num_chunks
+            ):
+                writer.save(
+                    {
+                        "options": options,
+                        "seed": seed,
+                        "num_chunks_done": num_chunks_done,
+                        "num_deflectors_done": min(
+                            num_chunks_done * kwargs_draw["batch_size"], num_deflectors
+                        ),
+                        "validity_rejection_counts": dict(
+                            validity_counts
+                            + self._validity_rejection_counts
+                            - validity_counts_start
+                        ),
+                    },
+                    new_chunk_results,
+                )
+                new_chunk_results = []
+        return lens_population
+
+    def draw_population_catalog(
+        self,
+        kwargs_lens_cuts,
+        bands=None,
+        multi_source=False,
+        speed_factor=1,
+        batched=True,
+        batch_size=1000,
+        importance_sampling=None,
+        n_workers=1,
+        executor=None,
+        seed=None,
+    ):
+        """Draws the full population of lenses within the area as a catalog
+        with one row per lensed source, without keeping Lens instances in
+        memory. The rows contain the deflector and source properties, the
+        Einstein radius, the number of images and their positions,
+        magnifications and time delays, and the unlensed and lensed
+        magnitudes (see ~slsim.Util.population_io.lens_catalog_rows()).
+
+        In batched mode, the lenses of extended sources and SIS-normalized
+        EPL deflectors are selected and their rows computed from the arrays
+        of the batches of deflectors and of the source catalog, with
+        lenstronomy instances shared by the lenses, without creating Lens
+        instances. The selected lenses are the same as with draw_population().
+        Other populations, and batched=False, use the rows of the Lens
+        instances.
+
+        The population is drawn per chunk of batch_size deflectors as for a
+        given seed (a random seed is chosen if None). The seed, options and a
+        fingerprint of the populations are stored in the catalog meta data
+        together with the chunk of each lens, such that lenses_from_catalog()
+        can rebuild the Lens instances needed e.g. for image simulations by
+        drawing their chunk again.
+
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param bands: list of imaging bands for which the magnitudes are
+            stored
+        :type bands: list of str or None
+        :param batched: if True, deflectors are processed in batches, see
+            draw_population()
+        :type batched: bool
+        :return: ~astropy.table.Table with one row per lensed source
+            (use Table.as_array() for a structured numpy array). The
+            other parameters are described in draw_population().
+        """
+        num_deflectors = int(self.deflector_number / speed_factor)
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        kwargs_draw = {
+            "kwargs_lens_cuts": kwargs_lens_cuts,
+            "multi_source": multi_source,
+            "speed_factor": speed_factor,
+            "batched": batched,
+            "batch_size": batch_size,
+            "importance_sampling": importance_sampling,
+        }
+        # the populations as they are before the chunks are drawn
+        population_fingerprint = self._population_fingerprint()
+        rows = []
+        num_lenses = 0
+        for chunk_index, chunk_rows in enumerate(
+            self._iter_population_chunks(
+                num_deflectors,
+                dict(kwargs_draw, catalog_bands=list(bands or [])),
+                seed=seed,
+                n_workers=n_workers,
+                executor=executor,
+            )
+        ):
+            for row in chunk_rows:
+                row["chunk_index"] = chunk_index
+                row["chunk_lens_index"] = row["lens_index"]
+                row["lens_index"] += num_lenses
+            if len(chunk_rows) > 0:
+                num_lenses += chunk_rows[-1]["chunk_lens_index"] + 1
+            rows.extend(chunk_rows)
+        catalog = Table(rows=rows) if len(rows) > 0 else Table()
+        catalog.meta.update(
+            {
+                "seed": seed,
+                "num_deflectors": num_deflectors,
+                "kwargs_draw": kwargs_draw,
+                "population_fingerprint": population_fingerprint,
+            }
+        )
+        return catalog
+
+    def lenses_from_catalog(self, catalog, index=None):
+        """Rebuilds the Lens instances of rows of a catalog drawn with
+        draw_population_catalog() by drawing their chunks of deflectors again.
+        The populations of this instance need to be the same as when the
+        catalog was drawn (i.e. same catalogs and configuration, without
+        unseeded draws in between), which is checked with the population
+        fingerprint stored in the catalog.
+
+        :param catalog: catalog returned by draw_population_catalog()
+        :type catalog: ~astropy.table.Table
+        :param index: indices of the rows. If None, all rows are used.
+        :type index: list of int or None
+        :return: list of Lens instances, in the order of index. Rows of
+            the same multi-source lens give the same Lens instance.
+        """
+        if catalog.meta.get("population_fingerprint") != self._population_fingerprint():
+            raise ValueError(
+                "The populations differ from the ones the catalog was drawn from, "
+                "such that its lenses cannot be drawn again."
+            )
+        if index is None:
+            index = range(len(catalog))
+        kwargs_draw = dict(catalog.meta["kwargs_draw"], catalog_lenses=True)
+        chunk_sizes, seed_sequences = _population_chunks(
+            catalog.meta["num_deflectors"],
+            kwargs_draw["batch_size"],
+            catalog.meta["seed"],
+        )
+        # each chunk is drawn once
+        draw_chunk = _PopulationChunkDrawer(copy.deepcopy(self))
+        chunks = {}
+        lenses = []
+        for i in index:
+            chunk_index = int(catalog["chunk_index"][i])
+            if chunk_index not in chunks:
+                chunks[chunk_index], _ = draw_chunk(
+                    chunk_sizes[chunk_index], seed_sequences[chunk_index], kwargs_draw
+                )
+            lenses.append(chunks[chunk_index][int(catalog["chunk_lens_index"][i])])
+        return lenses
+
+    def _population_fingerprint(self):
+        """Fingerprint of the quantities determining the lenses drawn for a
+        seed: the catalog tables of the deflector and source populations, the
+        cosmology and the line-of-sight population.
+
+        :return: hexadecimal digest, see
+            ~slsim.Util.checkpoint.arguments_hash()
+        """
+        tables = sorted(
+            (
+                (type(population).__name__, name, table.as_array())
+                for population, name, table in _population_tables(self)
+            ),
+            key=lambda entry: entry[:2],
+        )
+        return arguments_hash(self.cosmo, self.los_pop, tables)
+
+    def write_population(
+        self, filename, kwargs_lens_cuts, chunk_size=1000, bands=None, **kwargs_draw
+    ):
+        """Draws the full population of lenses within the area and writes it to
+        a HDF5 file in chunks of fixed size (see
+        ~slsim.Util.population_io.LensPopulationWriter), such that the memory
+        usage does not depend on the sky area. The population can be read with
+        ~slsim.Util.population_io.read_lens_population().
+
+        :param filename: name of the HDF5 file
+        :type filename: str
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param chunk_size: number of lens-source rows kept in memory
+            before being written to the file
+        :type chunk_size: int
+        :param bands: list of imaging bands for which the deflector and
+            source magnitudes are stored
+        :type bands: list of str or None
+        :param kwargs_draw: other keyword arguments of iter_population()
+        :return: number of lenses written
+        """
+        with LensPopulationWriter(
+            filename, chunk_size=chunk_size, bands=bands
+        ) as writer:
+            return writer.add_lenses(
+                self.iter_population(kwargs_lens_cuts, **kwargs_draw)
+            )
+
+    def _draw_population_chunk(
+        self,
+        num_deflectors,
+        seed=None,
+        catalog_bands=None,
+        catalog_lenses=False,
+        **kwargs_draw,
+    ):
+        """Draws the lenses of a given number of deflectors.
+
+        :param num_deflectors: number of deflectors
+        :param seed: seed of the global numpy random state for this
+            chunk. If None, the current global random state is used.
+        :type seed: int, ~numpy.random.SeedSequence or None
+        :param catalog_bands: if not None, the catalog rows of the
+            lenses with image properties and magnitudes in these bands
+            are returned instead of the Lens instances (see
+            _draw_catalog_chunk()). The lens_index of the rows is the
+            index of the lens in the chunk.
+        :type catalog_bands: list of str or None
+        :param catalog_lenses: if True, the Lens instances of the
+            catalog rows are returned, see _draw_catalog_chunk()
+        :type catalog_lenses: bool
+        :param kwargs_draw: keyword arguments of
+            _iter_population_chunk()
+        :return: list of Lens instances (or catalog rows), dictionary of
+            the validity test counts of this chunk (see
+            validity_rejection_counts)
+        """
+        validity_counts = Counter(self._validity_rejection_counts)
+        if catalog_bands is None and not catalog_lenses:
+            draw_chunk = self._iter_population_chunk
+        else:
+
+            def draw_chunk(num_deflectors, **kwargs_draw):
+                return self._draw_catalog_chunk(
+                    num_deflectors,
+                    catalog_bands or [],
+                    lenses=catalog_lenses,
+                    **kwargs_draw,
+                )
 
-        # Initialize an empty list to store the Lens instances
-        lens_population = []
-        # Estimate the number of lensing systems
-        num_lenses = self.deflector_number
-        # num_sources = self._source_galaxies.galaxies_number()
-        #        print(num_sources_tested_mean)
-        #        print("num_lenses is " + str(num_lenses))
-        #        print("num_sources is " + str(num_sources))
-        #        print(np.int(num_lenses * num_sources_tested_mean))
+        if seed is None:
+            lens_list = list(draw_chunk(num_deflectors, **kwargs_draw))
+        else:
+            with temporary_random_state(seed):
+                lens_list = list(draw_chunk(num_deflectors, **kwargs_draw))
+        return lens_list, dict(self._validity_rejection_counts - validity_counts)
 
+    def _iter_population_chunk(
+        self,
+        num_deflectors,
+        kwargs_lens_cuts,
+        multi_source=False,
+        speed_factor=1,
+        batched=False,
+        batch_size=1000,
+        importance_sampling=None,
+    ):
+        """Generator of the lenses of a given number of deflectors, using the
+        global numpy random state.
+
+        :param num_deflectors: number of deflectors
+        :return: generator of Lens instances. The other parameters are
+            described in draw_population().
+        """
+        _check_importance_sampling(importance_sampling, batched)
+        if batched is True:
+            for start in range(0, num_deflectors, batch_size):
+                yield from self._iter_population_batch(
+                    num_deflectors=min(batch_size, num_deflectors - start),
+                    kwargs_lens_cuts=kwargs_lens_cuts,
+                    multi_source=multi_source,
+                    speed_factor=speed_factor,
+                    importance_sampling=importance_sampling,
+                )
+        else:
+            yield from self._iter_population_loop(
+                num_deflectors,
+                kwargs_lens_cuts,
+                multi_source=multi_source,
+                speed_factor=speed_factor,
+            )
+
+    def _iter_population_loop(
+        self, num_deflectors, kwargs_lens_cuts, multi_source=False, speed_factor=1
+    ):
+        """Generator of the lenses of a given number of deflectors, one
+        deflector and one source at a time.
+
+        :param num_deflectors: number of deflectors
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param multi_source: if True, considers multi source lensing
+        :param speed_factor: factor by which the number of deflectors is
+            decreased to speed up the calculations.
+        :return: generator of Lens instances
+        """
         # Draw a population of galaxy-galaxy lenses within the area.
-        for _ in range(int(num_lenses / speed_factor)):
+        for _ in range(num_deflectors):
             _deflector = self._lens_galaxies.draw_deflector()
             vel_disp = _deflector.velocity_dispersion(cosmo=self.cosmo)
             test_area = draw_test_area(v_sigma=vel_disp)
+            # only sources behind the deflector are drawn
             num_sources_tested = self.get_num_sources_tested(
-                testarea=test_area * speed_factor
+                testarea=test_area * speed_factor, z_min=_deflector.redshift
             )
 
             if num_sources_tested > 0:
                 valid_sources = []
                 n = 0
                 while n < num_sources_tested:
-                    _source = self._sources.draw_source()
+                    _source = self._sources.draw_source(z_min=_deflector.redshift)
                     if n == 0:
                         # TODO: this is only consistent for a single source. If there
                         # are multiple sources at different redshift, this is not fully
@@ -200,7 +850,7 @@ class LensPop(LensedPopulationBase):
                         los_class=los_class,
                     )
                     # Check the validity of the lens system
-                    if lens_class.validity_test(**kwargs_lens_cuts):
+                    if self._validity_test(lens_class, kwargs_lens_cuts):
                         valid_sources.append(_source)
                         # If multi_source is False, stop after finding the first valid source
                         if not multi_source:
@@ -220,8 +870,1061 @@ class LensPop(LensedPopulationBase):
                         test_area=test_area,
                         los_class=los_class,
                     )
-                    lens_population.append(lens_final)
-        return lens_population
+                    yield lens_final
+
+    def _iter_population_batch(
+        self,
+        num_deflectors,
+        kwargs_lens_cuts,
+        multi_source=False,
+        speed_factor=1,
+        importance_sampling=None,
+    ):
+        """Generator of the lenses of a batch of deflectors. All random
+        quantities up to the source positions are drawn as arrays; the redshift
+        and Einstein radius criteria of Lens.validity_test() are evaluated on
+        these arrays before any Lens instance is created (see
+        _draw_population_batch()).
+
+        :param num_deflectors: number of deflectors in the batch
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param multi_source: if True, considers multi source lensing
+        :param speed_factor: factor by which the number of deflectors is
+            decreased to speed up the calculations.
+        :param importance_sampling: fraction of the source positions
+            drawn within the tangential caustic, see draw_population()
+        :return: generator of Lens instances
+        """
+        batch = self._draw_population_batch(
+            num_deflectors,
+            kwargs_lens_cuts,
+            speed_factor=speed_factor,
+            importance_sampling=importance_sampling,
+        )
+        if batch is None:
+            return
+        for i, valid_sources, importance_weight in _iter_valid_candidates(
+            batch, self._lens_candidate_test(batch, kwargs_lens_cuts), multi_source
+        ):
+            yield self._batch_lens(batch, i, valid_sources, importance_weight)
+
+    def _draw_population_batch(
+        self,
+        num_deflectors,
+        kwargs_lens_cuts,
+        speed_factor=1,
+        importance_sampling=None,
+    ):
+        """Draws a batch of deflectors with their tested sources. The deflector
+        properties, test areas, number of tested sources, source redshifts and
+        source positions are drawn as arrays, and the candidates (tested
+        deflector-source pairs) failing the redshift and Einstein radius
+        criteria of Lens.validity_test() are deselected on these arrays.
+
+        :param num_deflectors: number of deflectors in the batch
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param speed_factor: factor by which the number of deflectors is
+            decreased to speed up the calculations.
+        :param importance_sampling: fraction of the source positions
+            drawn within the tangential caustic, see draw_population()
+        :return: dictionary with the list of Deflector instances
+            ("deflectors") and of their LOSIndividual instances (or None)
+            ("los_list"), the arrays of the deflectors ("z_deflector",
+            "velocity_dispersion", "test_area", "num_sources_tested" and
+            "first_candidate", the index of their first candidate), the
+            arrays of the candidates, ordered by deflector
+            ("candidate_deflector", "source_index", "z_source", "delta_x"
+            and "delta_y" relative to the deflector center, "weight" for
+            importance sampling, "theta_e" for SIS-normalized EPL
+            deflectors or None, and "select", the candidates passing the
+            array criteria). None if no source is tested.
+        """
+        deflectors = [
+            self._lens_galaxies.draw_deflector() for _ in range(num_deflectors)
+        ]
+        z_deflector = np.array([deflector.redshift for deflector in deflectors])
+        vel_disp = np.array(
+            [
+                deflector.velocity_dispersion(cosmo=self.cosmo)
+                for deflector in deflectors
+            ],
+            dtype=float,
+        )
+        theta_e_infinity = theta_e_when_source_infinity(v_sigma=vel_disp)
+        test_area = np.pi * (theta_e_infinity * 2.5) ** 2
+        # only sources behind the deflectors are drawn
+        num_sources_tested = np.atleast_1d(
+            self.get_num_sources_tested(
+                testarea=test_area * speed_factor, z_min=z_deflector
+            )
+        )
+
+        # one entry per tested deflector-source pair, ordered by deflector
+        candidate_deflector = np.repeat(np.arange(num_deflectors), num_sources_tested)
+        num_candidates = len(candidate_deflector)
+        if num_candidates == 0:
+            return None
+        source_index = np.atleast_1d(
+            self._sources.draw_source_index(
+                size=num_candidates, z_min=z_deflector[candidate_deflector]
+            )
+        )
+        z_source = self._sources.source_redshifts[source_index]
+        if importance_sampling is None:
+            # source positions relative to the deflector center, uniform in the test
+            # area
+            radius = np.sqrt(np.random.random(num_candidates)) * np.sqrt(
+                test_area[candidate_deflector] / np.pi
+            )
+            phi = 2 * np.pi * np.random.random(num_candidates)
+            delta_x, delta_y = radius * np.cos(phi), radius * np.sin(phi)
+            weight = np.ones(num_candidates)
+
+        # the line of sight is drawn with the first tested source of each deflector
+        first_candidate = np.cumsum(num_sources_tested) - num_sources_tested
+        los_list = [None] * num_deflectors
+
+        # Criteria 1 of the validity test: z_deflector < z_source (guaranteed by
+        # the conditional draw above, kept as a safeguard)
+        select = z_deflector[candidate_deflector] < z_source
+        self._validity_rejection_counts["redshift"] += int(np.sum(~select))
+        for i in np.unique(candidate_deflector[select]):
+            los_list[i] = self.los_pop.draw_los(
+                source_redshift=z_source[first_candidate[i]],
+                deflector_redshift=z_deflector[i],
+            )
+
+        # Criteria 2 and 3 of the validity test for deflectors with an SIS-normalized
+        # power-law profile where the Einstein radius is known analytically
+        theta_e = self._candidate_einstein_radius(
+            deflectors,
+            los_list,
+            theta_e_infinity,
+            candidate_deflector,
+            z_source,
+            select,
+        )
+        if importance_sampling is not None:
+            if theta_e is None:
+                raise ValueError(
+                    "importance_sampling requires SIS-normalized EPL deflectors."
+                )
+            delta_x, delta_y, weight = self._draw_source_offsets_near_caustic(
+                deflectors,
+                los_list,
+                theta_e,
+                candidate_deflector,
+                test_area,
+                select,
+                importance_sampling,
+            )
+        if theta_e is not None:
+            min_image_separation = kwargs_lens_cuts.get("min_image_separation", 0)
+            max_image_separation = kwargs_lens_cuts.get("max_image_separation", 10)
+            offset_x, offset_y = 0, 0
+            if self._sources.source_type in ["point_source", "point_plus_extended"]:
+                ra_off = self._sources.catalog_column("ra_off")
+                if ra_off is not None:
+                    offset_x = ra_off[source_index].astype(float)
+                    offset_y = self._sources.catalog_column("dec_off")[
+                        source_index
+                    ].astype(float)
+            # relative tolerance to stay conservative with respect to Lens()
+            tolerance = 1 + 1e-8
+            num_selected = np.sum(select)
+            with np.errstate(invalid="ignore"):
+                select &= min_image_separation <= 2 * theta_e * tolerance
+                select &= 2 * theta_e <= max_image_separation * tolerance
+                self._validity_rejection_counts["einstein_radius"] += int(
+                    num_selected - np.sum(select)
+                )
+                num_selected = np.sum(select)
+                select &= (delta_x + offset_x) ** 2 + (
+                    delta_y + offset_y
+                ) ** 2 <= 2 * theta_e**2 * tolerance
+                self._validity_rejection_counts["source_position"] += int(
+                    num_selected - np.sum(select)
+                )
+        return {
+            "deflectors": deflectors,
+            "los_list": los_list,
+            "z_deflector": z_deflector,
+            "velocity_dispersion": vel_disp,
+            "test_area": test_area,
+            "num_sources_tested": num_sources_tested,
+            "first_candidate": first_candidate,
+            "candidate_deflector": candidate_deflector,
+            "source_index": source_index,
+            "z_source": z_source,
+            "delta_x": delta_x,
+            "delta_y": delta_y,
+            "weight": weight,
+            "theta_e": theta_e,
+            "select": select,
+        }
+
+    def _batch_source(self, batch, i, j):
+        """Source instance of a candidate of a batch, at its position relative
+        to its deflector.
+
+        :param batch: batch of deflectors, see _draw_population_batch()
+        :param i: index of the deflector in the batch
+        :param j: index of the candidate in the batch
+        :return: Source instance
+        """
+        center_lens = batch["deflectors"][i].deflector_center
+        source = self._sources.draw_source(index=batch["source_index"][j])
+        source.update_center(
+            center_x=center_lens[0] + batch["delta_x"][j],
+            center_y=center_lens[1] + batch["delta_y"][j],
+        )
+        return source
+
+    def _batch_lens(self, batch, i, sources, importance_weight):
+        """Lens instance of a deflector of a batch with its valid sources.
+
+        :param batch: batch of deflectors, see _draw_population_batch()
+        :param i: index of the deflector in the batch
+        :param sources: list of Source instances
+        :param importance_weight: importance weight of the lens
+        :return: Lens instance
+        """
+        return Lens(
+            deflector_class=batch["deflectors"][i],
+            source_class=sources[0] if len(sources) == 1 else sources,
+            cosmo=self.cosmo,
+            test_area=batch["test_area"][i],
+            los_class=batch["los_list"][i],
+            importance_weight=importance_weight,
+        )
+
+    def _lens_candidate_test(self, batch, kwargs_lens_cuts):
+        """Validity test of the candidates of a batch with single-source Lens
+        instances, see _iter_valid_candidates().
+
+        :param batch: batch of deflectors, see _draw_population_batch()
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :return: function of the deflector and candidate indices
+            returning the Source instance of a valid candidate, None
+            otherwise
+        """
+
+        def test_candidate(i, j):
+            source = self._batch_source(batch, i, j)
+            lens_class = Lens(
+                deflector_class=batch["deflectors"][i],
+                source_class=source,
+                cosmo=self.cosmo,
+                test_area=batch["test_area"][i],
+                los_class=batch["los_list"][i],
+            )
+            if self._validity_test(lens_class, kwargs_lens_cuts):
+                return source
+            return None
+
+        return test_candidate
+
+    def _draw_catalog_chunk(
+        self,
+        num_deflectors,
+        bands,
+        kwargs_lens_cuts,
+        multi_source=False,
+        speed_factor=1,
+        batched=False,
+        batch_size=1000,
+        importance_sampling=None,
+        lenses=False,
+    ):
+        """Catalog rows of the lenses of a given number of deflectors, see
+        draw_population_catalog(), using the global numpy random state.
+
+        In batched mode, the lenses of extended sources and SIS-normalized
+        EPL deflectors are selected and described from the arrays of the
+        batches (see _batch_catalog()) without Lens instances. Otherwise,
+        the rows are those of the Lens instances of _iter_population_chunk().
+
+        :param num_deflectors: number of deflectors
+        :param bands: list of imaging bands of the magnitudes
+        :param lenses: if True, the Lens instances of the rows are
+            returned instead of the rows
+        :type lenses: bool
+        :return: list of catalog rows (or Lens instances); the lens_index
+            of the rows is the index of the lens in the chunk. The other
+            parameters are described in draw_population().
+        """
+        if batched is not True:
+            lens_list = list(
+                self._iter_population_chunk(
+                    num_deflectors,
+                    kwargs_lens_cuts,
+                    multi_source=multi_source,
+                    speed_factor=speed_factor,
+                    batched=batched,
+                    batch_size=batch_size,
+                    importance_sampling=importance_sampling,
+                )
+            )
+            return lens_list if lenses else _catalog_rows(lens_list, bands)
+        _check_importance_sampling(importance_sampling, batched)
+        results = []
+        num_lenses = 0
+        for start in range(0, num_deflectors, batch_size):
+            batch_results, batch_num_lenses = self._batch_catalog(
+                min(batch_size, num_deflectors - start),
+                kwargs_lens_cuts,
+                bands,
+                multi_source=multi_source,
+                speed_factor=speed_factor,
+                importance_sampling=importance_sampling,
+                lenses=lenses,
+            )
+            if not lenses:
+                for row in batch_results:
+                    row["lens_index"] += num_lenses
+            results.extend(batch_results)
+            num_lenses += batch_num_lenses
+        return results
+
+    def _batch_catalog(
+        self,
+        num_deflectors,
+        kwargs_lens_cuts,
+        bands,
+        multi_source=False,
+        speed_factor=1,
+        importance_sampling=None,
+        lenses=False,
+    ):
+        """Catalog rows of the lenses of a batch of deflectors.
+
+        For extended sources and SIS-normalized EPL deflectors, the
+        criteria of Lens.validity_test() are evaluated for each candidate
+        with lenstronomy instances shared by the batch (see
+        _catalog_validity_stage()) and the columns are computed from the
+        arrays of the batch and the source catalog, without Lens
+        instances. The selected lenses are the same as those of
+        _iter_population_batch(). For other populations, the rows of the
+        Lens instances of the batch are returned.
+
+        :param num_deflectors: number of deflectors in the batch
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param bands: list of imaging bands of the magnitudes
+        :param lenses: if True, the Lens instances of the rows are
+            returned instead of the rows
+        :type lenses: bool
+        :return: list of catalog rows (or Lens instances), number of
+            lenses. The other parameters are described in
+            draw_population().
+        """
+        batch = self._draw_population_batch(
+            num_deflectors,
+            kwargs_lens_cuts,
+            speed_factor=speed_factor,
+            importance_sampling=importance_sampling,
+        )
+        if batch is None:
+            return [], 0
+        array_catalog = (
+            batch["theta_e"] is not None and self._sources.source_type == "extended"
+        )
+        if not array_catalog:
+            lens_list = [
+                self._batch_lens(batch, i, valid_sources, importance_weight)
+                for i, valid_sources, importance_weight in _iter_valid_candidates(
+                    batch,
+                    self._lens_candidate_test(batch, kwargs_lens_cuts),
+                    multi_source,
+                )
+            ]
+            if lenses:
+                return lens_list, len(lens_list)
+            return _catalog_rows(lens_list, bands), len(lens_list)
+
+        # lenstronomy instances shared by the candidates of the batch
+        lens_models = {}
+
+        def test_candidate(i, j):
+            source = self._batch_source(batch, i, j)
+            stage, images = self._catalog_validity_stage(
+                batch["deflectors"][i],
+                batch["los_list"][i],
+                source,
+                batch["test_area"][i],
+                kwargs_lens_cuts,
+                lens_models,
+            )
+            self._validity_rejection_counts["accepted" if stage is None else stage] += 1
+            if stage is None:
+                return j, source, images
+            return None
+
+        valid_candidates = list(
+            _iter_valid_candidates(batch, test_candidate, multi_source)
+        )
+        if lenses:
+            lens_list = [
+                self._batch_lens(
+                    batch, i, [source for _, source, _ in valid], importance_weight
+                )
+                for i, valid, importance_weight in valid_candidates
+            ]
+            return lens_list, len(lens_list)
+        rows = []
+        for lens_index, (i, valid, importance_weight) in enumerate(valid_candidates):
+            rows.extend(
+                self._batch_catalog_rows(
+                    batch, i, valid, importance_weight, lens_index, bands
+                )
+            )
+        return rows, len(valid_candidates)
+
+    def _catalog_validity_stage(
+        self, deflector, los_class, source, test_area, kwargs_lens_cuts, lens_models
+    ):
+        """Evaluates the criteria of Lens.validity_test() for a deflector and a
+        single extended source without creating the Lens instance, with the
+        same lenstronomy computations.
+
+        :param deflector: Deflector instance
+        :param los_class: LOSIndividual instance of the deflector
+        :param source: Source instance
+        :param test_area: test area of the deflector [arcsec^2]
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :param lens_models: dictionary of the LensModel and
+            LensEquationSolver instances of each lens model list, shared
+            by the candidates and completed by this function
+        :return: name of the failed stage (see
+            ~slsim.lens.VALIDITY_TEST_STAGES) or None if all criteria are
+            met, and for valid candidates the Einstein radius, image
+            positions and magnifications
+        """
+        min_image_separation = kwargs_lens_cuts.get("min_image_separation", 0)
+        max_image_separation = kwargs_lens_cuts.get("max_image_separation", 10)
+        mag_arc_limit = kwargs_lens_cuts.get("mag_arc_limit")
+        second_brightest_image_cut = kwargs_lens_cuts.get("second_brightest_image_cut")
+
+        if deflector.redshift >= source.redshift:
+            return "redshift", None
+        lens_cosmo = LensCosmo(
+            z_lens=deflector.redshift, z_source=source.redshift, cosmo=self.cosmo
+        )
+        lens_model_list, kwargs_lens = deflector_mass_model_lenstronomy(
+            deflector, los_class, lens_cosmo
+        )
+        theta_E = kwargs_lens[0]["theta_E"]
+        theta_E /= (1 - los_class.convergence) ** (
+            1.0 / (deflector.halo_properties - 1)
+        )
+        if not min_image_separation <= 2 * theta_E <= max_image_separation:
+            return "einstein_radius", None
+
+        center_lens = deflector.deflector_center
+        source_pos = source.extended_source_position(center_lens, draw_area=test_area)
+        if np.sum((center_lens - source_pos) ** 2) > theta_E**2 * 2:
+            return "source_position", None
+        if not source_within_isothermal_caustic(
+            lens_model_list, kwargs_lens, source_pos
+        ):
+            return "caustic", None
+
+        lens_model, lens_equation_solver = _shared_lens_model(
+            lens_models, lens_model_list
+        )
+        x_image, y_image = _solve_lens_equation(
+            lens_equation_solver,
+            lens_model_list,
+            kwargs_lens,
+            source_pos,
+            theta_E,
+        )
+        if len(x_image) < 2:
+            return "image_number", None
+        image_separation = image_separation_from_positions((x_image, y_image))
+        if not min_image_separation <= image_separation <= max_image_separation:
+            return "image_separation", None
+
+        magnification = lens_model.magnification(x_image, y_image, kwargs_lens)
+        if second_brightest_image_cut is not None:
+            magnification_log = 2.5 * np.log10(abs(magnification))
+            for band_max, mag_max in second_brightest_image_cut.items():
+                image_magnitudes = (
+                    source.extended_source_magnitude(band_max) - magnification_log
+                )
+                if np.sort(image_magnitudes)[1] > mag_max:
+                    return "second_brightest_image", None
+
+        if mag_arc_limit is not None:
+            host_mag = extended_source_grid_magnification(
+                source,
+                DeflectionField(lens_model, kwargs_lens),
+                deflection_grid(center_lens, [source_pos], [theta_E]),
+                reference_position=center_lens,
+                draw_area=test_area,
+                theta_E=theta_E,
+            )
+            if not any(
+                source.extended_source_magnitude(band) - 2.5 * np.log10(host_mag)
+                < mag_limit_band
+                for band, mag_limit_band in mag_arc_limit.items()
+            ):
+                return "mag_arc_limit", None
+        return None, (theta_E, x_image, y_image, magnification)
+
+    def _catalog_multi_source_images(self, deflector, los_class, sources, test_area):
+        """Einstein radii, image positions and magnifications of the sources of
+        a multi-source lens, with the deflections of the highest source
+        redshift convention of Lens.
+
+        :param deflector: Deflector instance
+        :param los_class: LOSIndividual instance of the deflector
+        :param sources: list of Source instances
+        :param test_area: test area of the deflector [arcsec^2]
+        :return: list of (theta_E, x_image, y_image, magnification) of
+            each source
+        """
+        z_lens = deflector.redshift
+        z_convention = max(source.redshift for source in sources)
+        lens_cosmo = LensCosmo(z_lens=z_lens, z_source=z_convention, cosmo=self.cosmo)
+        lens_model_list, kwargs_lens = deflector_mass_model_lenstronomy(
+            deflector, los_class, lens_cosmo
+        )
+        gamma_pl = deflector.halo_properties
+        images = []
+        for source in sources:
+            theta_E = kwargs_lens[0]["theta_E"]
+            kappa_ext = los_class.convergence
+            if source.redshift != z_convention:
+                beta = lens_cosmo.beta_double_source_plane(
+                    z_lens=z_lens, z_source_2=z_convention, z_source_1=source.redshift
+                )
+                theta_E = theta_E * beta ** (1.0 / (gamma_pl - 1))
+                kappa_ext = kappa_ext * beta
+            theta_E /= (1 - kappa_ext) ** (1.0 / (gamma_pl - 1))
+            lens_model = LensModel(
+                lens_model_list=list(lens_model_list),
+                z_lens=z_lens,
+                z_source_convention=z_convention,
+                multi_plane=False,
+                z_source=source.redshift,
+            )
+            x_image, y_image = _solve_lens_equation(
+                LensEquationSolver(lens_model),
+                lens_model_list,
+                kwargs_lens,
+                source.extended_source_position(
+                    deflector.deflector_center, draw_area=test_area
+                ),
+                theta_E,
+            )
+            magnification = lens_model.magnification(x_image, y_image, kwargs_lens)
+            images.append((theta_E, x_image, y_image, magnification))
+        return images
+
+    def _batch_catalog_rows(
+        self, batch, i, valid_candidates, importance_weight, lens_index, bands
+    ):
+        """Catalog rows of a lens of a batch of deflectors, see
+        ~slsim.Util.population_io.lens_catalog_rows(), computed from the
+        arrays of the batch and the source catalog.
+
+        :param batch: batch of deflectors, see _draw_population_batch()
+        :param i: index of the deflector in the batch
+        :param valid_candidates: list of (candidate index, Source
+            instance, images) of the valid sources of the deflector, see
+            _catalog_validity_stage()
+        :param importance_weight: importance weight of the lens
+        :param lens_index: index of the lens in the population
+        :param bands: list of imaging bands of the magnitudes
+        :return: list of rows, one per source
+        """
+        deflector = batch["deflectors"][i]
+        los_class = batch["los_list"][i]
+        center_lens = deflector.deflector_center
+        e1_light, e2_light = deflector.light_ellipticity
+        e1_mass, e2_mass = deflector.mass_ellipticity
+        gamma1, gamma2 = los_class.shear
+        row_lens = {
+            "lens_index": lens_index,
+            "lens_id": f"GG-LENS_{center_lens[0]:.4f}_{center_lens[1]:.4f}",
+            "source_number": len(valid_candidates),
+            "z_deflector": batch["z_deflector"][i],
+            "velocity_dispersion": batch["velocity_dispersion"][i],
+            "stellar_mass": deflector.stellar_mass,
+            "deflector_center_x": center_lens[0],
+            "deflector_center_y": center_lens[1],
+            "e1_light": e1_light,
+            "e2_light": e2_light,
+            "e1_mass": e1_mass,
+            "e2_mass": e2_mass,
+            "kappa_ext": los_class.convergence,
+            "gamma1_ext": gamma1,
+            "gamma2_ext": gamma2,
+            "importance_weight": importance_weight,
+        }
+        for band in bands:
+            row_lens["mag_deflector_" + band] = deflector.magnitude(band)
+
+        candidates = np.array([j for j, _, _ in valid_candidates])
+        if len(valid_candidates) == 1:
+            images = [valid_candidates[0][2]]
+        else:
+            images = self._catalog_multi_source_images(
+                deflector,
+                los_class,
+                [source for _, source, _ in valid_candidates],
+                batch["test_area"][i],
+            )
+        mag_source = {}
+        for band in bands:
+            mag_column = self._sources.catalog_column("mag_" + band)
+            if mag_column is None:
+                raise ValueError(
+                    "required parameter is missing in the source dictionary."
+                )
+            mag_source[band] = mag_column[batch["source_index"][candidates]]
+        source_center_x = center_lens[0] + batch["delta_x"][candidates]
+        source_center_y = center_lens[1] + batch["delta_y"][candidates]
+        rows = []
+        for k, (theta_E, x_image, y_image, magnification) in enumerate(images):
+            row = dict(row_lens)
+            row["source_index"] = k
+            row["z_source"] = batch["z_source"][candidates[k]]
+            row["theta_E"] = theta_E
+            row["source_center_x"] = source_center_x[k]
+            row["source_center_y"] = source_center_y[k]
+            for band in bands:
+                row["mag_source_" + band] = mag_source[band][k]
+            # no time delays are computed for extended sources
+            row.update(
+                image_columns(
+                    x_image, y_image, magnification, np.full(len(x_image), np.nan)
+                )
+            )
+            total_magnification = np.sum(np.abs(magnification))
+            for band in bands:
+                row["mag_source_lensed_" + band] = mag_source[band][k] - 2.5 * np.log10(
+                    total_magnification
+                )
+            rows.append(row)
+        return rows
+
+    def _draw_source_offsets_near_caustic(
+        self,
+        deflectors,
+        los_list,
+        theta_e,
+        candidate_deflector,
+        test_area,
+        select,
+        caustic_fraction,
+    ):
+        """Draws source positions relative to the deflector centers from a
+        mixture of a uniform distribution in the disk containing the tangential
+        caustic (with probability caustic_fraction) and the uniform
+        distribution in the test area.
+
+        The caustic of each deflector is the one of a singular
+        isothermal ellipsoid with unit Einstein radius, the mass
+        ellipticity of the deflector and the line-of-sight shear and
+        convergence. It is scaled by the Einstein radius of each
+        candidate.
+
+        :param deflectors: list of Deflector instances
+        :param los_list: list of LOSIndividual instances (or None) for
+            each deflector
+        :param theta_e: Einstein radius of each candidate (NaN for
+            candidates that are not evaluated)
+        :param candidate_deflector: deflector index of each candidate
+        :param test_area: test area of each deflector [arcsec^2]
+        :param select: boolean array of candidates passing the redshift
+            criterion. The other candidates are drawn uniformly.
+        :param caustic_fraction: probability to draw a position within
+            the tangential caustic
+        :return: delta_x, delta_y [arcsec] and importance weight (ratio
+            of the uniform density in the test area to the density of
+            the mixture) of each candidate
+        """
+        num_candidates = len(candidate_deflector)
+        radius_test = np.sqrt(test_area[candidate_deflector] / np.pi)
+        radius = np.sqrt(np.random.random(num_candidates)) * radius_test
+        phi = 2 * np.pi * np.random.random(num_candidates)
+        delta_x, delta_y = radius * np.cos(phi), radius * np.sin(phi)
+
+        # center and radius of the caustic disk for a unit Einstein radius
+        caustic_center = np.zeros((len(deflectors), 2))
+        caustic_radius = np.zeros(len(deflectors))
+        for i in np.unique(candidate_deflector[select]):
+            e1, e2 = ellipticity_slsim_to_lenstronomy(*deflectors[i].mass_ellipticity)
+            kappa, gamma1, gamma2 = 0, 0, 0
+            if los_list[i] is not None:
+                kappa = los_list[i].convergence
+                gamma1, gamma2 = ellipticity_slsim_to_lenstronomy(*los_list[i].shear)
+            caustic = isothermal_caustic(
+                1, e1, e2, gamma1=gamma1, gamma2=gamma2, kappa=kappa, num_points=360
+            )
+            if caustic is not None:
+                caustic_x, caustic_y = caustic[0], caustic[1]
+                caustic_center[i] = (caustic_x.max() + caustic_x.min()) / 2, (
+                    caustic_y.max() + caustic_y.min()
+                ) / 2
+                caustic_radius[i] = np.max(
+                    np.hypot(
+                        caustic_x - caustic_center[i][0],
+                        caustic_y - caustic_center[i][1],
+                    )
+                )
+            # the caustic of a singular isothermal sphere is a point
+            caustic_radius[i] = max(1.01 * caustic_radius[i], 0.05)
+
+        index = np.where(select)[0]
+        index = index[np.random.random(len(index)) < caustic_fraction]
+        scale = theta_e[index]
+        disk_radius = caustic_radius[candidate_deflector[index]] * scale
+        radius = np.sqrt(np.random.random(len(index))) * disk_radius
+        phi = 2 * np.pi * np.random.random(len(index))
+        delta_x[index] = caustic_center[
+            candidate_deflector[index], 0
+        ] * scale + radius * np.cos(phi)
+        delta_y[index] = caustic_center[
+            candidate_deflector[index], 1
+        ] * scale + radius * np.sin(phi)
+
+        # ratio of the densities at the drawn positions
+        weight = np.ones(num_candidates)
+        disk_radius = caustic_radius[candidate_deflector[select]] * theta_e[select]
+        in_disk = (
+            delta_x[select]
+            - caustic_center[candidate_deflector[select], 0] * theta_e[select]
+        ) ** 2 + (
+            delta_y[select]
+            - caustic_center[candidate_deflector[select], 1] * theta_e[select]
+        ) ** 2 <= disk_radius**2
+        in_test_area = (
+            delta_x[select] ** 2 + delta_y[select] ** 2 <= radius_test[select] ** 2
+        )
+        density_uniform = 1 / test_area[candidate_deflector[select]]
+        density = (1 - caustic_fraction) * density_uniform * in_test_area + (
+            caustic_fraction * in_disk / (np.pi * disk_radius**2)
+        )
+        weight[select] = density_uniform * in_test_area / density
+        return delta_x, delta_y, weight
+
+    def _validity_test(self, lens_class, kwargs_lens_cuts):
+        """Runs the validity test of a single-source lens and counts the stage
+        at which it is rejected (see validity_rejection_counts).
+
+        :param lens_class: Lens instance with a single source
+        :param kwargs_lens_cuts: validity test keywords, see
+            draw_population()
+        :return: boolean
+        """
+        valid = lens_class.validity_test(**kwargs_lens_cuts)
+        for stage in lens_class.validity_rejection_stage:
+            self._validity_rejection_counts["accepted" if stage is None else stage] += 1
+        return valid
+
+    def _candidate_einstein_radius(
+        self,
+        deflectors,
+        los_list,
+        theta_e_infinity,
+        candidate_deflector,
+        z_source,
+        select,
+    ):
+        """Einstein radii of deflector-source candidates as computed in
+        Lens.validity_test() for EPL deflectors normalized by their SIS
+        velocity dispersion, including the external convergence.
+
+        :param deflectors: list of Deflector instances
+        :param los_list: list of LOSIndividual instances (or None) for
+            each deflector
+        :param theta_e_infinity: Einstein radii of the deflectors for a
+            source at infinity [arcsec]
+        :param candidate_deflector: deflector index of each candidate
+        :param z_source: source redshift of each candidate
+        :param select: boolean array of candidates to evaluate
+        :return: Einstein radius of each candidate (NaN where not
+            evaluated) or None if not all deflectors are SIS-normalized
+            EPL profiles, e.g. with an Einstein radius given in their
+            dictionary or sis_convention=False. The candidates are then
+            tested with Lens.validity_test() only.
+        """
+        if not all(
+            deflector.deflector_type in ["EPL"] and deflector.sis_normalized
+            for deflector in deflectors
+        ):
+            return None
+        theta_e = np.full(len(candidate_deflector), np.nan)
+        if not np.any(select):
+            return theta_e
+        index = candidate_deflector[select]
+        z_lens = np.array([deflector.redshift for deflector in deflectors])[index]
+        gamma = np.array(
+            [deflector.halo_properties for deflector in deflectors], dtype=float
+        )[index]
+        kappa_ext = np.array(
+            [0 if los is None else los.convergence for los in los_list], dtype=float
+        )[index]
+        distance_ratio = (
+            self.cosmo.angular_diameter_distance_z1z2(z_lens, z_source[select])
+            / self.cosmo.angular_diameter_distance(z_source[select])
+        ).value
+        theta_e[select] = (
+            theta_e_infinity[index]
+            * distance_ratio
+            / (1 - kappa_ext) ** (1.0 / (gamma - 1))
+        )
+        return theta_e
+
+
+def _population_chunks(num_deflectors, batch_size, seed):
+    """Splits the deflectors of a population in chunks of fixed size with
+    independent random streams, such that the population does not depend on
+    the number of workers drawing the chunks.
+
+    :param num_deflectors: total number of deflectors
+    :param batch_size: number of deflectors per chunk
+    :param seed: seed of the population
+    :return: list of number of deflectors in each chunk, list of
+        ~numpy.random.SeedSequence of each chunk
+    """
+    chunk_sizes = [
+        min(batch_size, num_deflectors - start)
+        for start in range(0, num_deflectors, batch_size)
+    ]
+    return chunk_sizes, np.random.SeedSequence(seed).spawn(len(chunk_sizes))
+
+
+class _PopulationChunkDrawer(object):
+    """Draws chunks of deflectors of one LensPop instance, each with its own
+    seed.
+
+    The populations draw lazily completed quantities (e.g. the ellipticities
+    of a galaxy the first time it is drawn) and store them in their catalog
+    tables, which the drawn lenses reference. Before each chunk, the catalog
+    tables of the populations are therefore replaced by copies of their
+    state at the creation of the drawer, such that a chunk does not depend
+    on the chunks drawn before it, and the other attributes of the instance
+    (cosmology, line-of-sight population, ...) are not copied again.
+    """
+
+    def __init__(self, lens_pop):
+        """
+
+        :param lens_pop: LensPop instance drawing the chunks
+        """
+        self._lens_pop = lens_pop
+        self._catalogs = [
+            (population, name, table.copy())
+            for population, name, table in _population_tables(lens_pop)
+        ]
+
+    def __call__(self, num_deflectors, seed, kwargs_draw):
+        """Draws the lenses of a chunk of deflectors.
+
+        :param num_deflectors: number of deflectors of the chunk
+        :param seed: seed of the chunk
+        :type seed: int or ~numpy.random.SeedSequence
+        :param kwargs_draw: keyword arguments of
+            LensPop._draw_population_chunk()
+        :return: list of Lens instances (or catalog rows), dictionary of
+            the validity test counts of the chunk
+        """
+        for population, name, table in self._catalogs:
+            setattr(population, name, table.copy())
+        return self._lens_pop._draw_population_chunk(
+            num_deflectors, seed=seed, **kwargs_draw
+        )
+
+
+# chunk drawer of the populations of a worker process, see _init_population_worker()
+_worker_chunk_drawer = None
+
+
+def _init_population_worker(lens_pop):
+    """Initializer of the worker processes drawing the chunks of a
+    population, which receive the populations once.
+
+    :param lens_pop: LensPop instance
+    """
+    global _worker_chunk_drawer
+    _worker_chunk_drawer = _PopulationChunkDrawer(lens_pop)
+
+
+def _draw_worker_population_chunk(num_deflectors, seed, kwargs_draw):
+    """Draws a chunk of deflectors in a worker process initialized with
+    _init_population_worker(), see _PopulationChunkDrawer.__call__()."""
+    return _worker_chunk_drawer(num_deflectors, seed, kwargs_draw)
+
+
+def _map_population_chunks(
+    executor, draw_chunk, chunk_sizes, seed_sequences, kwargs_draw, max_pending
+):
+    """Draws the chunks of a population with an executor.
+
+    :param executor: ~concurrent.futures.Executor instance
+    :param draw_chunk: function of the number of deflectors, seed and
+        kwargs_draw of a chunk returning its lenses and validity test
+        counts, see _PopulationChunkDrawer
+    :param chunk_sizes: list of number of deflectors in each chunk
+    :param seed_sequences: list of ~numpy.random.SeedSequence for each
+        chunk
+    :param kwargs_draw: keyword arguments of
+        LensPop._draw_population_chunk()
+    :param max_pending: maximum number of chunks submitted to the
+        executor and not yet yielded
+    :return: generator of the results of draw_chunk, in chunk order
+    """
+    futures = deque()
+    for chunk_size, seed_sequence in zip(chunk_sizes, seed_sequences):
+        if len(futures) >= max_pending:
+            yield futures.popleft().result()
+        futures.append(
+            executor.submit(draw_chunk, chunk_size, seed_sequence, kwargs_draw)
+        )
+    while futures:
+        yield futures.popleft().result()
+
+
+def _population_tables(lens_pop):
+    """Catalog tables of the deflector and source populations of a LensPop
+    instance.
+
+    :param lens_pop: LensPop instance
+    :return: list of (population, attribute name, ~astropy.table.Table)
+    """
+    return [
+        (population, name, table)
+        for population in [lens_pop._lens_galaxies, lens_pop._sources]
+        for name, table in vars(population).items()
+        if isinstance(table, Table)
+    ]
+
+
+def _check_importance_sampling(importance_sampling, batched):
+    """Checks the importance_sampling option of LensPop.draw_population().
+
+    :param importance_sampling: fraction of the source positions drawn
+        within the tangential caustic or None
+    :param batched: batched option of the draw
+    """
+    if importance_sampling is not None:
+        if batched is not True:
+            raise ValueError("importance_sampling requires batched=True.")
+        if not 0 < importance_sampling < 1:
+            raise ValueError(
+                "importance_sampling must be between 0 and 1, not %s."
+                % importance_sampling
+            )
+
+
+def _iter_valid_candidates(batch, test_candidate, multi_source):
+    """Generator of the deflectors of a batch with valid candidates. The
+    candidates passing the array criteria are tested in order, up to the first
+    valid one of each deflector unless multi_source is True.
+
+    :param batch: batch of deflectors, see LensPop._draw_population_batch()
+    :param test_candidate: function of the deflector and candidate indices
+        returning None for an invalid candidate
+    :param multi_source: if True, considers multi source lensing
+    :return: generator of the deflector index, list of the results of
+        test_candidate for its valid candidates and importance weight of
+        the lens
+    """
+    candidate_deflector = batch["candidate_deflector"]
+    first_candidate = batch["first_candidate"]
+    candidates = np.where(batch["select"])[0]
+    for i in np.unique(candidate_deflector[candidates]):
+        valid = []
+        # the candidates of the deflector are tested up to last_tested
+        last_tested = first_candidate[i] + batch["num_sources_tested"][i] - 1
+        for j in candidates[candidate_deflector[candidates] == i]:
+            result = test_candidate(i, j)
+            if result is not None:
+                valid.append(result)
+                if not multi_source:
+                    last_tested = j
+                    break
+        if len(valid) > 0:
+            # the lens depends on the positions of all the candidates tested for the
+            # deflector, accepted or not (including those rejected by the array
+            # criteria), which are drawn independently: its weight is the product of
+            # their weights
+            importance_weight = np.prod(
+                batch["weight"][first_candidate[i] : last_tested + 1]
+            )
+            yield i, valid, importance_weight
+
+
+def _shared_lens_model(lens_models, lens_model_list):
+    """LensModel and LensEquationSolver instances of a lens model list, shared
+    by single-plane lenses whose deflections are given for their source
+    redshift.
+
+    :param lens_models: dictionary of the instances of each lens model
+        list, completed by this function
+    :param lens_model_list: lenstronomy lens model list
+    :return: LensModel instance, LensEquationSolver instance
+    """
+    key = tuple(lens_model_list)
+    if key not in lens_models:
+        lens_model = LensModel(lens_model_list=list(lens_model_list))
+        lens_models[key] = (lens_model, LensEquationSolver(lens_model))
+    return lens_models[key]
+
+
+def _solve_lens_equation(
+    lens_equation_solver, lens_model_list, kwargs_lens, source_position, theta_E
+):
+    """Image positions of a source, with the solver settings of the extended
+    source images of Lens (analytical solver where supported and default
+    magnification limit).
+
+    :param lens_equation_solver: LensEquationSolver instance
+    :param lens_model_list: lenstronomy lens model list
+    :param kwargs_lens: lenstronomy keyword arguments of the lens model
+    :param source_position: source position [arcsec]
+    :param theta_E: Einstein radius of the source [arcsec]
+    :return: x-pos, y-pos
+    """
+    if analytical_lens_model_support(lens_model_list) is True:
+        solver = "analytical"
+    else:
+        solver = "lenstronomy"
+    return lens_equation_solver.image_position_from_source(
+        source_position[0],
+        source_position[1],
+        kwargs_lens,
+        solver=solver,
+        search_window=theta_E * 6,
+        min_distance=theta_E * 6 / 200,
+        magnification_limit=0.01,
+    )
+
+
+def _catalog_rows(lens_list, bands):
+    """Catalog rows with image properties of a list of lenses, see
+    ~slsim.Util.population_io.lens_catalog_rows().
+
+    :param lens_list: list of Lens instances
+    :param bands: list of imaging bands
+    :return: list of rows; the lens_index is the index in lens_list
+    """
+    rows = []
+    for lens_index, lens in enumerate(lens_list):
+        rows.extend(
+            lens_catalog_rows(
+                lens, lens_index=lens_index, bands=bands, image_properties=True
+            )
+        )
+    return rows
 
 
 def draw_test_area(**kwargs):
@@ -1,3 +1,6 @@
+import numpy as np
+
+
 def object_cut(
     galaxy_list,
     z_min=0,
@@ -56,3 +59,25 @@ def object_cut(
                 galaxy_list_cut.append(cut_table)
 
     return galaxy_list_cut
+
+
+def catalog_column(object_list, name, list_type="astropy_table"):
+    """Values of a column of an (already selected) object catalog as an array,
+    in the order in which the objects are stored.
+
+    :param object_list: astropy table or list of astropy tables (as
+        returned by object_cut())
+    :param name: column name
+    :param list_type: format of the catalog. Currently, it supports a
+        single astropy table or a list of astropy tables. For a list,
+        the value in the first row of each table is used.
+    :return: numpy array of the column values or None if the column is
+        not present in the catalog.
+    """
+    if list_type == "astropy_table":
+        if name not in object_list.colnames:
+            return None
+        return np.array(object_list[name])
+    if len(object_list) == 0 or name not in object_list[0].colnames:
+        return None
+    return np.array([table[name][0] for table in object_list])
@@ -65,6 +65,13 @@ class TestEPLSersic(object):
         gamma = self.epl_sersic.halo_properties
         assert gamma == 2.0
 
+    def test_sis_normalized(self):
+        assert self.epl_sersic.sis_normalized
+        epl_sersic = EPLSersic(deflector_dict=self.deflector_dict, sis_convention=False)
+        assert not epl_sersic.sis_normalized
+        deflector_dict = dict(self.deflector_dict, theta_E=1.2)
+        assert not EPLSersic(deflector_dict=deflector_dict).sis_normalized
+
 
 @pytest.fixture
 def gamma_epl_sersic_instance():
@@ -0,0 +1,36 @@
+import time
+import numpy as np
+import numpy.testing as npt
+import pytest
+from slsim.LsstSciencePipeline.local_butler import LocalButler
+
+
+def test_local_butler(tmp_path):
+    butler = LocalButler(str(tmp_path))
+    coadd = np.arange(20.0).reshape(4, 5)
+    data_id = {"tract": 3828, "patch": 24, "band": "i"}
+    butler.put(coadd, "deepCoadd", dataId=data_id)
+    butler.put({"tracts": [3828]}, "skyMap")
+    npt.assert_array_equal(butler.get("deepCoadd", dataId=data_id), coadd)
+    # the data id order does not matter
+    npt.assert_array_equal(
+        butler.get("deepCoadd", dataId={"band": "i", "patch": 24, "tract": 3828}),
+        coadd,
+    )
+    bbox = (slice(1, 3), slice(0, 2))
+    npt.assert_array_equal(
+        butler.get("deepCoadd", dataId=data_id, parameters={"bbox": bbox}),
+        coadd[bbox],
+    )
+    assert butler.get("skyMap") == {"tracts": [3828]}
+    with pytest.raises(LookupError):
+        butler.get("deepCoadd", dataId=dict(data_id, band="r"))
+
+    butler = LocalButler(
+        str(tmp_path), readers={"deepCoadd": lambda filename: filename}, latency=0.05
+    )
+    start = time.time()
+    assert butler.get("deepCoadd", dataId=data_id) == butler.filename(
+        "deepCoadd", dataId=data_id
+    )
+    assert time.time() - start >= 0.05
@@ -8,6 +8,7 @@ from slsim.LsstSciencePipeline.util_lsst import (
     multiple_variable_lens_injection,
 )
 from slsim.Sources.source import Source
+from slsim.Util.table_io import ImageTableReader
 from slsim.Deflectors.deflector import Deflector
 import pytest
 
@@ -79,8 +80,27 @@ def test_variable_lens_injection(pes_lens_instance):
     )
     assert len(results) == len(expo_data)
 
+    # the columns reference the preallocated images
+    lens_out = np.empty((len(expo_data), 301, 301))
+    injected_out = np.empty((len(expo_data), 301, 301))
+    results = variable_lens_injection(
+        lens_class,
+        band="i",
+        num_pix=301,
+        transform_pix2angle=transform_matrices,
+        exposure_data=expo_data,
+        out=lens_out,
+        injected_out=injected_out,
+    )
+    assert np.shares_memory(results["lens"], lens_out)
+    assert np.shares_memory(results["injected_lens"], injected_out)
+    np.testing.assert_allclose(
+        injected_out,
+        np.asarray(expo_data["time_series_images"]) + lens_out,
+    )
+
 
-def test_multiple_variable_lens_injection(pes_lens_instance):
+def test_multiple_variable_lens_injection(pes_lens_instance, tmp_path):
     lens_class = [pes_lens_instance, pes_lens_instance]
     path = os.path.dirname(__file__)
     expo_data_1 = Table.read(
@@ -104,3 +124,20 @@ def test_multiple_variable_lens_injection(pes_lens_instance):
         exposure_data_list=expo_data,
     )
     assert len(results) == len(expo_data)
+
+    output_file = os.path.join(tmp_path, "injected_lenses.h5")
+    assert (
+        multiple_variable_lens_injection(
+            lens_class,
+            band="i",
+            num_pix=301,
+            transform_matrices_list=transform_matrices,
+            exposure_data_list=expo_data,
+            output_file=output_file,
+        )
+        is None
+    )
+    with ImageTableReader(output_file) as reader:
+        assert reader.num_tables == len(expo_data)
+        assert len(reader) == len(expo_data_1) + len(expo_data_2)
+        assert reader["injected_lens"].shape == (len(reader), 301, 301)
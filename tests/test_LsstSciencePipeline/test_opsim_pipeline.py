@@ -3,7 +3,11 @@ import numpy as np
 from astropy.table import Table
 from astropy.cosmology import FlatLambdaCDM
 from slsim.lens import Lens
-from slsim.LsstSciencePipeline.opsim_pipeline import opsim_time_series_images_data
+from slsim.LsstSciencePipeline.opsim_pipeline import (
+    opsim_time_series_images_data,
+    PSFKernelBank,
+    exposure_psf_kernels,
+)
 from slsim.LsstSciencePipeline.util_lsst import opsim_variable_lens_injection
 from slsim.Sources.source import Source
 from slsim.Deflectors.deflector import Deflector
@@ -93,7 +97,7 @@ def test_opsim_time_series_images_data():
             )  # does it have the same length as number of points given?
             assert opsim_data[0].keys() == [
                 "bkg_noise",  # does it contain the right data columns?
-                "psf_kernel",
+                "psf_kernel_index",
                 "obs_time",
                 "expo_time",
                 "zero_point",
@@ -104,7 +108,7 @@ def test_opsim_time_series_images_data():
                 opsim_data[0]["bkg_noise"][0], float
             )  # are entries from bkg_noise floats?
             assert (
-                opsim_data[0]["psf_kernel"][0].ndim == 2
+                exposure_psf_kernels(opsim_data[0])[0].ndim == 2
             )  # is psf_kernel a 2 dimensional array?
             assert isinstance(
                 opsim_data[0]["obs_time"][0], float
@@ -155,5 +159,40 @@ def test_opsim_variable_lens_injection(pes_lens_instance):
     mask = np.isin(expo_bands, bands)
     assert len(results) == len(expo_data[mask])
 
+    # exposure data storing kernel indices instead of kernels
+    kernel_bank = PSFKernelBank(num_pix=101, delta_pix=0.2, moffat_beta=3.1)
+    expo_data_compact = expo_data.copy()
+    expo_data_compact.remove_column("psf_kernel")
+    expo_data_compact["psf_kernel_index"] = kernel_bank.index([0.7, 0.8, 0.7, 1.0])
+    expo_data_compact.meta.update(kernel_bank.meta)
+    results = opsim_variable_lens_injection(
+        lens_class,
+        bands=bands,
+        num_pix=301,
+        transform_pix2angle=transform_pix2angle,
+        exposure_data=expo_data_compact,
+    )
+    assert len(results) == len(expo_data[mask])
+
+
+def test_psf_kernel_bank():
+    kernel_bank = PSFKernelBank(num_pix=41, delta_pix=0.2, moffat_beta=3.1)
+    indices = kernel_bank.index([0.701, 0.699, 0.8, 0.0])
+    np.testing.assert_array_equal(indices, [70, 70, 80, 1])
+    kernels = kernel_bank.kernels(indices)
+    # the kernels of the same quantized FWHM are computed once and shared
+    assert kernels[0] is kernels[1]
+    assert kernels[0].shape == (41, 41)
+    np.testing.assert_allclose(np.sum(kernels[2]), 1)
+    # the kernel bank is recovered from the meta data of a table
+    table = Table({"psf_kernel_index": indices}, meta=kernel_bank.meta)
+    resolved_kernels = exposure_psf_kernels(table)
+    np.testing.assert_array_equal(resolved_kernels[2], kernels[2])
+    assert PSFKernelBank.from_meta(table.meta) is PSFKernelBank.from_meta(
+        dict(table.meta)
+    )
+    table = Table({"psf_kernel": np.array(kernels)})
+    np.testing.assert_array_equal(exposure_psf_kernels(table), np.array(kernels))
+
 
 test_opsim_time_series_images_data()
@@ -0,0 +1,185 @@
+import os
+import sqlite3
+import numpy as np
+import numpy.testing as npt
+import pytest
+from slsim.LsstSciencePipeline.opsim_pipeline import opsim_time_series_images_data
+from slsim.LsstSciencePipeline.opsim_visit_cache import (
+    OpSimVisitCache,
+    sky_tile_index,
+    sky_tile_center,
+)
+
+
+class SyntheticOpSimQuery(object):
+    """Query of a synthetic local OpSim database, selecting the visits whose
+    field center is within 1.75 degrees of the positions."""
+
+    def __init__(self, opsim_path):
+        self.opsim_path = opsim_path
+        self.num_positions = 0
+
+    def __call__(self, ra, dec):
+        with sqlite3.connect(self.opsim_path) as connection:
+            rows = connection.execute(
+                "SELECT observationStartMJD, band, zeroPoint, skySig, "
+                "seeingFwhmGeom, visitExposureTime, fieldRA, fieldDec "
+                "FROM observations"
+            ).fetchall()
+        columns = dict(
+            zip(
+                [
+                    "expMJD",
+                    "BAND",
+                    "ZPT",
+                    "SKYSIG",
+                    "seeingFwhmGeom",
+                    "visitExposureTime",
+                    "fieldRA",
+                    "fieldDec",
+                ],
+                [np.array(column) for column in zip(*rows)],
+            )
+        )
+        for ra_i, dec_i in zip(np.atleast_1d(ra), np.atleast_1d(dec)):
+            self.num_positions += 1
+            cos_separation = np.sin(np.radians(dec_i)) * np.sin(
+                np.radians(columns["fieldDec"])
+            ) + np.cos(np.radians(dec_i)) * np.cos(
+                np.radians(columns["fieldDec"])
+            ) * np.cos(
+                np.radians(ra_i - columns["fieldRA"])
+            )
+            mask = cos_separation > np.cos(np.radians(1.75))
+            yield {name: values[mask] for name, values in columns.items()}
+
+
+def _synthetic_opsim_database(filename, num_visits=500):
+    np.random.seed(1)
+    with sqlite3.connect(filename) as connection:
+        connection.execute(
+            "CREATE TABLE observations (observationStartMJD REAL, band TEXT, "
+            "zeroPoint REAL, skySig REAL, seeingFwhmGeom REAL, "
+            "visitExposureTime REAL, fieldRA REAL, fieldDec REAL)"
+        )
+        connection.executemany(
+            "INSERT INTO observations VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            zip(
+                np.random.uniform(60000, 61000, num_visits),
+                np.random.choice(["g", "r", "i"], num_visits),
+                np.random.uniform(27, 28, num_visits),
+                np.random.uniform(10, 20, num_visits),
+                np.random.uniform(0.6, 1.2, num_visits),
+                np.full(num_visits, 30.0),
+                np.random.uniform(149, 151, num_visits),
+                np.random.uniform(-11, -9, num_visits),
+            ),
+        )
+
+
+class TestOpSimVisitCache(object):
+    def setup_method(self):
+        self.ra = np.array([150.02, 150.04, 150.5, 10.0])
+        self.dec = np.array([-10.03, -10.05, -9.5, 20.0])
+
+    def test_visits(self, tmp_path):
+        opsim_path = os.path.join(tmp_path, "synthetic_opsim.db")
+        _synthetic_opsim_database(opsim_path)
+        query = SyntheticOpSimQuery(opsim_path)
+        filename = os.path.join(tmp_path, "visits.h5")
+        visit_cache = OpSimVisitCache(
+            filename, opsim_path=opsim_path, tile_size=0.1, query=query
+        )
+        assert visit_cache.obs_strategy == "synthetic_opsim"
+        assert (150.02, -10.03) not in visit_cache
+        visits = visit_cache.visits(self.ra, self.dec)
+        # the first two positions share a tile
+        assert query.num_positions == 3
+        assert len(visits) == 4
+        npt.assert_array_equal(visits[0]["expMJD"], visits[1]["expMJD"])
+        assert len(visits[0]["expMJD"]) > 0
+        assert np.all(np.diff(visits[2]["expMJD"]) >= 0)
+        assert set(visits[2]["BAND"]) <= {"g", "r", "i"}
+        # outside of the synthetic footprint
+        assert len(visits[3]["expMJD"]) == 0
+
+        # the visits are read from the file
+        visit_cache = OpSimVisitCache(filename, tile_size=0.1, query=query)
+        assert (150.02, -10.03) in visit_cache
+        visits_cached = visit_cache.visits(self.ra[:3], self.dec[:3])
+        assert query.num_positions == 3
+        for name in visits[2]:
+            npt.assert_array_equal(visits_cached[2][name], visits[2][name])
+        with pytest.raises(ValueError):
+            OpSimVisitCache(filename, tile_size=0.2, query=query)
+        with pytest.raises(ValueError):
+            OpSimVisitCache(filename, query=query, obs_strategy="baseline")
+
+    def test_database_mismatch(self, tmp_path):
+        opsim_path = os.path.join(tmp_path, "synthetic_opsim.db")
+        _synthetic_opsim_database(opsim_path)
+        filename = os.path.join(tmp_path, "visits.h5")
+        OpSimVisitCache(
+            filename, opsim_path=opsim_path, query=SyntheticOpSimQuery(opsim_path)
+        )
+        # another database of the same name
+        other_path = os.path.join(tmp_path, "other", "synthetic_opsim.db")
+        os.makedirs(os.path.dirname(other_path))
+        _synthetic_opsim_database(other_path, num_visits=100)
+        with pytest.raises(ValueError):
+            OpSimVisitCache(
+                filename, opsim_path=other_path, query=SyntheticOpSimQuery(other_path)
+            )
+
+    def test_opsim_time_series_images_data(self, tmp_path):
+        opsim_path = os.path.join(tmp_path, "synthetic_opsim.db")
+        _synthetic_opsim_database(opsim_path)
+        visit_cache = OpSimVisitCache(
+            os.path.join(tmp_path, "visits.h5"),
+            opsim_path=opsim_path,
+            query=SyntheticOpSimQuery(opsim_path),
+        )
+        opsim_data = opsim_time_series_images_data(
+            self.ra,
+            self.dec,
+            obs_strategy="synthetic_opsim",
+            MJD_min=60000,
+            MJD_max=60500,
+            num_pix=21,
+            print_warning=False,
+            visit_cache=visit_cache,
+        )
+        # the position outside of the footprint is skipped
+        assert len(opsim_data) == 3
+        assert "psf_kernel_index" in opsim_data[0].colnames
+        assert np.all(opsim_data[0]["obs_time"] < 60500)
+        assert np.all(np.diff(opsim_data[0]["obs_time"]) >= 0)
+
+        # arguments conflicting with the cache
+        with pytest.raises(ValueError):
+            opsim_time_series_images_data(
+                self.ra, self.dec, "baseline_v3.0_10yrs", visit_cache=visit_cache
+            )
+        with pytest.raises(ValueError):
+            opsim_time_series_images_data(
+                self.ra,
+                self.dec,
+                "synthetic_opsim",
+                opsim_path=os.path.join(tmp_path, "other.db"),
+                visit_cache=visit_cache,
+            )
+
+
+def test_sky_tiles():
+    np.random.seed(2)
+    ra = np.random.uniform(0, 360, 1000)
+    dec = np.degrees(np.arcsin(np.random.uniform(-1, 1, 1000)))
+    tiles = sky_tile_index(ra, dec, 1.0)
+    ra_center, dec_center = sky_tile_center(tiles, 1.0)
+    npt.assert_array_equal(sky_tile_index(ra_center, dec_center, 1.0), tiles)
+    assert np.all(np.abs(dec_center - dec) <= 0.5)
+    # the tiles are about 1 degree wide in ra, away from the poles
+    mask = np.abs(dec) < 80
+    separation = np.abs((ra_center - ra + 180) % 360 - 180) * np.cos(np.radians(dec))
+    assert np.all(separation[mask] <= 0.6)
+    assert sky_tile_index(360.0, 90.0, 1.0) == sky_tile_index(0.0, 89.9, 1.0)
@@ -317,6 +317,35 @@ class TestGalaxies(object):
             self.galaxies5.draw_source()
         assert galaxy_3 is None
 
+    def test_draw_source_index(self):
+        index = self.galaxies.draw_source_index(size=10)
+        assert len(index) == 10
+        assert np.all(index < self.galaxies.source_number_selected)
+        galaxy = self.galaxies.draw_source(index=index[0])
+        z_list = self.galaxies.source_redshifts
+        assert galaxy.redshift == z_list[index[0]]
+        assert self.galaxies.catalog_column("not_a_column") is None
+
+    def test_draw_source_redshift_range(self):
+        # all galaxies of this catalog are at z=0.5
+        z_list = self.galaxies.source_redshifts
+        index = self.galaxies.draw_source_index(size=10, z_min=0.4, z_max=0.6)
+        assert len(index) == 10
+        assert np.all(z_list[index] == 0.5)
+        z_min = np.linspace(0, 0.49, 10)
+        index = self.galaxies.draw_source_index(size=10, z_min=z_min)
+        assert np.all(z_list[index] > z_min)
+        npt.assert_array_equal(
+            self.galaxies.source_number_in_range(z_min=[0.4, 0.5, 0.6]), [3, 0, 0]
+        )
+        assert self.galaxies.source_number_in_range(z_max=0.6) == 3
+        galaxy = self.galaxies.draw_source(z_min=0.4)
+        assert galaxy.redshift == 0.5
+        assert self.galaxies.draw_source(z_min=0.5) is None
+        assert self.galaxies.draw_source_index(z_min=0.4, z_max=0.5) is None
+        with pytest.raises(ValueError):
+            self.galaxies.draw_source_index(size=2, z_min=0.5)
+
     def test_draw_source_double_sersic(self):
         galaxy1 = self.galaxies2.draw_source()
         galaxy2 = self.galaxies3.draw_source()
@@ -163,6 +163,19 @@ class TestSource:
         assert x_pos == 0.045
         assert y_pos == -0.048
 
+    def test_update_center(self):
+        self.source_point_extended.update_center(center_x=0.1, center_y=0.2)
+        x_pos, y_pos = self.source_point_extended.extended_source_position()
+        npt.assert_almost_equal([x_pos, y_pos], [0.1, 0.2], decimal=10)
+        x_pos, y_pos = self.source_point_extended.point_source_position()
+        npt.assert_almost_equal([x_pos, y_pos], [0.101, 0.202], decimal=10)
+        kwargs = self.source_point_extended.kwargs_extended_source_light(band="i")
+        assert kwargs[0]["center_x"] == 0.1
+        self.source.update_center(center_x=-0.3, center_y=0.4)
+        x_pos, y_pos = self.source.extended_source_position()
+        assert x_pos == -0.3
+        assert y_pos == 0.4
+
     def test_point_source_magnitude(self):
         result = self.source_point_extended.point_source_magnitude(band="i")
         assert result == 20
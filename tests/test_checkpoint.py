@@ -0,0 +1,89 @@
+import os
+import numpy as np
+import pytest
+from numpy import testing as npt
+from slsim.Util.checkpoint import (
+    save_checkpoint,
+    load_checkpoint,
+    seeded_call,
+    checkpointed_starmap,
+    ResultsCheckpoint,
+    load_results_checkpoint,
+)
+from slsim.Halos.halos_plus_glass import generate_samples_from_glass
+
+
+def test_save_load_checkpoint(tmp_path):
+    filename = os.path.join(tmp_path, "checkpoint.pkl")
+    save_checkpoint(filename, {"a": [1, 2]})
+    save_checkpoint(filename, {"a": [1, 2, 3]})
+    assert load_checkpoint(filename) == {"a": [1, 2, 3]}
+    assert not os.path.exists(filename + ".tmp")
+
+
+def test_results_checkpoint(tmp_path):
+    filename = os.path.join(tmp_path, "checkpoint.pkl")
+    checkpoint = ResultsCheckpoint(filename)
+    checkpoint.save({"seed": 1}, [np.arange(3), "a"])
+    size = os.path.getsize(filename + ".results")
+    checkpoint.save({"seed": 1}, [[4, 5]])
+    # only the new results are written
+    assert os.path.getsize(filename + ".results") - size < size
+    state, results = load_results_checkpoint(filename)
+    assert state["seed"] == 1
+    assert state["num_results"] == 3
+    npt.assert_array_equal(results[0], np.arange(3))
+    assert results[1:] == ["a", [4, 5]]
+
+    # results appended after the last saved state are discarded
+    with open(filename + ".results", "ab") as f:
+        f.write(b"interrupted")
+    state, results = load_results_checkpoint(filename)
+    checkpoint = ResultsCheckpoint(filename, state=state)
+    checkpoint.save({"seed": 1}, [6])
+    assert load_results_checkpoint(filename)[1][1:] == ["a", [4, 5], 6]
+
+
+def test_seeded_call():
+    np.random.seed(1)
+    x = seeded_call(np.random.normal, 10, (0, 1, 3))
+    random_draw = np.random.random()
+    np.random.seed(1)
+    assert np.random.random() == random_draw
+    npt.assert_array_equal(x, seeded_call(np.random.normal, 10, (0, 1, 3)))
+
+
+def test_checkpointed_starmap(tmp_path):
+    kappa = np.random.normal(0, 0.1, 100)
+    gamma = np.abs(np.random.normal(0, 0.1, 100))
+    args_list = [(kappa, gamma, 5)] * 3
+    filename = os.path.join(tmp_path, "checkpoint.pkl")
+    results = checkpointed_starmap(
+        generate_samples_from_glass, args_list, seed=2, checkpoint=filename
+    )
+    results_2 = checkpointed_starmap(
+        generate_samples_from_glass, args_list, seed=2, processes=1
+    )
+    npt.assert_array_equal(results, results_2)
+    assert not np.array_equal(results[0], results[1])
+
+    # resume an interrupted run
+    state = load_checkpoint(filename)
+    state["num_results"] = 1
+    save_checkpoint(filename, state)
+    results_3 = checkpointed_starmap(
+        generate_samples_from_glass, args_list, resume_from=filename
+    )
+    npt.assert_array_equal(results, results_3)
+    assert len(load_results_checkpoint(filename)[1]) == 3
+    with pytest.raises(ValueError):
+        checkpointed_starmap(
+            generate_samples_from_glass, args_list[:2], resume_from=filename
+        )
+    # same number of calls with other arguments
+    with pytest.raises(ValueError):
+        checkpointed_starmap(
+            generate_samples_from_glass,
+            [(kappa, gamma, 6)] * 3,
+            resume_from=filename,
+        )
@@ -0,0 +1,64 @@
+import numpy as np
+from numpy import testing as npt
+from lenstronomy.LensModel.lens_model import LensModel
+from lenstronomy.Util import util
+from slsim.Util.deflection_field import DeflectionField, deflection_grid
+
+
+def test_deflection_field():
+    lens_model = LensModel(lens_model_list=["SIE", "SHEAR"])
+    kwargs_lens = [
+        {"theta_E": 1, "e1": 0.1, "e2": -0.05, "center_x": 0.1, "center_y": 0},
+        {"gamma1": 0.03, "gamma2": 0.02, "ra_0": 0, "dec_0": 0},
+    ]
+    deflection_field = DeflectionField(lens_model, kwargs_lens, max_grids=1)
+    x, y, beta_x, beta_y = deflection_field.ray_shooting(0.2, -0.1, 0.05, 20)
+    x_grid, y_grid = util.make_grid(20, 0.05)
+    npt.assert_almost_equal(x, x_grid + 0.2)
+    npt.assert_almost_equal(y, y_grid - 0.1)
+    beta_x_, beta_y_ = lens_model.ray_shooting(x, y, kwargs_lens)
+    npt.assert_almost_equal(beta_x, beta_x_)
+    npt.assert_almost_equal(beta_y, beta_y_)
+
+    # the deflections of the same grid are reused and scaled for other sources
+    alpha = deflection_field.deflection(0.2, -0.1, 0.05, 20)
+    assert deflection_field.deflection(0.2, -0.1, 0.05, 20) is alpha
+    _, _, beta_x, beta_y = deflection_field.ray_shooting(0.2, -0.1, 0.05, 20, scale=0.5)
+    npt.assert_almost_equal(beta_x, x - 0.5 * (x - beta_x_))
+    npt.assert_almost_equal(beta_y, y - 0.5 * (y - beta_y_))
+
+    # the windows of the grid share its deflections
+    x_, y_, beta_x__, beta_y__ = deflection_field.ray_shooting_window(
+        0.2, -0.1, 0.05, 20, 0.3, 0, 0.2, scale=0.5
+    )
+    window = (np.abs(x - 0.3) < 0.2) & (np.abs(y) < 0.2)
+    assert len(x_) == 64
+    npt.assert_almost_equal(x_, x[window])
+    npt.assert_almost_equal(y_, y[window])
+    npt.assert_almost_equal(beta_x__, beta_x[window])
+    npt.assert_almost_equal(beta_y__, beta_y[window])
+    assert deflection_field.deflection(0.2, -0.1, 0.05, 20) is alpha
+
+    # only max_grids grids are kept
+    deflection_field.deflection(0, 0, 0.05, 20)
+    assert deflection_field.deflection(0.2, -0.1, 0.05, 20) is not alpha
+    deflection_field.clear()
+    assert len(deflection_field._grids) == 0
+    assert np.all(np.isfinite(alpha[2]))
+
+
+def test_deflection_grid():
+    center_x, center_y, delta_pix, num_pix = deflection_grid(
+        [0.1, -0.2], [[0.5, -0.2], [0.1, 0.3]], [1, 0.5], num_pix_einstein_radius=100
+    )
+    npt.assert_almost_equal(delta_pix, 0.02)
+    x, y = util.make_grid(num_pix, delta_pix)
+    x += center_x
+    y += center_y
+    # the pixels lie on a lattice aligned with the deflector center
+    npt.assert_almost_equal(np.min(np.abs(x - 0.1)), 0)
+    npt.assert_almost_equal(np.min(np.abs(y + 0.2)), 0)
+    # the grid covers the windows of side 4 theta_E around the sources
+    assert np.min(x) <= 0.5 - 2 and np.max(x) >= 0.5 + 2
+    assert np.min(y) <= -0.2 - 2 and np.max(y) >= -0.2 + 2
+    assert np.max(y) >= 0.3 + 1
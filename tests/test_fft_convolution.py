@@ -0,0 +1,36 @@
+import numpy as np
+from numpy import testing as npt
+from scipy.signal import fftconvolve
+from slsim.Util.fft_convolution import FFTConvolution
+
+
+def test_fft_convolution():
+    rng = np.random.default_rng(1)
+    images = rng.uniform(size=(3, 40, 31))
+    kernels = rng.uniform(size=(3, 8, 7))
+    fft_convolution = FFTConvolution(max_kernels=2)
+
+    convolved = fft_convolution.convolve(images[0], kernels[0])
+    npt.assert_allclose(
+        convolved, fftconvolve(images[0], kernels[0], mode="same"), atol=1e-12
+    )
+    assert len(fft_convolution._kernel_ffts) == 1
+    fft_convolution.convolve(images[1], kernels[0].copy())
+    assert len(fft_convolution._kernel_ffts) == 1
+
+    # stack of images with one kernel and with one kernel per image
+    convolved = fft_convolution.convolve(images, kernels[1])
+    convolved_stack = fft_convolution.convolve(images, kernels)
+    assert convolved.shape == images.shape
+    for i in range(3):
+        npt.assert_allclose(
+            convolved[i], fftconvolve(images[i], kernels[1], mode="same"), atol=1e-12
+        )
+        npt.assert_allclose(
+            convolved_stack[i],
+            fftconvolve(images[i], kernels[i], mode="same"),
+            atol=1e-12,
+        )
+    assert len(fft_convolution._kernel_ffts) == 2
+    fft_convolution.clear()
+    assert len(fft_convolution._kernel_ffts) == 0
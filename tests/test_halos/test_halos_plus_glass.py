@@ -24,6 +24,7 @@ from slsim.Halos.halos_plus_glass import (
 )
 import os
 import numpy as np
+from slsim.Util.checkpoint import load_checkpoint, save_checkpoint
 import pytest
 from astropy.cosmology import FlatLambdaCDM
 
@@ -193,6 +194,23 @@ def test_run_total_mass_by_multiprocessing():
     assert isinstance(result[0], float)
 
 
+def test_run_total_mass_by_multiprocessing_checkpoint(tmp_path):
+    checkpoint = os.path.join(tmp_path, "halos.pkl")
+    result = run_total_mass_by_multiprocessing(
+        n_iterations=2, seed=3, checkpoint=checkpoint
+    )
+    assert result == run_total_mass_by_multiprocessing(n_iterations=2, seed=3)
+    # interrupted run after the first iteration
+    state = load_checkpoint(checkpoint)
+    state["num_results"] = 1
+    save_checkpoint(checkpoint, state)
+    assert result == run_total_mass_by_multiprocessing(
+        n_iterations=2, resume_from=checkpoint
+    )
+    with pytest.raises(ValueError):
+        run_total_mass_by_multiprocessing(n_iterations=3, resume_from=checkpoint)
+
+
 def test_convergence_mean_0():
     kappa_data = [1, 2, 3, 4, 5]
     adjusted_kappa_data = convergence_mean_0(kappa_data)
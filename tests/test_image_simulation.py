@@ -6,7 +6,11 @@ from astropy.cosmology import FlatLambdaCDM
 from slsim.lens import Lens
 from slsim.image_simulation import (
     simulate_image,
+    simulate_images,
     sharp_image,
+    multi_band_extended_images,
+    supersampling_mask,
+    compact_light_mask,
     sharp_rgb_image,
     rgb_image_from_image_list,
     point_source_coordinate_properties,
@@ -20,9 +24,14 @@ from slsim.image_simulation import (
     image_plus_poisson_noise_for_list_of_image,
     lens_image,
     lens_image_series,
+    multi_epoch_point_source_images,
 )
+from lenstronomy.Data.pixel_grid import PixelGrid
+from lenstronomy.Data.psf import PSF
+from lenstronomy.ImSim.Numerics.point_source_rendering import PointSourceRendering
 from slsim.Sources.source import Source
 from slsim.Deflectors.deflector import Deflector
+from slsim.Util.stamp_cache import StampCache
 import pytest
 
 
@@ -89,6 +98,156 @@ class TestImageSimulation(object):
 
         assert len(image) == 100
 
+    def test_multi_band_extended_images(self):
+        band_list = ["g", "r", "i"]
+        images = multi_band_extended_images(
+            lens_class=self.gg_lens,
+            band_list=band_list,
+            mag_zero_point=[27, 28, 29],
+            delta_pix=0.1,
+            num_pix=50,
+        )
+        assert images.shape == (3, 50, 50)
+        for image, band, mag_zero_point in zip(images, band_list, [27, 28, 29]):
+            image_band = sharp_image(
+                lens_class=self.gg_lens,
+                band=band,
+                mag_zero_point=mag_zero_point,
+                delta_pix=0.1,
+                num_pix=50,
+            )
+            npt.assert_almost_equal(image, image_band, decimal=10)
+        images_source = multi_band_extended_images(
+            self.gg_lens, band_list, 27, 0.1, 50, with_deflector=False
+        )
+        images_deflector = multi_band_extended_images(
+            self.gg_lens, band_list, 27, 0.1, 50, with_source=False
+        )
+        npt.assert_almost_equal(
+            images_source + images_deflector,
+            multi_band_extended_images(self.gg_lens, band_list, 27, 0.1, 50),
+            decimal=10,
+        )
+
+    def test_sharp_image_adaptive_supersampling(self):
+        # the source of self.gg_lens is not resolved at the pixel scale, such that
+        # a resolved source is used here
+        np.random.seed(1)
+        source_dict = self.source_dict.copy()
+        source_dict["angular_size"] = 0.2
+        source = Source(
+            source_dict=source_dict,
+            cosmo=FlatLambdaCDM(H0=70, Om0=0.3),
+            source_type="extended",
+            extendedsource_type="single_sersic",
+        )
+        lens = Lens(
+            source_class=source,
+            deflector_class=self.deflector,
+            cosmo=FlatLambdaCDM(H0=70, Om0=0.3),
+        )
+        image = sharp_image(
+            lens_class=lens,
+            band="g",
+            mag_zero_point=30,
+            delta_pix=0.05,
+            num_pix=100,
+        )
+        image_adaptive = sharp_image(
+            lens_class=lens,
+            band="g",
+            mag_zero_point=30,
+            delta_pix=0.05,
+            num_pix=100,
+            supersampling_tolerance=1e-4,
+        )
+        npt.assert_allclose(image_adaptive, image, rtol=0, atol=1e-3 * np.max(image))
+
+    def test_sharp_image_adaptive_supersampling_unresolved(self):
+        # the source of self.gg_lens is not resolved at the pixel scale and is
+        # supersampled around its lensed images
+        kwargs_image = {
+            "lens_class": self.gg_lens,
+            "band": "g",
+            "mag_zero_point": 30,
+            "delta_pix": 0.05,
+            "num_pix": 100,
+        }
+        for with_deflector in [True, False]:
+            image = sharp_image(with_deflector=with_deflector, **kwargs_image)
+            image_adaptive = sharp_image(
+                with_deflector=with_deflector,
+                supersampling_tolerance=1e-4,
+                **kwargs_image,
+            )
+            npt.assert_allclose(np.sum(image_adaptive), np.sum(image), rtol=1e-3)
+            npt.assert_allclose(
+                image_adaptive, image, rtol=0, atol=1e-3 * np.max(image)
+            )
+        mask = compact_light_mask(self.gg_lens, 0.05, 100, with_deflector=False)
+        assert 0 < np.sum(mask) < 100**2
+
+    def test_sharp_image_stamp_cache(self, tmp_path):
+        stamp_cache = StampCache(directory=str(tmp_path))
+        kwargs_image = {
+            "lens_class": self.gg_lens,
+            "mag_zero_point": 27,
+            "delta_pix": 0.1,
+            "num_pix": 50,
+        }
+        image = sharp_image(band="g", **kwargs_image)
+        image_cached = sharp_image(band="g", stamp_cache=stamp_cache, **kwargs_image)
+        npt.assert_array_equal(image_cached, image)
+        assert len(stamp_cache) == 1
+        # the cached band is reused and only the other bands are rendered
+        images = multi_band_extended_images(
+            band_list=["r", "g"], stamp_cache=stamp_cache, **kwargs_image
+        )
+        assert len(stamp_cache) == 2
+        npt.assert_array_equal(images[1], image)
+        npt.assert_array_equal(
+            images, multi_band_extended_images(band_list=["r", "g"], **kwargs_image)
+        )
+        # different rendering options are cached separately
+        sharp_image(
+            band="g", with_deflector=False, stamp_cache=stamp_cache, **kwargs_image
+        )
+        assert len(stamp_cache) == 3
+        # the on-disk stamps are used by a new cache
+        image_disk = sharp_image(
+            band="g",
+            stamp_cache=StampCache(directory=str(tmp_path)),
+            dtype=np.float32,
+            **kwargs_image,
+        )
+        assert image_disk.dtype == np.float32
+        npt.assert_allclose(image_disk, image, rtol=1e-6, atol=1e-6 * np.max(image))
+
+    def test_simulate_images(self):
+        lens_class_list = [self.gg_lens, self.gg_lens]
+        images = simulate_images(
+            lens_class_list=lens_class_list,
+            band_list=["g", "r", "i"],
+            num_pix=40,
+            add_noise=False,
+        )
+        assert images.shape == (2, 3, 40, 40)
+        for j, band in enumerate(["g", "r", "i"]):
+            image = simulate_image(
+                lens_class=self.gg_lens, band=band, num_pix=40, add_noise=False
+            )
+            npt.assert_almost_equal(images[0, j], image, decimal=8)
+            npt.assert_almost_equal(images[1, j], image, decimal=8)
+
+        # the noise realizations follow the order of the images
+        np.random.seed(1)
+        images = simulate_images(
+            lens_class_list=lens_class_list, band_list=["g", "r"], num_pix=40
+        )
+        np.random.seed(1)
+        image = simulate_image(lens_class=self.gg_lens, band="g", num_pix=40)
+        npt.assert_almost_equal(images[0, 0], image, decimal=8)
+
     def test_sharp_image(self):
         image = sharp_image(
             lens_class=self.gg_lens,
@@ -209,7 +368,7 @@ def pes_lens_instance():
             source_type="point_plus_extended",
             pointsource_type="quasar",
             extendedsource_type="single_sersic",
-            **kwargs_quasar
+            **kwargs_quasar,
         )
         deflector = Deflector(
             deflector_type="EPL",
@@ -326,7 +485,19 @@ def test_point_source_image_with_and_without_variability(pes_lens_instance):
 
     assert result1.shape[0] == 101
     assert result2.shape[0] == 101
-    assert len(result3) == len(t_obs)
+    assert result3.shape == (len(t_obs), 101, 101)
+    for image, time in zip(result3, t_obs):
+        image_at_time = point_source_image_at_time(
+            lens_class=lens_class,
+            band="i",
+            mag_zero_point=27,
+            delta_pix=0.2,
+            num_pix=101,
+            psf_kernel=psf_kernel_single,
+            transform_pix2angle=transf_matrix,
+            time=time,
+        )
+        npt.assert_allclose(image, image_at_time, rtol=1e-10, atol=1e-14)
 
 
 def test_deflector_images_with_different_zeropoint(pes_lens_instance):
@@ -402,6 +573,268 @@ def test_deflector_images_with_different_zeropoint(pes_lens_instance):
     assert np.any(residual != 0)
 
 
+def test_supersampling_mask():
+    x, y = np.meshgrid(np.arange(21) - 10, np.arange(21) - 10)
+    image = np.exp(-(x**2 + y**2) / 2.0)
+    mask = supersampling_mask(image, tolerance=1e-2)
+    assert mask.shape == (21, 21)
+    # the peak is supersampled and the flat outskirts are not
+    assert mask[10, 10]
+    assert not mask[0, 0]
+    mask_stack = supersampling_mask([image, np.zeros((21, 21))], tolerance=1e-2)
+    npt.assert_array_equal(mask_stack, mask)
+    assert np.sum(supersampling_mask(image, tolerance=1e-4)) > np.sum(mask)
+
+
+def test_multi_epoch_point_source_images():
+    path = os.path.dirname(__file__)
+    psf_kernel = np.load(os.path.join(path, "TestData/psf_kernels_for_image_1.npy"))
+    psf_kernels = [np.roll(psf_kernel, i, axis=1) for i in range(3)]
+    transform_matrices = [
+        np.array([[0.2, 0], [0, 0.2]]),
+        np.array([[0.2, 0.02], [-0.02, 0.2]]),
+        np.array([[0.2, 0], [0, 0.2]]),
+    ]
+    # images at sub-pixel positions, partially outside and outside of the image
+    ra_image = np.array([0.13, -1.27, 3.35, 8.0])
+    dec_image = np.array([0.41, 0.9, -3.1, 8.0])
+    magnitudes = np.array(
+        [[21, 22, 23, 20], [21.5, 22.5, np.inf, 20], [22, 23, 24, 20]], dtype=float
+    )
+    mag_zero_points = np.array([27, 27.5, 28])
+    images = multi_epoch_point_source_images(
+        ra_image,
+        dec_image,
+        magnitudes=magnitudes,
+        mag_zero_points=mag_zero_points,
+        psf_kernels=psf_kernels,
+        num_pix=33,
+        transform_pix2angle=transform_matrices,
+    )
+    assert images.shape == (3, 33, 33)
+    for image, mag, mag_zero_point, kernel, transform in zip(
+        images, magnitudes, mag_zero_points, psf_kernels, transform_matrices
+    ):
+        pixel_grid = PixelGrid(
+            33, 33, **centered_coordinate_system(33, transform_pix2angle=transform)
+        )
+        rendering = PointSourceRendering(
+            pixel_grid=pixel_grid,
+            supersampling_factor=1,
+            psf=PSF(psf_type="PIXEL", kernel_point_source=kernel),
+        )
+        image_lenstronomy = rendering.point_source_rendering(
+            ra_image, dec_image, 10 ** (-0.4 * (mag - mag_zero_point))
+        )
+        npt.assert_allclose(image, image_lenstronomy, rtol=1e-10, atol=1e-14)
+
+    # one kernel and transformation matrix for all exposures
+    images = multi_epoch_point_source_images(
+        ra_image,
+        dec_image,
+        magnitudes=magnitudes,
+        mag_zero_points=27,
+        psf_kernels=psf_kernel,
+        num_pix=33,
+        transform_pix2angle=transform_matrices[0],
+    )
+    npt.assert_allclose(
+        images[2] * 10 ** (0.4 * 1), images[0] * 10 ** (0.4 * 0), rtol=1e-10
+    )
+    # the exposures rendered in batches
+    images_batches = multi_epoch_point_source_images(
+        ra_image,
+        dec_image,
+        magnitudes=magnitudes,
+        mag_zero_points=mag_zero_points,
+        psf_kernels=psf_kernels,
+        num_pix=33,
+        transform_pix2angle=transform_matrices,
+        dtype=np.float32,
+        max_epochs_per_batch=2,
+    )
+    assert images_batches.dtype == np.float32
+    npt.assert_allclose(
+        images_batches,
+        multi_epoch_point_source_images(
+            ra_image,
+            dec_image,
+            magnitudes,
+            mag_zero_points,
+            psf_kernels,
+            33,
+            transform_matrices,
+        ),
+        rtol=1e-6,
+        atol=1e-12,
+    )
+    with npt.assert_raises(ValueError):
+        multi_epoch_point_source_images(
+            ra_image, dec_image, magnitudes, 27, np.ones((4, 4)), 33, transform
+        )
+
+
+def test_lens_image_series_static_scene(pes_lens_instance):
+    path = os.path.dirname(__file__)
+    psf_kernel = np.load(os.path.join(path, "TestData/psf_kernels_for_image_1.npy"))
+    psf_kernel_2 = np.roll(psf_kernel, 1, axis=0)
+    psf_kernels = [psf_kernel, psf_kernel_2, psf_kernel, psf_kernel]
+    bands = ["i", "i", "r", "i"]
+    mag_zero_points = np.array([27, 28, 27.5, 27])
+    transf_matrix = np.array([[0.2, 0], [0, 0.2]])
+    t_obs = np.array([10, 20, 30, 40])
+    # the static scene is rendered once per band and convolved once per kernel
+    image_series = lens_image_series(
+        lens_class=pes_lens_instance,
+        band=bands,
+        mag_zero_point=mag_zero_points,
+        num_pix=64,
+        psf_kernel=psf_kernels,
+        transform_pix2angle=np.array([transf_matrix] * 4),
+        exposure_time=[None] * 4,
+        t_obs=t_obs,
+    )
+    for image, band, mag_zero_point, psf, time in zip(
+        image_series, bands, mag_zero_points, psf_kernels, t_obs
+    ):
+        image_epoch = lens_image(
+            lens_class=pes_lens_instance,
+            band=band,
+            mag_zero_point=mag_zero_point,
+            num_pix=64,
+            psf_kernel=psf,
+            transform_pix2angle=transf_matrix,
+            t_obs=time,
+        )
+        npt.assert_allclose(image, image_epoch, rtol=1e-10, atol=1e-12)
+
+
+def test_float32_images(pes_lens_instance):
+    path = os.path.dirname(__file__)
+    psf_kernel = np.load(os.path.join(path, "TestData/psf_kernels_for_image_1.npy"))
+    transf_matrix = np.array([[0.2, 0], [0, 0.2]])
+    kwargs_image = {
+        "lens_class": pes_lens_instance,
+        "band": "i",
+        "mag_zero_point": 27,
+        "num_pix": 64,
+        "psf_kernel": psf_kernel,
+        "transform_pix2angle": transf_matrix,
+    }
+    image = lens_image(t_obs=10, **kwargs_image)
+    image_32 = lens_image(t_obs=10, dtype=np.float32, **kwargs_image)
+    assert image.dtype == np.float64
+    assert image_32.dtype == np.float32
+    npt.assert_allclose(image_32, image, rtol=1e-6, atol=1e-6 * np.max(image))
+
+    ps_image = point_source_image_without_variability(
+        delta_pix=0.2, dtype=np.float32, **kwargs_image
+    )
+    assert ps_image.dtype == np.float32
+    deflector_image = sharp_image(
+        lens_class=pes_lens_instance,
+        band="i",
+        mag_zero_point=27,
+        delta_pix=0.2,
+        num_pix=64,
+        dtype=np.float32,
+    )
+    assert deflector_image.dtype == np.float32
+
+    image_series = lens_image_series(
+        lens_class=pes_lens_instance,
+        band="i",
+        mag_zero_point=[27, 28],
+        num_pix=64,
+        psf_kernel=[psf_kernel, psf_kernel],
+        transform_pix2angle=[transf_matrix, transf_matrix],
+        exposure_time=[30, 30],
+        t_obs=[10, 20],
+        dtype=np.float32,
+    )
+    for image_epoch in image_series:
+        assert image_epoch.dtype == np.float32
+
+
+def test_lens_image_noise_seed(pes_lens_instance):
+    path = os.path.dirname(__file__)
+    psf_kernel = np.load(os.path.join(path, "TestData/psf_kernels_for_image_1.npy"))
+    transf_matrix = np.array([[0.2, 0], [0, 0.2]])
+    kwargs_series = {
+        "lens_class": pes_lens_instance,
+        "band": ["i", "r", "i"],
+        "mag_zero_point": [27, 27, 28],
+        "num_pix": 33,
+        "psf_kernel": [psf_kernel] * 3,
+        "transform_pix2angle": [transf_matrix] * 3,
+        "exposure_time": [30, None, np.full((33, 33), 15.0)],
+        "t_obs": [10, 20, 30],
+        "std_gaussian_noise": 0.1,
+    }
+    image_series = lens_image_series(seed=1, **kwargs_series)
+    npt.assert_array_equal(image_series, lens_image_series(seed=1, **kwargs_series))
+    assert np.any(
+        np.array(image_series) != np.array(lens_image_series(seed=2, **kwargs_series))
+    )
+    image_series_noiseless = lens_image_series(
+        **dict(kwargs_series, exposure_time=None, std_gaussian_noise=None)
+    )
+    # the exposure without exposure time only has gaussian noise
+    npt.assert_allclose(
+        np.std(image_series[1] - image_series_noiseless[1]), 0.1, rtol=0.2
+    )
+    kwargs_image = {
+        "lens_class": pes_lens_instance,
+        "band": "i",
+        "mag_zero_point": 27,
+        "num_pix": 33,
+        "psf_kernel": psf_kernel,
+        "transform_pix2angle": transf_matrix,
+        "exposure_time": 30,
+        "std_gaussian_noise": 0.1,
+    }
+    npt.assert_array_equal(
+        lens_image(seed=3, **kwargs_image), lens_image(seed=3, **kwargs_image)
+    )
+
+
+def test_lens_image_series_out(pes_lens_instance, tmp_path):
+    path = os.path.dirname(__file__)
+    psf_kernel = np.load(os.path.join(path, "TestData/psf_kernels_for_image_1.npy"))
+    transf_matrix = np.array([[0.2, 0], [0, 0.2]])
+    kwargs_series = {
+        "lens_class": pes_lens_instance,
+        "band": ["i", "r", "i"],
+        "mag_zero_point": [27, 27, 28],
+        "num_pix": 33,
+        "psf_kernel": [psf_kernel] * 3,
+        "transform_pix2angle": [transf_matrix] * 3,
+        "exposure_time": [30, None, 15],
+        "t_obs": [10, 20, 30],
+        "std_gaussian_noise": 0.1,
+        "seed": 1,
+    }
+    image_series = lens_image_series(**kwargs_series)
+    out = np.memmap(
+        os.path.join(tmp_path, "series.dat"),
+        dtype=np.float32,
+        mode="w+",
+        shape=(3, 33, 33),
+    )
+    result = lens_image_series(out=out, dtype=np.float32, **kwargs_series)
+    assert result is out
+    npt.assert_allclose(out, image_series, rtol=1e-5, atol=1e-5)
+    with pytest.raises(ValueError):
+        lens_image_series(out=np.empty((2, 33, 33)), **kwargs_series)
+
+    # the noiseless images are accumulated in double precision and cast once
+    kwargs_series.update({"exposure_time": None, "std_gaussian_noise": None})
+    noiseless_series = lens_image_series(**kwargs_series)
+    noiseless_series_32 = lens_image_series(dtype=np.float32, **kwargs_series)
+    assert noiseless_series_32.dtype == np.float32
+    npt.assert_array_equal(noiseless_series_32, noiseless_series.astype(np.float32))
+
+
 class TestMultiSourceImageSimulation(object):
     def setup_method(self):
         self.cosmo = FlatLambdaCDM(H0=70, Om0=0.3)
@@ -459,7 +892,7 @@ class TestMultiSourceImageSimulation(object):
             source_type="point_plus_extended",
             pointsource_type="supernova",
             extendedsource_type="double_sersic",
-            **kwargs_sn
+            **kwargs_sn,
         )
         self.source2 = Source(
             source_dict=source_dict2,
@@ -467,7 +900,7 @@ class TestMultiSourceImageSimulation(object):
             source_type="point_plus_extended",
             pointsource_type="supernova",
             extendedsource_type="double_sersic",
-            **kwargs_sn
+            **kwargs_sn,
         )
         self.deflector = Deflector(
             deflector_type="EPL",
@@ -1,4 +1,5 @@
 import copy
+import pickle
 
 import pytest
 import numpy as np
@@ -8,8 +9,12 @@ from astropy.table import Table
 from slsim.lens import (
     Lens,
     image_separation_from_positions,
+    isothermal_caustic,
+    isothermal_multiple_image_radius,
     theta_e_when_source_infinity,
 )
+from lenstronomy.LensModel.lens_model import LensModel
+from lenstronomy.LensModel.Solver.lens_equation_solver import LensEquationSolver
 from slsim.LOS.los_individual import LOSIndividual
 from slsim.LOS.los_pop import LOSPop
 from slsim.Sources.source import Source
@@ -181,6 +186,84 @@ class TestLens(object):
         )
         assert image_separation < 2 * theta_E_infinity
 
+    def test_validity_rejection_stage(self):
+        assert self.gg_lens.validity_rejection_stage == [None]
+        cosmo = FlatLambdaCDM(H0=70, Om0=0.3)
+        theta_E = self.gg_lens.einstein_radius[0]
+        lens = Lens(
+            source_class=self.source,
+            deflector_class=self.deflector,
+            los_class=self.los_individual,
+            cosmo=cosmo,
+        )
+        assert lens.validity_rejection_stage == [None]
+        assert lens.validity_test(max_image_separation=theta_E) is False
+        assert lens.validity_rejection_stage == ["einstein_radius"]
+
+        # source within sqrt(2) theta_E but outside of the caustic and cut
+        lens_model_list, kwargs_lens = lens.deflector_mass_model_lenstronomy()
+        assert lens_model_list == ["SIE", "SHEAR", "CONVERGENCE"]
+        kappa = kwargs_lens[2]["kappa"]
+        gamma1, gamma2 = kwargs_lens[1]["gamma1"], kwargs_lens[1]["gamma2"]
+        radius = isothermal_multiple_image_radius(
+            kwargs_lens[0]["theta_E"],
+            kwargs_lens[0]["e1"],
+            kwargs_lens[0]["e2"],
+            gamma1=gamma1,
+            gamma2=gamma2,
+            kappa=kappa,
+        )
+        assert radius < np.sqrt(2) * theta_E
+        center_x, center_y = lens.deflector_position
+        source = copy.deepcopy(self.source)
+        source.update_center(
+            center_x=(1 - kappa - gamma1) * center_x
+            - gamma2 * center_y
+            + (radius + np.sqrt(2) * theta_E) / 2,
+            center_y=(1 - kappa + gamma1) * center_y - gamma2 * center_x,
+        )
+        lens = Lens(
+            source_class=source,
+            deflector_class=self.deflector,
+            los_class=self.los_individual,
+            cosmo=cosmo,
+        )
+        assert lens.validity_test() is False
+        assert lens.validity_rejection_stage == ["caustic"]
+        assert len(lens.extended_source_image_positions()[0][0]) == 1
+
+        source.update_center(center_x=center_x + 2 * theta_E, center_y=center_y)
+        lens = Lens(
+            source_class=source,
+            deflector_class=self.deflector,
+            los_class=self.los_individual,
+            cosmo=cosmo,
+        )
+        assert lens.validity_test() is False
+        assert lens.validity_rejection_stage == ["source_position"]
+
+    def test_lens_model_cache(self):
+        lens = copy.deepcopy(self.gg_lens)
+        source = lens.source(0)
+        lens_model = lens._lens_model_instance(source)
+        assert lens._lens_model_instance(source) is lens_model
+        solver = lens._lens_equation_solver_instance(source)
+        assert lens._lens_equation_solver_instance(source) is solver
+        assert solver.lensModel is lens_model
+        theta_E = lens.einstein_radius[0]
+
+        # the instances are rebuilt with the mass model
+        del lens._kwargs_lens
+        lens.deflector_mass_model_lenstronomy()
+        assert lens._lens_model_instance(source) is not lens_model
+        npt.assert_almost_equal(lens._einstein_radius(source), theta_E)
+
+        # the instances are not pickled with the lens
+        lens_copy = pickle.loads(pickle.dumps(lens))
+        assert lens_copy._lens_model_cache == {}
+        npt.assert_almost_equal(lens_copy._einstein_radius(source), theta_E)
+        assert len(lens_copy.extended_source_image_positions()[0][0]) >= 2
+
     def test_theta_e_when_source_infinity(self):
         theta_E_infinity = theta_e_when_source_infinity(
             deflector_dict=self.deflector_dict
@@ -192,6 +275,47 @@ class TestLens(object):
         host_mag = self.gg_lens.extended_source_magnification()[0]
         assert host_mag > 0
 
+        # the magnification is memoized and the ray-shooting grid is released
+        lens = copy.deepcopy(self.gg_lens)
+        source = lens.source(0)
+        del lens._kwargs_lens
+        host_mag_ = lens._extended_single_source_magnification(source, 0)
+        npt.assert_almost_equal(host_mag_, host_mag)
+        assert lens._extended_source_magnification_cache == {0: host_mag_}
+        assert len(lens._deflection_field()._grids) == 0
+        assert lens._extended_source_magnitude("g", source, 0, lensed=True) == (
+            source.extended_source_magnitude("g") - 2.5 * np.log10(host_mag_)
+        )
+
+    def test_extended_source_magnification_shared_grid(self, monkeypatch):
+        source2 = copy.deepcopy(self.source)
+        center = self.source.extended_source_position()
+        source2.update_center(center[0] + 0.3, center[1] - 0.2)
+        lens = Lens(
+            source_class=[self.source, source2],
+            deflector_class=self.deflector,
+            los_class=self.los_individual,
+            cosmo=self.gg_lens.cosmo,
+        )
+        for source in [self.source, source2]:
+            lens._einstein_radius(source)
+        lens_model = lens._deflection_field()._lens_model
+        alpha = lens_model.alpha
+        num_alpha_calls = []
+
+        def alpha_counted(x, y, kwargs):
+            num_alpha_calls.append(len(x))
+            return alpha(x, y, kwargs)
+
+        # the two sources are ray-shot on one grid of the deflector
+        monkeypatch.setattr(lens_model, "alpha", alpha_counted)
+        host_mag = lens.extended_source_magnification()
+        assert len(num_alpha_calls) == 1
+        npt.assert_allclose(
+            host_mag[0], self.gg_lens.extended_source_magnification()[0], rtol=0.01
+        )
+        assert host_mag[1] > 0
+
     def test_deflector_stellar_mass(self):
         s_mass = self.gg_lens.deflector_stellar_mass()
         assert s_mass >= 10**5
@@ -367,6 +491,40 @@ class TestLens(object):
         assert 2 <= len(mag_ratios) <= 4
 
 
+def test_isothermal_multiple_image_radius():
+    # the tangential caustic of a singular isothermal sphere is a point and its
+    # cut is the circle of radius theta_E
+    npt.assert_almost_equal(
+        isothermal_multiple_image_radius(theta_E=1.2, e1=0, e2=0), 1.01 * 1.2
+    )
+    assert isothermal_multiple_image_radius(theta_E=1, e1=0, e2=0, kappa=1) == np.inf
+    caustic_x, caustic_y, cut_x, cut_y = isothermal_caustic(
+        theta_E=1.2, e1=0, e2=0, num_points=10
+    )
+    npt.assert_almost_equal(np.hypot(caustic_x, caustic_y), 0, decimal=4)
+    npt.assert_almost_equal(np.hypot(cut_x, cut_y), 1.2, decimal=4)
+    assert isothermal_caustic(theta_E=1, e1=0, e2=0, gamma1=1) is None
+
+    kwargs_lens = [
+        {"theta_E": 1, "e1": 0.2, "e2": -0.1, "center_x": 0, "center_y": 0},
+        {"gamma1": 0.1, "gamma2": 0.05, "ra_0": 0, "dec_0": 0},
+        {"kappa": 0.05, "ra_0": 0, "dec_0": 0},
+    ]
+    radius = isothermal_multiple_image_radius(
+        theta_E=1, e1=0.2, e2=-0.1, gamma1=0.1, gamma2=0.05, kappa=0.05
+    )
+    solver = LensEquationSolver(LensModel(["SIE", "SHEAR", "CONVERGENCE"]))
+    for phi in np.linspace(0, 2 * np.pi, 12, endpoint=False):
+        x_image, _ = solver.image_position_from_source(
+            radius * np.cos(phi),
+            radius * np.sin(phi),
+            kwargs_lens,
+            solver="analytical",
+            magnification_limit=0,
+        )
+        assert len(x_image) == 1
+
+
 @pytest.fixture
 def pes_lens_instance():
     path = os.path.dirname(__file__)
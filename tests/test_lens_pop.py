@@ -1,18 +1,27 @@
 import os
+import copy
+import functools
 import pytest
 import slsim
 import pickle
+from concurrent.futures import ThreadPoolExecutor
 
 import numpy as np
 import slsim.Sources as sources
 import slsim.Pipelines as pipelines
 import slsim.Deflectors as deflectors
+import slsim.Deflectors.elliptical_lens_galaxies as elliptical_lens_galaxies
+import slsim.lens_pop as lens_pop_module
+import numpy.testing as npt
 
 from astropy.units import Quantity
 from astropy.table import Table
 from astropy.cosmology import FlatLambdaCDM
-from slsim.lens_pop import LensPop
+from slsim.lens_pop import LensPop, _PopulationChunkDrawer
+from slsim.Deflectors.deflector import Deflector
 from slsim.lens_pop import draw_test_area
+from slsim.lens import VALIDITY_TEST_STAGES
+from slsim.Util.population_io import lens_catalog_rows, read_lens_population
 
 sky_area = Quantity(value=0.05, unit="deg2")
 galaxy_simulation_pipeline = pipelines.SkyPyPipeline(
@@ -22,8 +31,10 @@ galaxy_simulation_pipeline = pipelines.SkyPyPipeline(
 )
 
 
-def create_lens_pop_instance(return_kext=False):
+def create_lens_pop_instance(return_kext=False, pipeline=None):
 
+    if pipeline is None:
+        pipeline = galaxy_simulation_pipeline
     cosmo = FlatLambdaCDM(H0=70, Om0=0.3)
     sky_area = Quantity(value=0.05, unit="deg2")
 
@@ -31,7 +42,7 @@ def create_lens_pop_instance(return_kext=False):
     kwargs_source_cut = {"band": "g", "band_max": 28, "z_min": 0.1, "z_max": 5.0}
 
     lens_galaxies = deflectors.EllipticalLensGalaxies(
-        galaxy_list=galaxy_simulation_pipeline.red_galaxies,
+        galaxy_list=pipeline.red_galaxies,
         kwargs_cut=kwargs_deflector_cut,
         kwargs_mass2light={},
         cosmo=cosmo,
@@ -40,7 +51,7 @@ def create_lens_pop_instance(return_kext=False):
 
     kwargs = {"extendedsource_type": "single_sersic"}
     source_galaxies = sources.Galaxies(
-        galaxy_list=galaxy_simulation_pipeline.blue_galaxies,
+        galaxy_list=pipeline.blue_galaxies,
         kwargs_cut=kwargs_source_cut,
         cosmo=cosmo,
         sky_area=sky_area,
@@ -73,6 +84,323 @@ def test_draw_population(gg_lens_pop_instance):
     assert len(lens_population2) <= 40
 
 
+def test_draw_population_batched(gg_lens_pop_instance):
+    lens_pop = gg_lens_pop_instance
+    kwargs_lens_cuts = {"min_image_separation": 0.2, "max_image_separation": 10}
+    lens_population = lens_pop.draw_population(
+        kwargs_lens_cuts, multi_source=True, batched=True, batch_size=200
+    )
+    lens_population2 = lens_pop.draw_population(
+        kwargs_lens_cuts, multi_source=False, batched=True
+    )
+    assert len(lens_population) <= 40
+    assert len(lens_population2) <= 40
+    for lens in lens_population + lens_population2:
+        assert lens.deflector_redshift < min(lens.source_redshift_list)
+        for theta_e in lens.einstein_radius:
+            assert 0.2 <= 2 * theta_e <= 10
+
+
+def test_draw_population_importance_sampling_unbiased():
+    # the sums of the importance weights estimate the numbers of lenses drawn
+    # with uniform source positions, on a fixed galaxy catalog
+    np.random.seed(42)
+    pipeline = pipelines.SkyPyPipeline(
+        skypy_config=None, sky_area=sky_area, filters=None
+    )
+    lens_pop = create_lens_pop_instance(pipeline=pipeline)
+    num_uniform = 0
+    sum_weights = 0
+    for seed in range(20):
+        num_uniform += len(lens_pop.draw_population({}, batched=True, seed=seed))
+        lens_population = lens_pop.draw_population(
+            {}, batched=True, seed=seed, importance_sampling=0.2
+        )
+        sum_weights += sum(lens.importance_weight for lens in lens_population)
+    assert num_uniform > 50
+    npt.assert_allclose(sum_weights, num_uniform, rtol=0.15)
+
+
+def test_draw_population_batched_not_sis_normalized(monkeypatch):
+    # deflectors with a given Einstein radius, which differs from the SIS Einstein
+    # radius of their velocity dispersion
+    def deflector_with_einstein_radius(deflector_type, deflector_dict):
+        deflector_dict = {
+            name: deflector_dict[name] for name in deflector_dict.colnames
+        }
+        deflector_dict["theta_E"] = 1.5
+        return Deflector(deflector_type=deflector_type, deflector_dict=deflector_dict)
+
+    monkeypatch.setattr(
+        elliptical_lens_galaxies, "Deflector", deflector_with_einstein_radius
+    )
+    lens_pop = create_lens_pop_instance()
+    assert not lens_pop._lens_galaxies.draw_deflector().sis_normalized
+    kwargs_lens_cuts = {}
+    num_lenses_batched, num_lenses = 0, 0
+    for seed in range(4):
+        lens_population = lens_pop.draw_population(
+            kwargs_lens_cuts, batched=True, seed=seed
+        )
+        num_lenses_batched += len(lens_population)
+        num_lenses += len(lens_pop.draw_population(kwargs_lens_cuts, seed=seed))
+    for lens in lens_population:
+        # the given Einstein radius with the external convergence
+        gamma = lens.deflector.halo_properties
+        npt.assert_allclose(
+            lens.einstein_radius[0],
+            1.5 / (1 - lens.external_convergence) ** (1.0 / (gamma - 1)),
+        )
+    npt.assert_allclose(num_lenses_batched, num_lenses, rtol=0.15)
+
+    # deflectors not using the SIS convention
+    monkeypatch.setattr(
+        elliptical_lens_galaxies,
+        "Deflector",
+        functools.partial(Deflector, sis_convention=False),
+    )
+    lens_pop = create_lens_pop_instance()
+    assert not lens_pop._lens_galaxies.draw_deflector().sis_normalized
+    with pytest.raises(ValueError):
+        lens_pop.draw_population(
+            kwargs_lens_cuts, batched=True, seed=1, importance_sampling=0.5
+        )
+
+
+def test_draw_population_seed(gg_lens_pop_instance):
+    lens_pop = gg_lens_pop_instance
+    kwargs_lens_cuts = {}
+
+    def summary(lens_population):
+        return [
+            (lens.deflector_redshift, lens.source_redshift_list, lens.einstein_radius)
+            for lens in lens_population
+        ]
+
+    np.random.seed(1)
+    lens_population = lens_pop.draw_population(
+        kwargs_lens_cuts, batched=True, batch_size=400, seed=10
+    )
+    random_draw = np.random.random()
+    lens_population_2 = lens_pop.draw_population(
+        kwargs_lens_cuts, batched=True, batch_size=400, seed=10, n_workers=2
+    )
+    np.random.seed(1)
+    # the global random state is not altered by a seeded draw
+    assert np.random.random() == random_draw
+    assert summary(lens_population) == summary(lens_population_2)
+    lens_population_3 = lens_pop.draw_population(
+        kwargs_lens_cuts, batch_size=400, seed=10, n_workers=2
+    )
+    lens_population_4 = lens_pop.draw_population(
+        kwargs_lens_cuts, batch_size=400, seed=10
+    )
+    assert summary(lens_population_3) == summary(lens_population_4)
+    lens_population_5 = list(
+        lens_pop.iter_population(
+            kwargs_lens_cuts, batched=True, batch_size=400, seed=10, n_workers=2
+        )
+    )
+    assert summary(lens_population) == summary(lens_population_5)
+
+
+def test_population_chunk_drawer(gg_lens_pop_instance):
+    lens_pop = copy.deepcopy(gg_lens_pop_instance)
+    draw_chunk = _PopulationChunkDrawer(lens_pop)
+    kwargs_draw = {"kwargs_lens_cuts": {}, "batched": True, "batch_size": 400}
+    seed_sequences = np.random.SeedSequence(5).spawn(2)
+    lens_list, counts = draw_chunk(400, seed_sequences[0], kwargs_draw)
+    draw_chunk(400, seed_sequences[1], kwargs_draw)
+    # the chunks drawn before do not change the catalogs of the populations
+    lens_list_2, counts_2 = draw_chunk(400, seed_sequences[0], kwargs_draw)
+    assert counts_2 == counts
+    assert len(lens_list_2) == len(lens_list)
+    for lens, lens_2 in zip(lens_list, lens_list_2):
+        assert lens.deflector_redshift == lens_2.deflector_redshift
+        npt.assert_array_equal(
+            lens.deflector_ellipticity(), lens_2.deflector_ellipticity()
+        )
+        npt.assert_array_equal(lens.einstein_radius, lens_2.einstein_radius)
+
+    # threads would share the global random state of the seeded chunks
+    with ThreadPoolExecutor(2) as executor:
+        with pytest.raises(ValueError):
+            lens_pop.draw_population({}, batched=True, seed=1, executor=executor)
+
+
+def test_draw_population_checkpoint(gg_lens_pop_instance, tmp_path, monkeypatch):
+    lens_pop = gg_lens_pop_instance
+    kwargs_lens_cuts = {}
+    kwargs_draw = {"batched": True, "batch_size": 300}
+    checkpoint = os.path.join(tmp_path, "checkpoint.pkl")
+
+    def summary(lens_population):
+        return [
+            (lens.deflector_redshift, lens.source_redshift_list, lens.einstein_radius)
+            for lens in lens_population
+        ]
+
+    lens_population = lens_pop.draw_population(kwargs_lens_cuts, seed=4, **kwargs_draw)
+
+    # interrupt the draw after two chunks of deflectors
+    draw_population_chunk = LensPop._draw_population_chunk
+    num_calls = []
+
+    def interrupted_draw_population_chunk(self, *args, **kwargs):
+        if len(num_calls) == 2:
+            raise KeyboardInterrupt
+        num_calls.append(1)
+        return draw_population_chunk(self, *args, **kwargs)
+
+    monkeypatch.setattr(
+        LensPop, "_draw_population_chunk", interrupted_draw_population_chunk
+    )
+    with pytest.raises(KeyboardInterrupt):
+        lens_pop.draw_population(
+            kwargs_lens_cuts, seed=4, checkpoint=checkpoint, **kwargs_draw
+        )
+    monkeypatch.undo()
+    with open(checkpoint, "rb") as f:
+        state = pickle.load(f)
+    assert state["num_chunks_done"] == 2
+    assert state["num_deflectors_done"] == 600
+
+    lens_population_2 = lens_pop.draw_population(
+        kwargs_lens_cuts, resume_from=checkpoint, **kwargs_draw
+    )
+    assert summary(lens_population) == summary(lens_population_2)
+    with pytest.raises(ValueError):
+        lens_pop.draw_population(
+            kwargs_lens_cuts, resume_from=checkpoint, batched=True, batch_size=200
+        )
+
+
+def test_validity_rejection_counts():
+    lens_pop = create_lens_pop_instance()
+    kwargs_lens_cuts = {}
+    lens_population = lens_pop.draw_population(
+        kwargs_lens_cuts, batched=True, batch_size=400, seed=2
+    )
+    counts = lens_pop.validity_rejection_counts
+    assert counts["accepted"] == len(lens_population)
+    assert set(counts) <= set(VALIDITY_TEST_STAGES) | {"accepted"}
+    assert counts["source_position"] > 0
+
+    # the counts of the chunks drawn in parallel are collected
+    lens_pop.draw_population(
+        kwargs_lens_cuts, batched=True, batch_size=400, seed=2, n_workers=2
+    )
+    assert lens_pop.validity_rejection_counts == {
+        stage: 2 * count for stage, count in counts.items()
+    }
+
+    lens_pop_3 = create_lens_pop_instance()
+    lens_population_3 = lens_pop_3.draw_population(kwargs_lens_cuts)
+    counts_3 = lens_pop_3.validity_rejection_counts
+    assert counts_3.get("accepted", 0) == len(lens_population_3)
+    assert "redshift" not in counts_3
+
+
+def test_draw_population_importance_sampling(gg_lens_pop_instance):
+    lens_pop = gg_lens_pop_instance
+    kwargs_lens_cuts = {}
+    with pytest.raises(ValueError):
+        lens_pop.draw_population(kwargs_lens_cuts, importance_sampling=0.5)
+    with pytest.raises(ValueError):
+        lens_pop.draw_population(kwargs_lens_cuts, batched=True, importance_sampling=1)
+    lens_population = lens_pop.draw_population(
+        kwargs_lens_cuts, batched=True, seed=1, importance_sampling=0.5
+    )
+    importance_weight = np.array([lens.importance_weight for lens in lens_population])
+    # the source positions are concentrated within the caustics, where the weights
+    # are smaller than 1
+    assert len(lens_population) > 40
+    assert np.all(importance_weight > 0)
+    assert np.min(importance_weight) < 1
+    assert np.sum(importance_weight) <= 40
+    assert max(lens.image_number[0] for lens in lens_population) == 4
+
+
+def test_iter_population(gg_lens_pop_instance, tmp_path):
+    lens_pop = gg_lens_pop_instance
+    kwargs_lens_cuts = {}
+    lens_iterator = lens_pop.iter_population(kwargs_lens_cuts, batched=True)
+    lens = next(lens_iterator)
+    assert lens.deflector_redshift < lens.source_redshift_list[0]
+    assert len(list(lens_iterator)) <= 40
+
+    filename = os.path.join(tmp_path, "lenses.h5")
+    num_lenses = lens_pop.write_population(
+        filename, kwargs_lens_cuts, chunk_size=2, bands=["g"], seed=3, batched=True
+    )
+    lens_population = lens_pop.draw_population(kwargs_lens_cuts, seed=3, batched=True)
+    assert num_lenses == len(lens_population)
+    table = read_lens_population(filename)
+    assert len(table) == num_lenses
+    np.testing.assert_allclose(
+        table["z_deflector"], [lens.deflector_redshift for lens in lens_population]
+    )
+    np.testing.assert_array_equal(table["importance_weight"], 1)
+
+
+def test_draw_population_catalog(gg_lens_pop_instance, monkeypatch):
+    lens_pop = gg_lens_pop_instance
+    kwargs_lens_cuts = {"mag_arc_limit": {"g": 26}}
+    lens_population = lens_pop.draw_population(
+        kwargs_lens_cuts, batched=True, batch_size=20, seed=4
+    )
+    validity_counts = dict(lens_pop.validity_rejection_counts)
+
+    # the catalog rows are computed without Lens instances
+    def no_lens(*args, **kwargs):
+        raise AssertionError("Lens instance created")
+
+    with monkeypatch.context() as m:
+        m.setattr(lens_pop_module, "Lens", no_lens)
+        lens_pop._validity_rejection_counts.clear()
+        catalog = lens_pop.draw_population_catalog(
+            kwargs_lens_cuts, bands=["g"], batch_size=20, seed=4
+        )
+    assert dict(lens_pop.validity_rejection_counts) == validity_counts
+    assert len(catalog) == len(lens_population)
+    assert catalog.meta["seed"] == 4
+    np.testing.assert_array_equal(catalog["lens_index"], np.arange(len(catalog)))
+    rows = [
+        row
+        for lens_index, lens in enumerate(lens_population)
+        for row in lens_catalog_rows(
+            lens, lens_index=lens_index, bands=["g"], image_properties=True
+        )
+    ]
+    for name in rows[0]:
+        values = [row[name] for row in rows]
+        if isinstance(values[0], str):
+            assert list(catalog[name]) == values
+        else:
+            npt.assert_allclose(catalog[name], values, rtol=1e-10)
+    assert catalog["x_image"].shape == (len(catalog), 5)
+    assert np.all(catalog["num_images"] >= 2)
+    assert np.all(catalog["mag_source_lensed_g"] < catalog["mag_source_g"])
+    assert catalog.as_array().dtype.names == tuple(catalog.colnames)
+
+    index = [len(catalog) - 1, 0]
+    lenses = lens_pop.lenses_from_catalog(catalog, index=index)
+    for lens, i in zip(lenses, index):
+        assert lens.deflector_redshift == catalog["z_deflector"][i]
+        npt.assert_allclose(lens.einstein_radius[0], catalog["theta_E"][i])
+        assert lens.image_number[0] == catalog["num_images"][i]
+
+
+def test_lenses_from_catalog_population_fingerprint():
+    lens_pop = create_lens_pop_instance(return_kext=False)
+    catalog = lens_pop.draw_population_catalog({}, batch_size=20, seed=4)
+    assert len(lens_pop.lenses_from_catalog(catalog, index=[0])) == 1
+    # an unseeded draw completes the source catalog (e.g. ellipticities)
+    lens_pop.draw_population({})
+    with pytest.raises(ValueError):
+        lens_pop.lenses_from_catalog(catalog, index=[0])
+
+
 def test_pes_lens_pop_instance():
     cosmo = FlatLambdaCDM(H0=70, Om0=0.3)
 
@@ -0,0 +1,90 @@
+import numpy as np
+import numpy.testing as npt
+from slsim.Util.noise import NoiseGenerator
+
+
+class TestNoiseGenerator(object):
+    def setup_method(self):
+        self.images = np.full((10, 20, 20), 5.0)
+        self.images[:, 0, 0] = -1
+
+    def test_add_noise(self):
+        noisy_images = NoiseGenerator(seed=1).add_noise(
+            self.images, exposure_time=30, std_gaussian_noise=0.1
+        )
+        assert noisy_images.shape == self.images.shape
+        npt.assert_allclose(np.mean(noisy_images[:, 1:]), 5, atol=0.05)
+        # Poisson variance of 5 / 30 and Gaussian variance of 0.01
+        npt.assert_allclose(np.var(noisy_images[:, 1:]), 5 / 30 + 0.01, rtol=0.1)
+        # negative pixels have no Poisson noise
+        npt.assert_allclose(np.std(noisy_images[:, 0, 0]), 0.1, rtol=0.5)
+        # the images are not modified
+        assert np.all(self.images[:, 1:] == 5)
+
+    def test_reproducibility(self):
+        noisy_images = NoiseGenerator(seed=1, chunk_size=3).add_noise(
+            self.images, exposure_time=30
+        )
+        noisy_images_threads = NoiseGenerator(
+            seed=1, chunk_size=3, n_threads=4
+        ).add_noise(self.images, exposure_time=30)
+        npt.assert_array_equal(noisy_images_threads, noisy_images)
+        # successive calls draw new noise
+        noise_generator = NoiseGenerator(seed=1, chunk_size=3)
+        noise_generator.add_noise(self.images, exposure_time=30)
+        assert np.any(
+            noise_generator.add_noise(self.images, exposure_time=30) != noisy_images
+        )
+        # without seed, the global random state is used
+        np.random.seed(42)
+        noisy_images = NoiseGenerator().add_noise(self.images, std_gaussian_noise=1)
+        np.random.seed(42)
+        npt.assert_array_equal(
+            NoiseGenerator().add_noise(self.images, std_gaussian_noise=1),
+            noisy_images,
+        )
+
+    def test_per_image_parameters(self):
+        exposure_time = np.array([10] * 5 + [1000] * 5)
+        noisy_images = NoiseGenerator(seed=2).add_noise(
+            self.images, exposure_time=exposure_time, gain=[1] * 10
+        )
+        assert np.std(noisy_images[:5, 1:]) > 5 * np.std(noisy_images[5:, 1:])
+        exposure_map = np.full((20, 20), 10.0)
+        exposure_map[10:] = 1000
+        noisy_images = NoiseGenerator(seed=2).add_noise(
+            self.images, exposure_time=exposure_map
+        )
+        assert np.std(noisy_images[:, 1:10]) > 5 * np.std(noisy_images[:, 10:])
+        # the zero point scaling changes the number of electrons
+        noisy_images = NoiseGenerator(seed=2).add_noise(
+            self.images,
+            exposure_time=10,
+            coadd_zero_point=[27] * 5 + [32] * 5,
+            single_visit_zero_point=27,
+        )
+        assert np.std(noisy_images[:5, 1:]) < np.std(noisy_images[5:, 1:])
+        std_gaussian_noise = np.array([0.01] * 5 + [1] * 5)
+        noisy_images = NoiseGenerator(seed=2).add_noise(
+            self.images, std_gaussian_noise=std_gaussian_noise
+        )
+        npt.assert_allclose(
+            np.std(noisy_images - self.images, axis=(1, 2)),
+            std_gaussian_noise,
+            rtol=0.1,
+        )
+
+    def test_out(self):
+        out = np.zeros(self.images.shape, dtype=np.float32)
+        result = NoiseGenerator(seed=3).add_noise(
+            self.images, exposure_time=30, out=out
+        )
+        assert result is out
+        npt.assert_allclose(
+            out,
+            NoiseGenerator(seed=3).add_noise(self.images, exposure_time=30),
+            rtol=1e-6,
+        )
+        images = self.images.copy()
+        NoiseGenerator(seed=3).add_noise(images, std_gaussian_noise=1, out=images)
+        assert np.all(images != self.images)
@@ -25,8 +25,10 @@ from slsim.Util.param_util import (
     degrade_coadd_data,
     galaxy_size,
     detect_object,
+    empty_sky_map,
     surface_brightness_reff,
     gaussian_psf,
+    temporary_random_state,
 )
 from slsim.Sources.SourceVariability.variability import Variability
 from astropy.io import fits
@@ -60,8 +62,12 @@ def test_convolved_image():
     psf = np.load(os.path.join(path, "TestData/psf_kernels_for_deflector.npy"))
     c_image = convolved_image(image, psf)
     c_image_1 = convolved_image(image, psf, convolution_type="grid")
+    c_image_2 = convolved_image(image, psf, convolution_type="fft_cached")
     assert c_image.shape[0] == 101
     assert c_image_1.shape[0] == 101
+    npt.assert_allclose(c_image_2, c_image, atol=1e-12 * np.max(np.abs(c_image)))
+    c_images = convolved_image([image, 2 * image], psf, convolution_type="fft_cached")
+    npt.assert_allclose(c_images[1], 2 * c_image_2, rtol=1e-10)
 
 
 def test_images_to_pixels():
@@ -418,6 +424,26 @@ def test_detect_object():
     assert not result2
 
 
+def test_empty_sky_map():
+    np.random.seed(1)
+    image = np.random.normal(0, 1, size=(60, 70))
+    image[30:34, 40:44] += 20
+    variance = np.ones((60, 70))
+    empty_map = empty_sky_map(image, variance, box_size_arcsec=1.4)
+    assert empty_map.shape == image.shape
+    # the boxes around the edge pixels extend beyond the image
+    assert not np.any(empty_map[:3]) and not np.any(empty_map[:, -3:])
+    # same result as detect_object() on cutouts centered on the pixels
+    for y, x in [(31, 41), (20, 20), (30, 37), (30, 36), (50, 60)]:
+        cutout = image[y - 5 : y + 6, x - 5 : x + 6]
+        cutout_variance = variance[y - 5 : y + 6, x - 5 : x + 6]
+        assert empty_map[y, x] != detect_object(
+            cutout, cutout_variance, box_size_arcsec=1.4
+        )
+    assert not empty_map[31, 41]
+    assert empty_map[20, 20]
+
+
 def test_surface_brightness_reff():
     kwargs_source = [
         {
@@ -446,5 +472,21 @@ def test_gaussian_psf():
     npt.assert_almost_equal(np.sum(psf_kernel), 1, decimal=16)
 
 
+def test_temporary_random_state():
+    np.random.seed(42)
+    with temporary_random_state(1):
+        draw_1 = np.random.random(3)
+    draw_after = np.random.random()
+    np.random.seed(42)
+    assert np.random.random() == draw_after
+    seed_sequence = np.random.SeedSequence(5)
+    with temporary_random_state(seed_sequence):
+        draw_2 = np.random.random(3)
+    with temporary_random_state(seed_sequence):
+        draw_3 = np.random.random(3)
+    npt.assert_almost_equal(draw_2, draw_3, decimal=16)
+    assert not np.all(draw_1 == draw_2)
+
+
 if __name__ == "__main__":
     pytest.main()
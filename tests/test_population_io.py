@@ -0,0 +1,35 @@
+import os
+import h5py
+import pytest
+from numpy import testing as npt
+from slsim.Util.population_io import (
+    LensPopulationWriter,
+    append_columns,
+    read_lens_population,
+)
+
+
+def test_append_columns(tmp_path):
+    filename = os.path.join(tmp_path, "columns.h5")
+    with h5py.File(filename, "w") as f:
+        append_columns(f, {"a": [1.0, 2.0], "name": ["x", "y"]}, chunk_size=2)
+        append_columns(f, {"a": [3.0], "name": ["z"]}, chunk_size=2)
+    table = read_lens_population(filename, group="/")
+    npt.assert_array_equal(table["a"], [1, 2, 3])
+    assert list(table["name"]) == ["x", "y", "z"]
+
+
+def test_lens_population_writer(tmp_path):
+    filename = os.path.join(tmp_path, "lenses.h5")
+    with pytest.raises(ValueError):
+        LensPopulationWriter(filename, mode="r")
+    writer = LensPopulationWriter(filename, chunk_size=2)
+    assert writer.add_lenses([]) == 0
+    writer.close()
+    writer.close()
+    with h5py.File(filename, "r") as f:
+        assert f["lenses"].attrs["num_lenses"] == 0
+    writer = LensPopulationWriter(filename, mode="a")
+    assert writer.num_lenses == 0
+    writer.close()
+    assert len(read_lens_population(filename)) == 0
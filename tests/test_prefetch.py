@@ -0,0 +1,43 @@
+import time
+import pytest
+from slsim.Util.prefetch import prefetch
+
+
+def test_prefetch():
+    started = []
+
+    def square(x):
+        started.append(x)
+        return x**2
+
+    for max_prefetch in [0, 1, 3]:
+        started.clear()
+        results = []
+        for k, result in enumerate(prefetch(square, range(6), max_prefetch)):
+            # at most max_prefetch calls are pending besides the current one
+            assert len(started) <= k + 1 + max_prefetch
+            results.append(result)
+        assert results == [x**2 for x in range(6)]
+
+
+def test_prefetch_overlap():
+    def read(x):
+        time.sleep(0.1)
+        return x
+
+    start = time.time()
+    for x in prefetch(read, range(5), max_prefetch=2):
+        time.sleep(0.1)
+    # the reads overlap with the processing, which takes 1 s serially
+    assert time.time() - start < 0.85
+
+
+def test_prefetch_error():
+    def invert(x):
+        return 1 / x
+
+    results = prefetch(invert, [1, 2, 0, 4], max_prefetch=2, n_threads=2)
+    assert next(results) == 1
+    assert next(results) == 0.5
+    with pytest.raises(ZeroDivisionError):
+        next(results)
@@ -1,5 +1,6 @@
-from slsim.selection import object_cut
+from slsim.selection import object_cut, catalog_column
 import numpy as np
+from numpy import testing as npt
 from astropy.table import Table
 import pytest
 
@@ -42,5 +43,14 @@ def test_object_cut():
         )
 
 
+def test_catalog_column():
+    z = catalog_column(sample1, "z")
+    npt.assert_almost_equal(z, sample1["z"])
+    z_list = catalog_column(sample, "z", list_type="list")
+    npt.assert_almost_equal(z_list, [0.5, 1.2])
+    assert catalog_column(sample1, "mag_r") is None
+    assert catalog_column(sample, "mag_r", list_type="list") is None
+
+
 if __name__ == "__main__":
     pytest.main()
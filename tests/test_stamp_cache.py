@@ -0,0 +1,73 @@
+import os
+import numpy as np
+import numpy.testing as npt
+import pytest
+from slsim.Util.stamp_cache import StampCache, stamp_key
+
+
+class TestStampCache(object):
+    def setup_method(self):
+        self.stamps = {
+            stamp_key("stamp", i): np.full((4, 4), float(i)) for i in range(4)
+        }
+        self.keys = list(self.stamps)
+
+    def test_memory(self):
+        stamp_cache = StampCache(max_stamps=2)
+        assert stamp_cache.get(self.keys[0]) is None
+        for key in self.keys[:3]:
+            stamp_cache.put(key, self.stamps[key])
+        # the least recently used stamp is discarded
+        assert self.keys[0] not in stamp_cache
+        assert len(stamp_cache) == 2
+        npt.assert_array_equal(stamp_cache.get(self.keys[1]), self.stamps[self.keys[1]])
+        stamp_cache.put(self.keys[3], self.stamps[self.keys[3]])
+        assert self.keys[1] in stamp_cache
+        assert self.keys[2] not in stamp_cache
+        # stamps are stored as read-only copies
+        stamp = stamp_cache.get(self.keys[3])
+        with pytest.raises(ValueError):
+            stamp[0, 0] = 1
+        stamp_cache.clear()
+        assert len(stamp_cache) == 0
+
+    def test_disk(self, tmp_path):
+        directory = os.path.join(tmp_path, "stamps")
+        stamp_bytes = 128 + 16 * 8
+        stamp_cache = StampCache(
+            max_stamps=1, directory=directory, max_disk_bytes=3 * stamp_bytes
+        )
+        for key in self.keys[:3]:
+            stamp_cache.put(key, self.stamps[key])
+        assert stamp_cache.disk_bytes == 3 * stamp_bytes
+        # read back memory-mapped from the directory
+        stamp = stamp_cache.get(self.keys[0])
+        assert isinstance(stamp, np.memmap)
+        npt.assert_array_equal(stamp, self.stamps[self.keys[0]])
+        # the least recently used file is removed beyond the size limit
+        stamp_cache.put(self.keys[3], self.stamps[self.keys[3]])
+        assert stamp_cache.disk_bytes == 3 * stamp_bytes
+        assert self.keys[1] not in stamp_cache
+        assert not os.path.exists(os.path.join(directory, self.keys[1] + ".npy"))
+
+        # the stamps persist across instances
+        stamp_cache_new = StampCache(directory=directory)
+        assert len(stamp_cache_new) == 3
+        npt.assert_array_equal(
+            stamp_cache_new.get(self.keys[2]), self.stamps[self.keys[2]]
+        )
+        stamp_cache_new.clear(disk=True)
+        assert len(stamp_cache_new) == 0
+        assert len(os.listdir(directory)) == 0
+
+
+def test_stamp_key():
+    kwargs = {"R_sersic": 0.5, "center_x": np.float64(0.1), "n_sersic": 4}
+    kwargs_reordered = {"n_sersic": 4.0, "center_x": 0.1, "R_sersic": np.array(0.5)}
+    assert stamp_key([kwargs], "i", 27) == stamp_key([kwargs_reordered], "i", 27.0)
+    assert stamp_key([kwargs], "i", 27) != stamp_key([kwargs], "r", 27)
+    assert stamp_key([kwargs], "i", 27) != stamp_key([kwargs], "i", 27.1)
+    assert stamp_key(np.ones(4)) != stamp_key(np.ones((2, 2)))
+    assert stamp_key(None) != stamp_key(False)
+    assert stamp_key("ab", "c") != stamp_key("a", "bc")
+    assert len(stamp_key(object)) == 40
@@ -0,0 +1,71 @@
+import os
+import numpy as np
+import numpy.testing as npt
+import pytest
+from astropy.table import Table
+from slsim.Util.table_io import ImageTableWriter, ImageTableReader
+
+
+def _table(index, num_rows):
+    return Table(
+        {
+            "lens_id": ["lens_%s_%s" % (index, i) for i in range(num_rows)],
+            "z": np.full(num_rows, index, dtype=float),
+            "image": np.full((num_rows, 5, 5), index, dtype=np.float32),
+        }
+    )
+
+
+class TestImageTable(object):
+    def setup_method(self):
+        self.tables = [
+            _table(index, num_rows) for index, num_rows in enumerate([3, 4, 2])
+        ]
+
+    @pytest.mark.parametrize("compression", [None, "gzip"])
+    def test_write_read(self, tmp_path, compression):
+        filename = os.path.join(tmp_path, "images.h5")
+        with ImageTableWriter(
+            filename, chunk_size=4, compression=compression
+        ) as writer:
+            for table in self.tables:
+                writer.add_table(table)
+        with ImageTableReader(filename) as reader:
+            assert len(reader) == 9
+            assert reader.num_tables == 3
+            assert set(reader.colnames) == {"lens_id", "z", "image", "table_index"}
+            assert reader["image"].shape == (9, 5, 5)
+            images = np.concatenate([table["image"] for table in self.tables])
+            npt.assert_array_equal(reader["image"][:], images)
+            npt.assert_array_equal(reader["image"][[8, 0, 5]], images[[8, 0, 5]])
+            npt.assert_array_equal(reader["image"][3], images[3])
+            npt.assert_array_equal(
+                reader["table_index"][:], [0] * 3 + [1] * 4 + [2] * 2
+            )
+            table = reader.read(slice(2, 6))
+            assert list(table["lens_id"]) == [
+                "lens_0_2",
+                "lens_1_0",
+                "lens_1_1",
+                "lens_1_2",
+            ]
+            npt.assert_array_equal(table["z"], [0, 1, 1, 1])
+            # uncompressed blocks are memory-mapped
+            assert isinstance(reader["image"]._blocks[0], np.memmap) == (
+                compression is None
+            )
+
+    def test_append(self, tmp_path):
+        filename = os.path.join(tmp_path, "images.h5")
+        with pytest.raises(ValueError):
+            ImageTableWriter(filename, mode="r")
+        with ImageTableWriter(filename, chunk_size=2) as writer:
+            writer.add_table(self.tables[0])
+        with ImageTableWriter(filename, chunk_size=2, mode="a") as writer:
+            writer.add_table(self.tables[1])
+            with pytest.raises(ValueError):
+                writer.add_table(Table({"z": [1.0]}))
+        with ImageTableReader(filename) as reader:
+            assert len(reader) == 7
+            npt.assert_array_equal(reader["z"][:], [0] * 3 + [1] * 4)
+            npt.assert_array_equal(reader["table_index"][:], [0] * 3 + [1] * 4)